@@ -0,0 +1,68 @@
+import sys
+import timeit
+
+from cloudify_plugin_tools.input_arguments import InputArgumentProvider
+from cloudify_plugin_tools.mapping import LayeredMapping
+
+
+# Instance keeping large cached API responses in runtime_properties
+PROPERTIES = 200
+RUNTIME_PROPERTIES = 5000
+INPUTS = 10
+NUMBER = 1000
+
+
+def _layers():
+    properties = dict(
+        ('property_{0}'.format(i), i) for i in range(PROPERTIES)
+    )
+    runtime_properties = dict(
+        ('cached_{0}'.format(i), {'uuid': i, 'fq_name': ['a', 'b', str(i)]})
+        for i in range(RUNTIME_PROPERTIES)
+    )
+    inputs = dict(('input_{0}'.format(i), i) for i in range(INPUTS))
+
+    return properties, runtime_properties, inputs
+
+
+def merge_dict(layers):
+    # Mirrors previous InputArgumentProvider.get_input_arguments
+    result = {}
+
+    for layer in layers:
+        InputArgumentProvider._combine(result, layer)
+
+    return result
+
+
+def merge_layered(layers):
+    return LayeredMapping(*layers)
+
+
+def use(arguments):
+    # typical task reads only few arguments
+    return arguments['property_1'], arguments['input_1']
+
+
+def main():
+    layers = _layers()
+    assert merge_dict(layers) == merge_layered(layers)
+
+    for name, merge in (('dict', merge_dict), ('layered', merge_layered)):
+        seconds = timeit.timeit(
+            lambda: use(merge(layers)),
+            number=NUMBER
+        )
+
+        print(
+            '{0:>8}: {1:8.1f} us/operation, {2:8d} bytes of merged '
+            'container'.format(
+                name,
+                seconds / NUMBER * 1e6,
+                sys.getsizeof(merge(layers))
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
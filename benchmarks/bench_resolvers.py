@@ -0,0 +1,178 @@
+import timeit
+
+from cloudify.mocks import (
+    MockNodeContext,
+    MockNodeInstanceContext,
+    MockRelationshipContext,
+    MockRelationshipSubjectContext
+)
+
+from cloudify_plugin_tools.exceptions import InputArgumentResolvingError
+from cloudify_plugin_tools.input_arguments import (
+    InputArgumentResolvingRule,
+    InstanceInputArgumentResolver,
+    RelationshipInputArgumentResolver
+)
+
+
+# Hub-like topology: single instance connected to many others
+RELATIONSHIPS = 1000
+RULES = 12
+NUMBER = 100
+
+
+class Ctx(object):
+    pass
+
+
+def _subject(index, relationships=None):
+    node = MockNodeContext(id='node_{0}'.format(index))
+    node.type_hierarchy = [
+        'cloudify.nodes.Root',
+        'cloudify.nodes.Benchmark{0}'.format(index % 20)
+    ]
+
+    return MockRelationshipSubjectContext(
+        node=node,
+        instance=MockNodeInstanceContext(
+            id='instance_{0}'.format(index),
+            runtime_properties={'object_reference': {'uuid': index}},
+            relationships=relationships
+        )
+    )
+
+
+def _relationship(index):
+    relationship = MockRelationshipContext(
+        target=_subject(index),
+        type='cloudify.relationships.connected_to'
+    )
+    relationship.type_hierarchy = [
+        'cloudify.relationships.depends_on',
+        'cloudify.relationships.connected_to'
+    ]
+
+    return relationship
+
+
+def _rules():
+    return [
+        InputArgumentResolvingRule(
+            argument_name='ref_{0}'.format(i),
+            node_type='cloudify.nodes.Benchmark{0}'.format(19 - i),
+            relationship_type='cloudify.relationships.connected_to',
+            runtime_properties_path=['object_reference', 'uuid']
+        )
+        for i in range(RULES)
+    ]
+
+
+# Copies of resolvers' loops before relationships were indexed and
+# relationship context was found once per resolve call - every rule scans
+# relationships again
+
+def _instance_resolve_before(rule, ctx):
+    for relationship in ctx.instance.relationships:
+        is_successful, result = rule.evaluate(
+            relationship,
+            relationship.target.node,
+            relationship.target.instance
+        )
+
+        if is_successful:
+            return result
+
+    raise InputArgumentResolvingError(
+        'Cannot resolve {0} - no suitable relationships / nodes found'
+        .format(str(rule))
+    )
+
+
+def _relationship_resolve_before(rule, ctx):
+    relationship_ctx = None
+
+    for relationship in ctx.source.instance.relationships:
+        if relationship.target.instance.id == ctx.target.instance.id:
+            relationship_ctx = relationship
+            break
+
+    if relationship_ctx:
+        for subject in (ctx.target, ctx.source):
+            is_successful, result = rule.evaluate(
+                relationship_ctx,
+                subject.node,
+                subject.instance
+            )
+
+            if is_successful:
+                return result
+
+    raise InputArgumentResolvingError(
+        'Cannot resolve {0} - source and target nodes cannot be used'
+        .format(str(rule))
+    )
+
+
+def resolve_per_rule(resolve_before, rules, ctx):
+    return dict(
+        (rule.argument_name, resolve_before(rule, ctx))
+        for rule in rules
+    )
+
+
+def compare(name, resolver, resolve_before, ctx):
+    rules = list(resolver.rules)
+
+    assert resolve_per_rule(resolve_before, rules, ctx) == \
+        resolver.resolve(ctx)
+
+    before = timeit.timeit(
+        lambda: resolve_per_rule(resolve_before, rules, ctx),
+        number=NUMBER
+    )
+    after = timeit.timeit(lambda: resolver.resolve(ctx), number=NUMBER)
+
+    print(
+        '{0:>12}: per rule {1:8.1f} us/resolve, once {2:8.1f} us/resolve '
+        '({3:.1f}x)'.format(
+            name,
+            before / NUMBER * 1e6,
+            after / NUMBER * 1e6,
+            before / after
+        )
+    )
+
+
+def main():
+    relationships = [_relationship(i) for i in range(RELATIONSHIPS)]
+    source = _subject(RELATIONSHIPS, relationships)
+
+    instance_ctx = Ctx()
+    instance_ctx.instance = source.instance
+
+    relationship_ctx = Ctx()
+    relationship_ctx.source = source
+    relationship_ctx.target = relationships[-1].target
+
+    compare(
+        'instance',
+        InstanceInputArgumentResolver(_rules()),
+        _instance_resolve_before,
+        instance_ctx
+    )
+    compare(
+        'relationship',
+        RelationshipInputArgumentResolver([
+            InputArgumentResolvingRule(
+                argument_name='ref_{0}'.format(i),
+                runtime_properties_path=['object_reference', 'uuid']
+            )
+            for i in range(RULES)
+        ]),
+        _relationship_resolve_before,
+        relationship_ctx
+    )
+
+
+if __name__ == '__main__':
+    main()
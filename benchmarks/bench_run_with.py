@@ -0,0 +1,97 @@
+import timeit
+
+from cloudify.mocks import MockCloudifyContext
+from cloudify.state import current_ctx
+
+from cloudify_plugin_tools import InputArgumentResolvingRule
+from cloudify_plugin_tools.constants import SOURCES_DEFAULT_ORDER
+from cloudify_plugin_tools.decorators import run_with
+from cloudify_plugin_tools.metrics import (
+    InMemorySink,
+    set_sink
+)
+from cloudify_plugin_tools.runner import InstanceTaskRunner
+
+
+RULES = 50
+NUMBER = 10000
+
+
+def _rules():
+    return [
+        InputArgumentResolvingRule(
+            argument_name='argument_{0}'.format(i),
+            node_type='cloudify.nodes.Type{0}'.format(i),
+            runtime_properties_path=['reference']
+        )
+        for i in range(RULES)
+    ]
+
+
+def task(ctx, name=None):
+    return name
+
+
+def build_runner(decorator, ctx):
+    # Mirrors previous run_with.call - runner built from scratch
+    return InstanceTaskRunner(
+        ctx,
+        decorator.input_arguments_resolve_rules,
+        decorator.input_arguments_sources_order,
+        decorator.api_ctx_provider_cls
+    )
+
+
+def build_plan_runner(decorator, ctx):
+    return decorator.plan.create_runner(ctx)
+
+
+def call_per_call_runner(decorator, ctx):
+    build_runner(decorator, ctx).run(task, name='x')
+
+
+def call_plan(decorator, ctx):
+    decorator.call(task, ctx, name='x')
+
+
+def call_task(decorator, ctx):
+    task(ctx, name='x')
+
+
+def main():
+    ctx = MockCloudifyContext('node_name', properties={})
+    current_ctx.set(ctx)
+
+    decorator = run_with(
+        InstanceTaskRunner,
+        _rules(),
+        SOURCES_DEFAULT_ORDER
+    )
+
+    for name, call in (('build', build_runner),
+                       ('build plan', build_plan_runner),
+                       ('task', call_task),
+                       ('runner', call_per_call_runner),
+                       ('plan', call_plan)):
+        seconds = timeit.timeit(lambda: call(decorator, ctx), number=NUMBER)
+
+        print(
+            '{0:>10}: {1:8.1f} us/call'.format(name, seconds / NUMBER * 1e6)
+        )
+
+    # phases timings with in-memory sink (default sink does nothing)
+    set_sink(InMemorySink())
+
+    seconds = timeit.timeit(lambda: call_plan(decorator, ctx), number=NUMBER)
+    print(
+        '{0:>10}: {1:8.1f} us/call'.format(
+            'metrics',
+            seconds / NUMBER * 1e6
+        )
+    )
+
+    set_sink(None)
+
+
+if __name__ == '__main__':
+    main()
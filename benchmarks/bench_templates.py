@@ -0,0 +1,96 @@
+import ast
+import re
+import timeit
+
+import yaml
+from cloudify_common_sdk.filters import render_template
+
+from cloudify_sdk_tools.templates import CompiledTemplate
+
+
+# Contrail-style templates: single GET and create request with payload
+GET_TEMPLATE = """
+rest_calls:
+  - path: '/project/{{ uuid }}?exclude_back_refs=True&exclude_children=True'
+    method: 'GET'
+    headers:
+      Content-type: 'application/json'
+    response_format: json
+    response_translation:
+      project: [data]
+"""
+
+CREATE_TEMPLATE = """
+rest_calls:
+  - path: '/virtual-networks'
+    method: 'POST'
+    headers:
+      Content-type: 'application/json'
+    payload:
+      virtual-network:
+        parent_type: 'project'
+        fq_name: ['{{ domain }}', '{{ project }}', '{{ name }}']
+        network_ipam_refs: '{% if refs %}{{ refs }}{% else %}[]{% endif %}'
+        virtual_network_properties:
+          forwarding_mode: '{{ forwarding_mode }}'
+          vxlan_network_identifier: '{{ vxlan_id }}'
+        route_target_list:
+          route_target: ['target:{{ asn }}:{{ vxlan_id }}']
+    response_format: json
+    recoverable_codes: [409]
+    response_translation:
+      virtual-network: [data]
+"""
+
+PARAMS = {
+    'uuid': 'ac90331c-a57c-4a08-862c-cd32b0a1366c',
+    'domain': 'default-domain',
+    'project': 'admin',
+    'name': 'vn-benchmark',
+    'refs': [],
+    'forwarding_mode': 'l2_l3',
+    'vxlan_id': 1001,
+    'asn': 64512
+}
+
+NUMBER = 1000
+
+
+def render_raw(template):
+    # Mirrors cloudify_rest_sdk.utility.process for raw template text
+    calls = []
+
+    for call in yaml.safe_load(template)['rest_calls']:
+        call = '{0}'.format(call)
+        call = re.sub(r'\'\{\%', '{%', call)
+        call = re.sub(r'\%\}\'', '%}', call)
+        calls.append(ast.literal_eval(render_template(call, PARAMS)))
+
+    return calls
+
+
+def render_compiled(template):
+    return [call.render(PARAMS) for call in template.calls]
+
+
+def main():
+    for name, source in (('get', GET_TEMPLATE), ('create', CREATE_TEMPLATE)):
+        compiled = CompiledTemplate(source)
+        assert render_raw(source) == render_compiled(compiled)
+
+        before = timeit.timeit(lambda: render_raw(source), number=NUMBER)
+        after = timeit.timeit(lambda: render_compiled(compiled), number=NUMBER)
+
+        print(
+            '{0:>8}: raw {1:8.1f} us/call, compiled {2:8.1f} us/call '
+            '({3:.1f}x)'.format(
+                name,
+                before / NUMBER * 1e6,
+                after / NUMBER * 1e6,
+                before / after
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
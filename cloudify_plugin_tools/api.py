@@ -1,3 +1,10 @@
+import hashlib
+import json
+import os
+
+from .cache import API_CTX_CACHE
+
+
 class ApiContext(object):
 
     def __init__(self, client, credentials):
@@ -7,8 +14,135 @@ class ApiContext(object):
 
 class ApiContextProvider(object):
 
+    # names of input arguments used by get_api_ctx (None - all of them)
+    INPUT_ARGUMENTS = None
+
     def __init__(self, logger):
         self.logger = logger
 
     def get_api_ctx(self, input_parameters):
         raise NotImplementedError
+
+    def handle_error(self, input_parameters, error):
+        # called when operation using ApiContext failed
+        pass
+
+
+class CachingApiContextProvider(ApiContextProvider):
+
+    # names of input arguments identifying credentials / endpoint
+    # (None - ApiContext and tokens are not cached)
+    CREDENTIALS_ARGUMENTS = None
+
+    # exceptions meaning that cached ApiContext cannot be used anymore
+    AUTH_ERRORS = ()
+
+    API_CTX_CACHE = API_CTX_CACHE
+
+    # input argument (e.g. node property) with key used to encrypt tokens
+    # stored on disk and shared by worker processes (None - not stored)
+    TOKEN_STORE_KEY_ARGUMENT = None
+
+    # default - file named after provider class in TOKEN_STORE_DIRECTORY
+    TOKEN_STORE_PATH = None
+
+    # created (readable only by worker user) when missing
+    TOKEN_STORE_DIRECTORY = os.path.join(
+        os.path.expanduser('~'),
+        '.cloudify-plugin-tools',
+        'tokens'
+    )
+
+    TOKEN_REFRESH_MARGIN = 60
+
+    def get_credentials_key(self, input_parameters):
+        # None - credentials arguments not declared, nothing can be cached
+        if not self.CREDENTIALS_ARGUMENTS:
+            return None
+
+        credentials = dict(
+            (name, input_parameters[name])
+            for name in self.CREDENTIALS_ARGUMENTS
+            if name in input_parameters
+        )
+
+        # only hash of credentials is kept in cache
+        return hashlib.sha256(json.dumps(
+            [type(self).__module__, type(self).__name__, credentials],
+            sort_keys=True,
+            default=repr
+        )).hexdigest()
+
+    def create_api_ctx(self, input_parameters):
+        raise NotImplementedError
+
+    def get_api_ctx(self, input_parameters):
+        key = self.get_credentials_key(input_parameters)
+
+        if key is None:
+            return self.create_api_ctx(input_parameters)
+
+        api_ctx = self.API_CTX_CACHE.get(key)
+
+        if api_ctx is None:
+            api_ctx = self.create_api_ctx(input_parameters)
+            self.API_CTX_CACHE.set(key, api_ctx)
+        else:
+            self.logger.debug('Using cached API context')
+
+        return api_ctx
+
+    def get_token_store(self, input_parameters):
+        secret = input_parameters.get(self.TOKEN_STORE_KEY_ARGUMENT) \
+            if self.TOKEN_STORE_KEY_ARGUMENT else None
+
+        if not secret or not self.CREDENTIALS_ARGUMENTS:
+            return None
+
+        # imported only when needed - loads cryptography package
+        from .tokens import (
+            get_private_directory,
+            get_token_store
+        )
+
+        return get_token_store(
+            self.TOKEN_STORE_PATH or os.path.join(
+                get_private_directory(self.TOKEN_STORE_DIRECTORY),
+                '{0}.{1}'.format(type(self).__module__, type(self).__name__)
+            ),
+            secret,
+            self.TOKEN_REFRESH_MARGIN
+        )
+
+    def get_token(self, input_parameters, login):
+        # login() - returns token and number of seconds it is valid for
+        token_store = self.get_token_store(input_parameters)
+
+        if token_store is None:
+            return login()[0]
+
+        return token_store.get(
+            self.get_credentials_key(input_parameters),
+            login
+        )
+
+    def invalidate(self, input_parameters):
+        key = self.get_credentials_key(input_parameters)
+
+        if key is None:
+            return
+
+        self.API_CTX_CACHE.invalidate(key)
+
+        token_store = self.get_token_store(input_parameters)
+
+        if token_store:
+            token_store.invalidate(key)
+
+    def handle_error(self, input_parameters, error):
+        if isinstance(error, self.AUTH_ERRORS):
+            self.logger.debug(
+                'Authentication error {0} - cached API context invalidated'
+                .format(repr(error))
+            )
+            self.invalidate(input_parameters)
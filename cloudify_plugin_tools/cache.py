@@ -0,0 +1,134 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_MAX_SIZE = 1000
+DEFAULT_SOURCE_TTL = 300
+DEFAULT_API_CTX_TTL = 300
+DEFAULT_API_CTX_MAX_SIZE = 32
+
+
+def _copy(value):
+    # node properties are cloudify.context.ImmutableProperties which can not
+    # be deep copied (rebuilt by __setitem__) - plain dict is stored instead
+    if isinstance(value, dict):
+        value = dict(value)
+
+    return copy.deepcopy(value)
+
+
+class SourceCache(object):
+    # callers get own copies - cached values are never shared
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_SOURCE_TTL):
+        # ttl - seconds after which value is loaded again (e.g. after
+        # deployment update changed node properties)
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            # (value, expires_at)
+            if entry is not None and entry[1] > time.time():
+                self.hits += 1
+                self._entries[key] = entry
+
+                return _copy(entry[0])
+
+            self.misses += 1
+
+        value = load()
+
+        with self._lock:
+            self._entries[key] = (_copy(value), time.time() + self.ttl)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries)
+        }
+
+
+# not used by default - providers opt in by SOURCE_CACHE class attribute
+SOURCE_CACHE = SourceCache()
+
+
+class ApiContextCache(object):
+
+    def __init__(self,
+                 ttl=DEFAULT_API_CTX_TTL,
+                 max_size=DEFAULT_API_CTX_MAX_SIZE):
+
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            # (api_ctx, expires_at)
+            if entry is None or entry[1] <= time.time():
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries[key] = entry
+
+            return entry[0]
+
+    def set(self, key, api_ctx):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (api_ctx, time.time() + self.ttl)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None):
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'size': len(self._entries)
+        }
+
+
+API_CTX_CACHE = ApiContextCache()
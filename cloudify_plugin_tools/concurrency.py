@@ -0,0 +1,62 @@
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+DEFAULT_MAX_WORKERS = 10
+
+# pools are never closed - number of pools (per name) and their size are
+# capped, so threads count stays bounded whatever sizes callers ask for
+MAX_THREAD_POOLS = 4
+MAX_POOL_SIZE = 64
+
+_THREAD_POOLS = {}
+_THREAD_POOLS_LOCK = threading.Lock()
+
+
+def _get_closest_size(sizes, max_workers):
+    # smallest pool not smaller than requested, otherwise the biggest one
+    bigger = [size for size in sizes if size >= max_workers]
+
+    return min(bigger) if bigger else max(sizes)
+
+
+def get_thread_pool(max_workers=DEFAULT_MAX_WORKERS, name=None):
+    # name - separate pool, e.g. for work which itself uses shared pools
+    max_workers = max(min(max_workers, MAX_POOL_SIZE), 1)
+    key = (name, max_workers)
+
+    with _THREAD_POOLS_LOCK:
+        if key not in _THREAD_POOLS:
+            sizes = [size for pool_name, size in _THREAD_POOLS
+                     if pool_name == name]
+
+            if len(sizes) >= MAX_THREAD_POOLS:
+                return _THREAD_POOLS[
+                    (name, _get_closest_size(sizes, max_workers))
+                ]
+
+            _THREAD_POOLS[key] = ThreadPool(max_workers)
+
+        return _THREAD_POOLS[key]
+
+
+def map_limited(func, items, max_workers=DEFAULT_MAX_WORKERS, name=None):
+    # pool may be shared with other sizes (see MAX_THREAD_POOLS) - at most
+    # max_workers items of this call run at once, results in items order
+    max_workers = max(max_workers, 1)
+    pool = get_thread_pool(max_workers, name)
+    semaphore = threading.BoundedSemaphore(max_workers)
+
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            semaphore.release()
+
+    results = []
+
+    for item in items:
+        semaphore.acquire()
+        results.append(pool.apply_async(run, (item,)))
+
+    return [result.get() for result in results]
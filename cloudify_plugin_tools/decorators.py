@@ -1,3 +1,5 @@
+import inspect
+
 from cloudify.exceptions import (
     NonRecoverableError,
     RecoverableError
@@ -5,10 +7,158 @@ from cloudify.exceptions import (
 
 from .constants import SOURCES_DEFAULT_ORDER
 from .exceptions import (
+    get_retry_after,
     reraise,
+    FanOutError,
     COMMON_RECOVERABLE_EXCEPTIONS,
     COMMON_NON_RECOVERABLE_EXCEPTIONS
 )
+from .input_arguments import compile_rules
+from .runner import get_task_signature
+
+
+UNKNOWN_EXCEPTION_MESSAGE = \
+    'Unknown exception during task execution - trying to rerun task'
+
+
+def _accepts_inputs_provider(runner_class):
+    # custom runners may override __init__ with documented 4 arguments only
+    if not hasattr(runner_class, 'create_inputs_provider'):
+        return False
+
+    try:
+        spec = inspect.getargspec(runner_class.__init__)
+    except TypeError:
+        return False
+
+    return 'inputs_provider' in spec.args or spec.keywords is not None
+
+
+class ExecutionPlan(object):
+    # Everything run_with needs which does not depend on ctx - built once,
+    # when decorator is applied, and shared by all calls
+
+    def __init__(self,
+                 runner_class,
+                 resolving_rules,
+                 sources_order,
+                 api_ctx_provider_cls,
+                 non_recoverable_exceptions,
+                 recoverable_exceptions,
+                 retry_policy=None):
+
+        self._runner_class = runner_class
+        self._retry_policy = retry_policy
+        self._resolving_rules = compile_rules(resolving_rules)
+        self._api_ctx_provider_cls = api_ctx_provider_cls
+
+        # sources unknown to provider are reported once and skipped
+        provider_class = getattr(runner_class, 'INPUTS_PROVIDER_CLASS', None)
+        known_sources = getattr(provider_class, 'SOURCES', None)
+
+        self._unknown_sources = tuple(
+            name for name in sources_order
+            if known_sources is not None and name not in known_sources
+        )
+        self._sources_order = tuple(
+            name for name in sources_order
+            if name not in self._unknown_sources
+        ) if self._unknown_sources else sources_order
+
+        # (exception classes, error class raised instead, message),
+        # first matching entry is used, None - exception is raised as is
+        # (exceptions may be given as list - isinstance requires tuple)
+        self._exceptions_table = (
+            ((NonRecoverableError, RecoverableError), None, None),
+            (COMMON_NON_RECOVERABLE_EXCEPTIONS, NonRecoverableError, None),
+            (tuple(non_recoverable_exceptions or ()), NonRecoverableError,
+             None),
+            (COMMON_RECOVERABLE_EXCEPTIONS, RecoverableError, None),
+            (tuple(recoverable_exceptions or ()), RecoverableError, None),
+            (BaseException, RecoverableError, UNKNOWN_EXCEPTION_MESSAGE)
+        )
+
+        self._inputs_provider = runner_class.create_inputs_provider(
+            self._resolving_rules,
+            self._sources_order
+        ) if _accepts_inputs_provider(runner_class) else None
+
+        self._reported = False
+
+    runner_class = property(lambda self: self._runner_class)
+    resolving_rules = property(lambda self: self._resolving_rules)
+    sources_order = property(lambda self: self._sources_order)
+    unknown_sources = property(lambda self: self._unknown_sources)
+    api_ctx_provider_cls = property(lambda self: self._api_ctx_provider_cls)
+    exceptions_table = property(lambda self: self._exceptions_table)
+    retry_policy = property(lambda self: self._retry_policy)
+
+    def create_runner(self, ctx):
+        if self._unknown_sources and not self._reported:
+            self._reported = True
+
+            for name in self._unknown_sources:
+                ctx.logger.warn(
+                    'Unknown input arguments source: {0}. '
+                    'Skipping.'
+                    .format(name)
+                )
+
+        if self._inputs_provider is None:
+            return self._runner_class(
+                ctx,
+                self._resolving_rules,
+                self._sources_order,
+                self._api_ctx_provider_cls
+            )
+
+        return self._runner_class(
+            ctx,
+            self._resolving_rules,
+            self._sources_order,
+            self._api_ctx_provider_cls,
+            inputs_provider=self._inputs_provider
+        )
+
+    def _classify_fan_out(self, error):
+        # any non-recoverable target error makes whole operation such,
+        # otherwise it is retried - for all targets, succeeded ones too
+        for target_error in error.errors:
+            if target_error is None:
+                continue
+
+            error_class, _ = self.classify(target_error)
+
+            if error_class is NonRecoverableError or \
+                    isinstance(target_error, NonRecoverableError):
+                return NonRecoverableError, None
+
+        return RecoverableError, None
+
+    def classify(self, error):
+        if isinstance(error, FanOutError):
+            return self._classify_fan_out(error)
+
+        for exceptions, error_class, message in self._exceptions_table:
+            if isinstance(error, exceptions):
+                return error_class, message
+
+        return RecoverableError, UNKNOWN_EXCEPTION_MESSAGE
+
+    def get_retry_delay(self, error, error_class, attempt, started_at):
+        # None - error should not be retried locally
+        if not self._retry_policy or not isinstance(error, Exception):
+            return None
+
+        if error_class is not RecoverableError and \
+                not isinstance(error, RecoverableError):
+            return None
+
+        return self._retry_policy.get_retry_delay(
+            attempt,
+            started_at,
+            get_retry_after(error)
+        )
 
 
 class run_with(object):
@@ -19,48 +169,79 @@ class run_with(object):
                  input_arguments_sources_order=SOURCES_DEFAULT_ORDER,
                  api_ctx_provider_cls=None,
                  non_recoverable_exceptions=(),
-                 recoverable_exceptions=()):
+                 recoverable_exceptions=(),
+                 retry_policy=None):
 
         self.runner_class = runner_class
-        self.input_arguments_resolve_rules = input_arguments_resolve_rules
         self.input_arguments_sources_order = input_arguments_sources_order
         self.api_ctx_provider_cls = api_ctx_provider_cls
         self.non_recoverable_exceptions = non_recoverable_exceptions
         self.recoverable_exceptions = recoverable_exceptions
+        self.retry_policy = retry_policy
+
+        # rules, sources and exceptions are prepared once - at decoration
+        self.plan = ExecutionPlan(
+            runner_class,
+            input_arguments_resolve_rules,
+            input_arguments_sources_order,
+            api_ctx_provider_cls,
+            non_recoverable_exceptions,
+            recoverable_exceptions,
+            retry_policy
+        ) if runner_class else None
+
+        self.input_arguments_resolve_rules = self.plan.resolving_rules \
+            if self.plan else compile_rules(input_arguments_resolve_rules)
 
     def __call__(self, func):
+        # signature is introspected once - at decoration time
+        get_task_signature(func)
+
         def _do_call(ctx, *args, **kwargs):
             self.call(func, ctx, *args, **kwargs)
 
         return _do_call
 
     def call(self, func, ctx, *args, **kwargs):
-        if self.runner_class:
-            try:
-                self.runner_class(
-                    ctx,
-                    self.input_arguments_resolve_rules or [],
-                    self.input_arguments_sources_order,
-                    self.api_ctx_provider_cls
-                ).run(func, *args, **kwargs)
-            except (NonRecoverableError, RecoverableError):
-                raise
-            except COMMON_NON_RECOVERABLE_EXCEPTIONS:
-                reraise(NonRecoverableError)
-            except self.non_recoverable_exceptions:
-                reraise(NonRecoverableError)
-            except COMMON_RECOVERABLE_EXCEPTIONS:
-                reraise(RecoverableError)
-            except self.recoverable_exceptions:
-                reraise(RecoverableError)
-            except BaseException:
-                reraise(
-                    RecoverableError,
-                    'Unknown exception during task execution - '
-                    'trying to rerun task'
-                )
-        else:
+        if not self.plan:
             raise NonRecoverableError(
                 'Cannot run {0} task. Runner class is not defined.'
                 .format(func)
             )
+
+        started_at = self.retry_policy.clock() if self.retry_policy else None
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            try:
+                self.plan.create_runner(ctx).run(func, *args, **kwargs)
+                return
+            except BaseException as error:
+                error_class, message = self.plan.classify(error)
+                delay = self.plan.get_retry_delay(
+                    error,
+                    error_class,
+                    attempt,
+                    started_at
+                )
+
+                if delay is None:
+                    if error_class is None:
+                        raise
+
+                    retry_after = get_retry_after(error) \
+                        if error_class is RecoverableError else None
+
+                    if retry_after is not None:
+                        reraise(error_class, message, retry_after=retry_after)
+
+                    reraise(error_class, message)
+
+                ctx.logger.warn(
+                    'Attempt {0} failed with {1}. Retrying in {2:.1f}s.'
+                    .format(attempt, repr(error), delay)
+                )
+
+            self.retry_policy.sleep(delay)
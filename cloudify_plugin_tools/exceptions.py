@@ -1,6 +1,14 @@
 import sys
 
 
+# Fix for flake 8
+try:
+    basestring
+    unicode
+except NameError:
+    basestring = unicode = str
+
+
 class InputArgumentResolvingError(Exception):
     pass
 
@@ -9,6 +17,30 @@ class UnreachableApiError(Exception):
     pass
 
 
+class FanOutError(Exception):
+
+    def __init__(self, errors, results):
+        # errors / results - by index of target (None - target succeeded)
+        self.errors = errors
+        self.results = results
+
+        failed = [
+            (index, error) for index, error in enumerate(errors)
+            if error is not None
+        ]
+
+        super(FanOutError, self).__init__(
+            '{0} of {1} targets failed: {2}'.format(
+                len(failed),
+                len(errors),
+                '; '.join(
+                    'target {0}: {1}'.format(index, repr(error))
+                    for index, error in failed
+                )
+            )
+        )
+
+
 COMMON_NON_RECOVERABLE_EXCEPTIONS = (
     InputArgumentResolvingError,
     UnreachableApiError
@@ -17,19 +49,67 @@ COMMON_NON_RECOVERABLE_EXCEPTIONS = (
 COMMON_RECOVERABLE_EXCEPTIONS = ()
 
 
-def reraise(exception_class, message=None):
+def get_retry_after(exception):
+    # seconds server asked to wait before retry (None - unknown)
+    if isinstance(exception, FanOutError):
+        return max([None] + [
+            get_retry_after(error)
+            for error in exception.errors
+            if error is not None
+        ])
+
+    return getattr(exception, 'retry_after', None)
+
+
+def _get_text(value):
+    # str() of exception with non-ASCII unicode message fails
+    if isinstance(value, basestring):
+        return value
+
+    try:
+        return str(value)
+    except UnicodeError:
+        return unicode(value)
+
+
+def reraise(exception_class, message=None, **kwargs):
+    # kwargs - passed to exception_class, e.g. retry_after of
+    # RecoverableError
     original_type, original_message, original_traceback = tuple(
         sys.exc_info()
     )
 
     if message:
-        message = \
+        original_text = _get_text(original_message)
+        template = \
             '\nDetails: {0}\n' \
             'Original exception: {1}\n' \
-            'Original exception message: {2}\n'\
-            .format(message, original_type.__name__, original_message)
+            'Original exception message: {2}\n'
+
+        if isinstance(original_text, unicode):
+            template = unicode(template)
+
+        message = template.format(
+            message,
+            original_type.__name__,
+            original_text
+        )
 
     else:
         message = original_message
 
+    if kwargs:
+        message = _get_text(message)
+
+        # RecoverableError adds this suffix using str.format, which fails
+        # for non-ASCII unicode message
+        if isinstance(message, unicode) and \
+                kwargs.get('retry_after') is not None:
+            message = u'{0} [retry_after={1}]'.format(
+                message,
+                kwargs['retry_after']
+            )
+
+        raise exception_class(message, **kwargs), None, original_traceback
+
     raise exception_class, message, original_traceback
@@ -1,3 +1,11 @@
+import inspect
+import sys
+import time
+from collections import OrderedDict
+
+from cloudify.state import current_ctx
+
+from .concurrency import map_limited
 from .constants import (
     SOURCE_PROPERTIES,
     SOURCE_RUNTIME_PROPERTIES,
@@ -10,6 +18,8 @@ from .constants import (
     SOURCES_DEFAULT_ORDER
 )
 from .exceptions import InputArgumentResolvingError
+from .mapping import LayeredMapping
+from .metrics import get_sink
 
 
 # Fix for flake 8
@@ -92,35 +102,458 @@ class InputArgumentResolvingRule(object):
         )
 
 
+def _compile_step(name):
+    # type of key is known up front - only type of data is checked later
+    if isinstance(name, int):
+        return lambda data: \
+            (True, data[name]) if isinstance(data, list) else (False, None)
+
+    if isinstance(name, basestring):
+        return lambda data: \
+            (True, data[name]) if isinstance(data, dict) and name in data \
+            else (False, None)
+
+    return lambda data: (False, None)
+
+
+class RuntimePropertiesTrie(object):
+
+    def __init__(self):
+        self.rules = []
+        self.children = OrderedDict()
+
+    def add(self, rule, path=None):
+        if path is None:
+            path = rule.runtime_properties_path
+
+        if not path:
+            self.rules.append(rule)
+            return
+
+        name = path[0]
+        key = (type(name), name)
+
+        if key not in self.children:
+            self.children[key] = (
+                name,
+                _compile_step(name),
+                RuntimePropertiesTrie()
+            )
+
+        self.children[key][2].add(rule, path[1:])
+
+    def iter_rules(self):
+        for rule in self.rules:
+            yield rule
+
+        for _, _, child in self.children.itervalues():
+            for rule in child.iter_rules():
+                yield rule
+
+    def evaluate(self, data, results=None):
+        # single traversal answering all rules - (exc_info, value) per rule
+        results = {} if results is None else results
+
+        for rule in self.rules:
+            results[rule] = (None, data)
+
+        for name, step, child in self.children.itervalues():
+            try:
+                is_found, value = step(data)
+            except Exception:
+                exc_info = sys.exc_info()
+
+                for rule in child.iter_rules():
+                    results[rule] = (exc_info, None)
+
+                continue
+
+            if is_found:
+                child.evaluate(value, results)
+                continue
+
+            for rule in child.iter_rules():
+                error = InputArgumentResolvingError(
+                    'Cannot resolve {0} - "{1}" key is not present in {2} '
+                    'value got from runtime_properties'
+                    .format(str(rule), name, data)
+                )
+                results[rule] = ((type(error), error, None), None)
+
+        return results
+
+
+class CompiledRuleGroup(object):
+
+    def __init__(self, rule):
+        # all rules of group have the same types - any of them can be checked
+        self.rule = rule
+        self.trie = RuntimePropertiesTrie()
+
+    def evaluate(self, relationship, node, instance):
+        # compiled rules use InputArgumentResolvingRule.check - inlined
+        relationship_type = self.rule.relationship_type
+        node_type = self.rule.node_type
+
+        if (not relationship_type or
+                relationship_type in relationship.type_hierarchy) and \
+                (not node_type or node_type in node.type_hierarchy):
+            return True, self.trie.evaluate(instance.runtime_properties)
+
+        return False, None
+
+    @staticmethod
+    def get(rule, results):
+        exc_info, value = results[rule]
+
+        if exc_info:
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        return value
+
+
+class CompiledRuleSet(list):
+
+    def __init__(self, rules=None):
+        super(CompiledRuleSet, self).__init__(rules or [])
+
+        self.groups = OrderedDict()
+        self._rule_groups = {}
+
+        for rule in self:
+            if not self.is_compilable(rule):
+                continue
+
+            key = (type(rule), rule.relationship_type, rule.node_type)
+
+            if key not in self.groups:
+                self.groups[key] = CompiledRuleGroup(rule)
+
+            self.groups[key].trie.add(rule)
+            self._rule_groups[id(rule)] = self.groups[key]
+
+    @staticmethod
+    def is_compilable(rule):
+        # rules customizing evaluation are evaluated one by one
+        rule_class = type(rule)
+
+        return isinstance(rule, InputArgumentResolvingRule) and all(
+            getattr(rule_class, name).__func__ is
+            getattr(InputArgumentResolvingRule, name).__func__
+            for name in ('evaluate', 'check', 'check_node_type',
+                         'check_relationship_type', 'get_runtime_property')
+        )
+
+    def get_group(self, rule):
+        return self._rule_groups.get(id(rule))
+
+
+def compile_rules(rules):
+    if isinstance(rules, CompiledRuleSet):
+        return rules
+
+    return CompiledRuleSet(rules)
+
+
+class _Candidates(object):
+    # items of iterable taken on demand and kept for next iterations
+
+    def __init__(self, iterable):
+        self._source = iter(iterable)
+        self._items = []
+
+    def __iter__(self):
+        if self._source is None:
+            return iter(self._items)
+
+        return self._iterate()
+
+    def _iterate(self):
+        items = self._items
+
+        # list iterator sees items appended meanwhile
+        for item in items:
+            yield item
+
+        position = len(items)
+
+        while True:
+            if position == len(items):
+                if self._source is None:
+                    return
+
+                try:
+                    items.append(next(self._source))
+                except StopIteration:
+                    self._source = None
+                    return
+
+            yield items[position]
+            position += 1
+
+
+class RelationshipIndex(object):
+
+    def __init__(self, relationships):
+        self.relationships = list(relationships)
+
+        self._candidates = {}
+
+    @staticmethod
+    def is_indexable(rule):
+        # rules checking types their own way see all relationships
+        rule_class = type(rule)
+
+        return isinstance(rule, InputArgumentResolvingRule) and all(
+            getattr(rule_class, name).__func__ is
+            getattr(InputArgumentResolvingRule, name).__func__
+            for name in ('evaluate', 'check', 'check_node_type',
+                         'check_relationship_type')
+        )
+
+    def get_rule_candidates(self, rule):
+        # node type is checked by rule itself - lazily, in order
+        if not self.is_indexable(rule):
+            return self.relationships
+
+        return self.get_candidates(rule.relationship_type)
+
+    def get_candidates(self, relationship_type=None):
+        # relationships of given type in order - found lazily, so scan stops
+        # at the furthest candidate any rule has needed
+        if not relationship_type:
+            return self.relationships
+
+        if relationship_type not in self._candidates:
+            self._candidates[relationship_type] = _Candidates(
+                relationship for relationship in self.relationships
+                if relationship_type in relationship.type_hierarchy
+            )
+
+        return self._candidates[relationship_type]
+
+    def iter_candidates(self, relationship_type=None, node_type=None):
+        # each target node is loaded only when previous candidates failed
+        for relationship in self.get_candidates(relationship_type):
+            if not node_type or \
+                    node_type in relationship.target.node.type_hierarchy:
+                yield relationship
+
+
 class InputArgumentResolver(object):
 
-    def __init__(self, rules):
-        self.rules = rules
+    # DeploymentSnapshot shared by resolvers (None - disabled)
+    SNAPSHOT = None
+
+    # MetricsSink receiving resolve statistics (None - process-wide one)
+    METRICS_SINK = None
+
+    def __init__(self, rules, snapshot=None):
+        self.rules = compile_rules(rules)
+        self.snapshot = snapshot or self.SNAPSHOT
+
+        # subclasses may override _resolve(rule, ctx) - without state
+        argspec = inspect.getargspec(self._resolve)
+        self._resolve_with_state = argspec.keywords is not None or \
+            len(argspec.args) > 3
+
+    def invalidate(self, ctx):
+        # called after operation - it might change its node instances
+        pass
+
+    def _prepare(self, ctx, rules):
+        # state shared by all rules resolved within single resolve call
+        return {}
 
-    def _resolve(self, rule, ctx):
+    def _evaluate(self, rule, subjects, evaluated=None):
+        # result of first successful evaluation of rule against subjects
+        group = self.rules.get_group(rule)
+
+        if group is None:
+            for subject in subjects:
+                is_successful, result = rule.evaluate(*subject)
+
+                if is_successful:
+                    return True, result
+
+            return False, None
+
+        evaluated = {} if evaluated is None else evaluated
+
+        if group not in evaluated:
+            evaluated[group] = None
+
+            for subject in subjects:
+                is_successful, results = group.evaluate(*subject)
+
+                if is_successful:
+                    evaluated[group] = results
+                    break
+
+        if evaluated[group] is None:
+            return False, None
+
+        return True, group.get(rule, evaluated[group])
+
+    def _resolve(self, rule, ctx, **state):
         pass
 
-    def resolve(self, ctx):
+    @staticmethod
+    def _get_relationships_count(state):
+        # number of relationships scanned within resolve call
+        return 0
+
+    def _report(self, metrics, rules, state, seconds):
+        metrics.timing('resolver.resolve', seconds)
+        metrics.increment('resolver.rules', len(rules))
+        metrics.increment(
+            'resolver.rule_groups',
+            len(state.get('evaluated') or ())
+        )
+        metrics.increment(
+            'resolver.relationships',
+            self._get_relationships_count(state)
+        )
+
+    def resolve(self, ctx, names=None):
+        # names - resolve only rules for those arguments (None - all rules)
+        rules = self.rules if names is None else [
+            rule for rule in self.rules if rule.argument_name in names
+        ]
+
+        if not rules:
+            return {}
+
+        metrics = self.METRICS_SINK or get_sink()
+        start = time.time() if metrics.enabled else None
+
         result = {}
+        state = self._prepare(ctx, rules)
 
-        for rule in self.rules:
-            result[rule.argument_name] = self._resolve(rule, ctx)
+        try:
+            for rule in rules:
+                if self._resolve_with_state:
+                    value = self._resolve(rule, ctx, **state)
+                else:
+                    value = self._resolve(rule, ctx)
+
+                result[rule.argument_name] = value
+        finally:
+            if start is not None:
+                self._report(metrics, rules, state, time.time() - start)
 
         return result
 
 
+def _load_runtime_properties(ctx, instance):
+    # node instances are loaded using manager client of current ctx, which
+    # is not set in pool threads
+    try:
+        with current_ctx.push(ctx):
+            instance.runtime_properties
+    except Exception as e:
+        # error will be raised again during evaluation
+        ctx.logger.debug(
+            'Cannot prefetch runtime properties of {0}: {1}'
+            .format(getattr(instance, 'id', instance), repr(e))
+        )
+
+
 class InstanceInputArgumentResolver(InputArgumentResolver):
 
-    def _resolve(self, rule, ctx):
-        for relationship in ctx.instance.relationships:
-            is_successful, result = rule.evaluate(
-                relationship,
-                relationship.target.node,
-                relationship.target.instance
+    # number of threads loading target node instances before evaluation
+    # (0 - prefetch disabled)
+    PREFETCH_WORKERS = 0
+
+    def __init__(self, rules, prefetch_workers=None, snapshot=None):
+        super(InstanceInputArgumentResolver, self).__init__(rules, snapshot)
+
+        self.prefetch_workers = self.PREFETCH_WORKERS \
+            if prefetch_workers is None else prefetch_workers
+
+    @staticmethod
+    def _get_prefetch_instances(rules, index):
+        # first candidate of each rule - the one which will be evaluated
+        instances = OrderedDict()
+
+        for rule in rules:
+            if not index.is_indexable(rule):
+                continue
+
+            for relationship in index.iter_candidates(
+                    rule.relationship_type,
+                    rule.node_type):
+
+                instance = relationship.target.instance
+                instances[id(instance)] = instance
+                break
+
+        return instances.values()
+
+    def _prefetch(self, ctx, rules, index):
+        instances = self._get_prefetch_instances(rules, index)
+
+        if len(instances) > 1:
+            map_limited(
+                lambda instance: _load_runtime_properties(ctx, instance),
+                instances,
+                self.prefetch_workers
+            )
+
+    def _get_relationships(self, ctx):
+        if not self.snapshot:
+            return ctx.instance.relationships
+
+        tenant_name = getattr(ctx, 'tenant_name', None)
+
+        return [
+            self.snapshot.get_relationship(
+                tenant_name,
+                ctx.deployment.id,
+                relationship
             )
+            for relationship in ctx.instance.relationships
+        ]
+
+    def invalidate(self, ctx):
+        if self.snapshot:
+            self.snapshot.invalidate(
+                getattr(ctx, 'tenant_name', None),
+                ctx.deployment.id,
+                ctx.instance.id
+            )
+
+    def _prepare(self, ctx, rules):
+        index = RelationshipIndex(self._get_relationships(ctx))
+
+        if self.prefetch_workers:
+            self._prefetch(ctx, rules, index)
 
-            if is_successful:
-                return result
+        return {
+            'index': index,
+            'evaluated': {}
+        }
+
+    @staticmethod
+    def _get_relationships_count(state):
+        return len(state['index'].relationships)
+
+    def _resolve(self, rule, ctx, index=None, evaluated=None):
+        index = index or RelationshipIndex(ctx.instance.relationships)
+
+        is_successful, result = self._evaluate(
+            rule,
+            (
+                (relationship,
+                 relationship.target.node,
+                 relationship.target.instance)
+                for relationship in index.get_rule_candidates(rule)
+            ),
+            evaluated
+        )
+
+        if is_successful:
+            return result
 
         if rule.required:
             raise InputArgumentResolvingError(
@@ -138,27 +571,67 @@ class RelationshipInputArgumentResolver(InputArgumentResolver):
             if relationship.target.instance.id == ctx.target.instance.id:
                 return relationship
 
-    def _resolve(self, rule, ctx):
+    def _get_subjects(self, ctx):
+        # (relationship, node, instance) in evaluation order - target first
         relationship_ctx = self._get_relationship_ctx(ctx)
 
-        if relationship_ctx:
-            is_successful, result = rule.evaluate(
-                relationship_ctx,
-                ctx.target.node,
-                ctx.target.instance
-            )
+        if not relationship_ctx:
+            return []
 
-            if is_successful:
-                return result
+        source_node, target_node = ctx.source.node, ctx.target.node
 
-            is_successful, result = rule.evaluate(
-                relationship_ctx,
-                ctx.source.node,
-                ctx.source.instance
+        # source and target instances are used as they are - operation is
+        # run for them, so only their types are taken from snapshot
+        if self.snapshot:
+            tenant_name = getattr(ctx, 'tenant_name', None)
+            deployment_id = ctx.deployment.id
+
+            relationship_ctx = self.snapshot.get_relationship(
+                tenant_name,
+                deployment_id,
+                relationship_ctx
+            )
+            source_node = self.snapshot.get_node(
+                tenant_name,
+                deployment_id,
+                source_node
+            )
+            target_node = self.snapshot.get_node(
+                tenant_name,
+                deployment_id,
+                target_node
             )
 
-            if is_successful:
-                return result
+        return [
+            (relationship_ctx, target_node, ctx.target.instance),
+            (relationship_ctx, source_node, ctx.source.instance)
+        ]
+
+    def invalidate(self, ctx):
+        if self.snapshot:
+            for subject in (ctx.source, ctx.target):
+                self.snapshot.invalidate(
+                    getattr(ctx, 'tenant_name', None),
+                    ctx.deployment.id,
+                    subject.instance.id
+                )
+
+    def _prepare(self, ctx, rules):
+        return {'subjects': self._get_subjects(ctx), 'evaluated': {}}
+
+    @staticmethod
+    def _get_relationships_count(state):
+        # source and target share single relationship
+        return 1 if state['subjects'] else 0
+
+    def _resolve(self, rule, ctx, subjects=None, evaluated=None):
+        if subjects is None:
+            subjects = self._get_subjects(ctx)
+
+        is_successful, result = self._evaluate(rule, subjects, evaluated)
+
+        if is_successful:
+            return result
 
         raise InputArgumentResolvingError(
             'Cannot resolve {0} - source and target nodes cannot be used'
@@ -190,18 +663,87 @@ class InputArgumentProvider(object):
             if provider.resolver else {}
     }
 
+    # sources which cannot change during deployment - values are cached by
+    # (source, tenant, deployment id, returned node id), other sources never
+    # are
+    CACHED_SOURCES = {
+        SOURCE_PROPERTIES:
+            lambda ctx: ctx.node.id,
+        SOURCE_SOURCE_PROPERTIES:
+            lambda ctx: ctx.source.node.id,
+        SOURCE_TARGET_PROPERTIES:
+            lambda ctx: ctx.target.node.id
+    }
+
+    # SourceCache of CACHED_SOURCES values, e.g. process-wide
+    # cache.SOURCE_CACHE (None - disabled)
+    SOURCE_CACHE = None
+
+    # get_input_arguments returns read-only LayeredMapping over sources
+    # instead of dict with copied values
+    LAYERED = False
+
+    # sources able to limit work to requested argument names
+    NAMED_SOURCES = {
+        SOURCE_RESOLVE:
+            lambda ctx, provider, kwargs, names:
+            provider.resolver.resolve(ctx, names)
+            if provider.resolver else {}
+    }
+
     @staticmethod
     def _combine(result, items_to_add):
         for k, v in items_to_add.iteritems():
             if k not in result:
                 result[k] = v
 
-    def __init__(self, resolver=None, sources_order=SOURCES_DEFAULT_ORDER):
+    @staticmethod
+    def _combine_named(result, items_to_add, missing_names):
+        for name in list(missing_names):
+            if name in items_to_add:
+                result[name] = items_to_add[name]
+                missing_names.discard(name)
+
+    def __init__(self, resolver=None, sources_order=SOURCES_DEFAULT_ORDER,
+                 layered=None):
         self.sources_order = sources_order
         self.resolver = resolver
+        self.layered = self.LAYERED if layered is None else layered
+
+    @classmethod
+    def register_source(cls, name, method, cache_key=None):
+        # cache_key(ctx) - id of node source reads (None - never cached)
+        cls.SOURCES = dict(cls.SOURCES)
+        cls.SOURCES[name] = method
+
+        cls.CACHED_SOURCES = dict(cls.CACHED_SOURCES)
+        cls.CACHED_SOURCES.pop(name, None)
+
+        if cache_key:
+            cls.CACHED_SOURCES[name] = cache_key
+
+    def _get_source(self, method_name, ctx, kwargs):
+        deployment_id = ctx.deployment.id \
+            if method_name in self.CACHED_SOURCES and self.SOURCE_CACHE \
+            else None
+
+        # local runs without deployment are not cached
+        if deployment_id is None:
+            return self.SOURCES[method_name](ctx, self, kwargs)
+
+        return self.SOURCE_CACHE.get(
+            (
+                method_name,
+                getattr(ctx, 'tenant_name', None),
+                deployment_id,
+                self.CACHED_SOURCES[method_name](ctx)
+            ),
+            lambda: self.SOURCES[method_name](ctx, self, kwargs)
+        )
 
     def get_input_arguments(self, ctx, **kwargs):
-        result_kwargs = {}
+        # earlier source in order wins
+        layers = []
 
         for method_name in self.sources_order:
             if method_name not in self.SOURCES:
@@ -213,9 +755,45 @@ class InputArgumentProvider(object):
 
                 continue
 
-            self._combine(
-                result_kwargs,
-                self.SOURCES[method_name](ctx, self, kwargs)
-            )
+            layers.append(self._get_source(method_name, ctx, kwargs))
+
+        if self.layered:
+            return LayeredMapping(*layers)
+
+        result_kwargs = {}
+
+        for layer in layers:
+            self._combine(result_kwargs, layer)
+
+        return result_kwargs
+
+    def get_named_input_arguments(self, ctx, names, kwargs):
+        # sources are evaluated only until all named arguments are found
+        result_kwargs = {}
+        missing_names = set(names)
+
+        for method_name in self.sources_order:
+            if not missing_names:
+                break
+
+            if method_name in self.NAMED_SOURCES:
+                items = self.NAMED_SOURCES[method_name](
+                    ctx,
+                    self,
+                    kwargs,
+                    frozenset(missing_names)
+                )
+            elif method_name in self.SOURCES:
+                items = self._get_source(method_name, ctx, kwargs)
+            else:
+                ctx.logger.warn(
+                    'Unknown input arguments source: {0}. '
+                    'Skipping.'
+                    .format(method_name)
+                )
+
+                continue
+
+            self._combine_named(result_kwargs, items, missing_names)
 
         return result_kwargs
@@ -0,0 +1,33 @@
+from collections import Mapping
+
+
+class LayeredMapping(Mapping):
+
+    def __init__(self, *layers):
+        # layers are ordered by priority - value from first layer wins
+        self._layers = layers
+
+    def __getitem__(self, key):
+        for layer in self._layers:
+            if key in layer:
+                return layer[key]
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self._layers)
+
+    def __iter__(self):
+        seen = set()
+
+        for layer in self._layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, dict(self.items()))
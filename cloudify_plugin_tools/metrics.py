@@ -0,0 +1,232 @@
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+
+
+class MetricsSink(object):
+    # Does nothing - instrumented code skips measurements when not enabled
+
+    enabled = False
+
+    def timing(self, name, seconds, tags=None):
+        pass
+
+    def increment(self, name, value=1, tags=None):
+        pass
+
+    def flush(self):
+        # called after each operation
+        pass
+
+
+NULL_SINK = MetricsSink()
+
+_SINK = [NULL_SINK]
+
+
+def get_sink():
+    return _SINK[0]
+
+
+def set_sink(sink):
+    # process-wide sink used by runners / resolvers without own METRICS_SINK
+    _SINK[0] = sink or NULL_SINK
+
+
+def _get_key(name, tags):
+    return name, tuple(sorted(tags.iteritems())) if tags else ()
+
+
+class InMemorySink(MetricsSink):
+
+    enabled = True
+
+    def __init__(self):
+        # (name, tags) -> [count, total seconds, max seconds]
+        self.timings = {}
+        # (name, tags) -> total value
+        self.counters = {}
+
+        self._lock = threading.Lock()
+
+    def timing(self, name, seconds, tags=None):
+        key = _get_key(name, tags)
+
+        with self._lock:
+            entry = self.timings.get(key)
+
+            if entry is None:
+                self.timings[key] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def increment(self, name, value=1, tags=None):
+        key = _get_key(name, tags)
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self.timings.clear()
+            self.counters.clear()
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict(
+                (name if not tags else (name, tags), {
+                    'count': count,
+                    'total': total,
+                    'max': maximum
+                })
+                for (name, tags), (count, total, maximum)
+                in self.timings.iteritems()
+            )
+            stats.update(
+                (name if not tags else (name, tags), value)
+                for (name, tags), value in self.counters.iteritems()
+            )
+
+        return stats
+
+
+class StatsdSink(MetricsSink):
+    # Sends each measurement as single UDP datagram (errors are ignored)
+
+    enabled = True
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='cloudify',
+                 use_tags=False):
+
+        # use_tags - send tags in DogStatsD format, otherwise they are dropped
+        self.address = (host, port)
+        self.prefix = prefix + '.' if prefix else ''
+        self.use_tags = use_tags
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _format(self, name, value, metric_type, tags):
+        line = '{0}{1}:{2}|{3}'.format(self.prefix, name, value, metric_type)
+
+        if tags and self.use_tags:
+            line += '|#' + ','.join(
+                '{0}:{1}'.format(k, v) for k, v in sorted(tags.iteritems())
+            )
+
+        return line
+
+    def _send(self, line):
+        try:
+            self._socket.sendto(line, self.address)
+        except socket.error:
+            pass
+
+    def timing(self, name, seconds, tags=None):
+        self._send(
+            self._format(name, '{0:.3f}'.format(seconds * 1000), 'ms', tags)
+        )
+
+    def increment(self, name, value=1, tags=None):
+        self._send(self._format(name, value, 'c', tags))
+
+
+class PrometheusTextfileSink(InMemorySink):
+    # Writes aggregated measurements for textfile collector of node exporter,
+    # at most once per interval seconds, replacing file atomically
+
+    def __init__(self, path, prefix='cloudify', interval=10):
+        # path - '{pid}' is replaced with process id (one file per worker)
+        super(PrometheusTextfileSink, self).__init__()
+
+        self.path = path.format(pid=os.getpid())
+        self.prefix = prefix + '_' if prefix else ''
+        self.interval = interval
+
+        self._written_at = None
+
+    def _get_name(self, name):
+        return self.prefix + re.sub('[^a-zA-Z0-9_]', '_', name)
+
+    @staticmethod
+    def _get_labels(tags):
+        if not tags:
+            return ''
+
+        return '{' + ','.join(
+            '{0}="{1}"'.format(
+                k,
+                str(v).replace('\\', '\\\\').replace('"', '\\"')
+            )
+            for k, v in tags
+        ) + '}'
+
+    def render(self):
+        with self._lock:
+            timings = sorted(self.timings.iteritems())
+            counters = sorted(self.counters.iteritems())
+
+        lines = []
+        types = set()
+
+        for (name, tags), (count, total, _) in timings:
+            name = self._get_name(name) + '_seconds'
+
+            if name not in types:
+                types.add(name)
+                lines.append('# TYPE {0} summary'.format(name))
+
+            labels = self._get_labels(tags)
+            lines.append('{0}_count{1} {2}'.format(name, labels, count))
+            lines.append('{0}_sum{1} {2!r}'.format(name, labels, total))
+
+        for (name, tags), value in counters:
+            name = self._get_name(name) + '_total'
+
+            if name not in types:
+                types.add(name)
+                lines.append('# TYPE {0} counter'.format(name))
+
+            lines.append('{0}{1} {2}'.format(
+                name,
+                self._get_labels(tags),
+                value
+            ))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        content = self.render()
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)),
+            prefix='.metrics'
+        )
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+
+            # readable by exporter running as other user
+            os.chmod(temp_path, 0o644)
+
+            # node exporter reads only *.prom files, temp file is never read
+            os.rename(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        self._written_at = time.time()
+
+    def flush(self):
+        if self._written_at is None or \
+                time.time() - self._written_at >= self.interval:
+            try:
+                self.write()
+            except (IOError, OSError):
+                # metrics must not break operation, next flush tries again
+                pass
@@ -0,0 +1,59 @@
+import random
+import time
+
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_INITIAL_DELAY = 0.5
+DEFAULT_MAX_DELAY = 10
+DEFAULT_MULTIPLIER = 2
+DEFAULT_JITTER = 0.5
+DEFAULT_BUDGET = 30
+
+
+class RetryPolicy(object):
+    # Local retries of recoverable failures, before operation is given
+    # back to manager (which reschedules it with own retry interval)
+
+    def __init__(self,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 initial_delay=DEFAULT_INITIAL_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY,
+                 multiplier=DEFAULT_MULTIPLIER,
+                 jitter=DEFAULT_JITTER,
+                 budget=DEFAULT_BUDGET):
+
+        # jitter - part of delay which is randomly dropped (0 - none)
+        # budget - seconds from first attempt after which no retry starts
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.budget = budget
+
+        self._random = random.Random()
+
+    clock = staticmethod(time.time)
+    sleep = staticmethod(time.sleep)
+
+    def get_delay(self, attempt):
+        # attempt - number of attempt which has just failed (from 1)
+        delay = min(
+            self.max_delay,
+            self.initial_delay * self.multiplier ** (attempt - 1)
+        )
+
+        return delay * (1 - self.jitter * self._random.random())
+
+    def get_retry_delay(self, attempt, started_at, retry_after=None):
+        # None - no attempts / budget left, error should be escalated
+        # retry_after - seconds server asked to wait (minimal delay)
+        if attempt >= self.max_attempts:
+            return None
+
+        delay = max(self.get_delay(attempt), retry_after or 0)
+
+        if self.clock() + delay - started_at > self.budget:
+            return None
+
+        return delay
@@ -1,9 +1,60 @@
+import inspect
+import sys
+import time
+
+from cloudify.state import current_ctx
+
+from .concurrency import (
+    DEFAULT_MAX_WORKERS,
+    map_limited
+)
+from .exceptions import FanOutError
 from .input_arguments import (
     InputArgumentProvider,
     InputArgumentResolver,
     InstanceInputArgumentResolver,
     RelationshipInputArgumentResolver
 )
+from .mapping import LayeredMapping
+from .metrics import get_sink
+
+
+class TaskSignature(object):
+
+    def __init__(self, task):
+        try:
+            spec = inspect.getargspec(task)
+        except TypeError:
+            spec = None
+
+        names = tuple(spec.args) if spec else ()
+
+        if inspect.ismethod(task) and task.__self__ is not None:
+            names = names[1:]
+
+        self.names = names
+        self.accepts_kwargs = spec is None or spec.keywords is not None
+
+    def get_input_argument_names(self, injected=1):
+        # None - task takes **kwargs, so all input arguments are needed
+        if self.accepts_kwargs:
+            return None
+
+        return self.names[injected:]
+
+
+_TASK_SIGNATURES = {}
+
+
+def get_task_signature(task):
+    try:
+        return _TASK_SIGNATURES[task]
+    except KeyError:
+        signature = _TASK_SIGNATURES[task] = TaskSignature(task)
+    except TypeError:
+        signature = TaskSignature(task)
+
+    return signature
 
 
 class TaskRunner(object):
@@ -12,26 +63,92 @@ class TaskRunner(object):
 
     INPUTS_PROVIDER_CLASS = InputArgumentProvider
 
+    # MetricsSink receiving phases timings (None - process-wide one)
+    METRICS_SINK = None
+
     def __init__(self,
                  ctx,
                  resolving_rules,
                  sources_order,
-                 api_ctx_provider_cls=None):
+                 api_ctx_provider_cls=None,
+                 inputs_provider=None):
 
         self.ctx = ctx
 
-        self.inputs_resolver = self.RESOLVER_CLASS(resolving_rules)
-        self.inputs_provider = self.INPUTS_PROVIDER_CLASS(
-            self.inputs_resolver,
-            sources_order
-        )
+        # inputs_provider - built once (see create_inputs_provider) and
+        # shared by operations, resolver and provider keep no ctx state
+        if inputs_provider is None:
+            self.inputs_resolver = self.RESOLVER_CLASS(resolving_rules)
+            self.inputs_provider = self.INPUTS_PROVIDER_CLASS(
+                self.inputs_resolver,
+                sources_order
+            )
+        else:
+            self.inputs_resolver = inputs_provider.resolver
+            self.inputs_provider = inputs_provider
 
         self.api_ctx_provider = api_ctx_provider_cls(ctx.logger) \
             if api_ctx_provider_cls else None
 
+        self._metrics = None
+
+    @classmethod
+    def create_inputs_provider(cls, resolving_rules, sources_order):
+        return cls.INPUTS_PROVIDER_CLASS(
+            cls.RESOLVER_CLASS(resolving_rules),
+            sources_order
+        )
+
+    def _timed(self, name, task, method, *args):
+        # sink enabled for current run (None - method is just called)
+        metrics = self._metrics
+
+        if metrics is None:
+            return method(*args)
+
+        start = time.time()
+
+        try:
+            return method(*args)
+        finally:
+            metrics.timing(
+                'runner.' + name,
+                time.time() - start,
+                {'task': getattr(task, '__name__', type(task).__name__)}
+            )
+
     def prepare_input_arguments(self, **kwargs):
         return self.inputs_provider.get_input_arguments(self.ctx, **kwargs)
 
+    def prepare_named_input_arguments(self, names, kwargs):
+        return self.inputs_provider.get_named_input_arguments(
+            self.ctx,
+            names,
+            kwargs
+        )
+
+    def get_task_input_argument_names(self, task):
+        # ctx (and api_ctx if provider is set) are injected positionally
+        return get_task_signature(task).get_input_argument_names(
+            2 if self.api_ctx_provider else 1
+        )
+
+    def get_input_argument_names(self, task):
+        # None - all input arguments are needed
+        names = self.get_task_input_argument_names(task)
+
+        if names is None or not self.api_ctx_provider:
+            return names
+
+        api_names = getattr(self.api_ctx_provider, 'INPUT_ARGUMENTS', None)
+
+        if api_names is None:
+            return None
+
+        return tuple(names) + tuple(
+            name for name in api_names if name not in names
+        )
+
     def prepare_api_context(self, input_parameters):
         if self.api_ctx_provider:
             return self.api_ctx_provider.get_api_ctx(input_parameters)
@@ -44,11 +161,150 @@ class TaskRunner(object):
 
         return task(self.ctx, **input_arguments)
 
+    def get_task_input_arguments(self, task, input_arguments):
+        task_names = self.get_task_input_argument_names(task)
+
+        if task_names is None:
+            return input_arguments
+
+        return dict(
+            (name, input_arguments[name])
+            for name in task_names
+            if name in input_arguments
+        )
+
+    def execute(self, task, input_arguments):
+        api_ctx = self._timed(
+            'prepare_api_context',
+            task,
+            self.prepare_api_context,
+            input_arguments
+        )
+        task_input_arguments = self.get_task_input_arguments(
+            task,
+            input_arguments
+        )
+
+        try:
+            return self._timed(
+                'do_run',
+                task,
+                self.do_run,
+                task,
+                task_input_arguments,
+                api_ctx
+            )
+        except Exception:
+            exc_info = sys.exc_info()
+
+            if self.api_ctx_provider:
+                self.api_ctx_provider.handle_error(
+                    input_arguments,
+                    exc_info[1]
+                )
+
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+    def _prepare_task_input_arguments(self, task, kwargs):
+        names = self.get_input_argument_names(task)
+
+        if names is None:
+            return self.prepare_input_arguments(**kwargs)
+
+        return self.prepare_named_input_arguments(names, kwargs)
+
+    def _run(self, task, kwargs):
+        input_arguments = self._timed(
+            'prepare_input_arguments',
+            task,
+            self._prepare_task_input_arguments,
+            task,
+            kwargs
+        )
+
+        try:
+            return self.execute(task, input_arguments)
+        finally:
+            self.inputs_resolver.invalidate(self.ctx)
+
     def run(self, task, *args, **kwargs):
-        input_arguments = self.prepare_input_arguments(**kwargs)
-        api_ctx = self.prepare_api_context(input_arguments)
+        metrics = self.METRICS_SINK or get_sink()
+
+        if not metrics.enabled:
+            return self._run(task, kwargs)
+
+        self._metrics = metrics
+
+        try:
+            return self._timed('run', task, self._run, task, kwargs)
+        finally:
+            self._metrics = None
+            metrics.flush()
+
+
+class FanOutTaskRunner(TaskRunner):
+    # Runs task once per credentials set (with own ApiContext) concurrently,
+    # to be combined with other runners, e.g.:
+    # class Runner(FanOutTaskRunner, InstanceTaskRunner)
+    # Retry of failed operation runs task for all targets again (also for
+    # those which succeeded) - task must be idempotent per target
+
+    # input argument with list of credentials sets (dictionaries overriding
+    # input arguments for given target), if missing task is run once
+    CREDENTIALS_LIST_ARGUMENT = 'credentials_list'
+
+    MAX_WORKERS = DEFAULT_MAX_WORKERS
+
+    def get_input_argument_names(self, task):
+        names = super(FanOutTaskRunner, self).get_input_argument_names(task)
+
+        if names is None or self.CREDENTIALS_LIST_ARGUMENT in names:
+            return names
+
+        return tuple(names) + (self.CREDENTIALS_LIST_ARGUMENT,)
+
+    def get_targets_input_arguments(self, input_arguments):
+        credentials_list = input_arguments.get(self.CREDENTIALS_LIST_ARGUMENT)
+
+        if not credentials_list:
+            return None
+
+        return [
+            LayeredMapping(credentials, input_arguments)
+            for credentials in credentials_list
+        ]
+
+    def _execute_target(self, task, input_arguments):
+        # worker threads do not share ctx set for operation thread
+        try:
+            with current_ctx.push(self.ctx):
+                execute = super(FanOutTaskRunner, self).execute
+                return execute(task, input_arguments), None
+        except Exception as error:
+            return None, error
+
+    def execute(self, task, input_arguments):
+        targets = self.get_targets_input_arguments(input_arguments)
+
+        if targets is None:
+            return super(FanOutTaskRunner, self).execute(
+                task,
+                input_arguments
+            )
+
+        outcomes = map_limited(
+            lambda target: self._execute_target(task, target),
+            targets,
+            self.MAX_WORKERS,
+            'fan-out'
+        )
+        results = [result for result, _ in outcomes]
+        errors = [error for _, error in outcomes]
+
+        if any(error is not None for error in errors):
+            raise FanOutError(errors, results)
 
-        return self.do_run(task, input_arguments, api_ctx)
+        return results
 
 
 class RelationshipTaskRunner(TaskRunner):
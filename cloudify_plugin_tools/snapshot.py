@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_SIZE = 10000
+
+
+class _SnapshotNode(object):
+
+    def __init__(self, snapshot, tenant_name, deployment_id, node):
+        self._snapshot = snapshot
+        self._tenant_name = tenant_name
+        self._deployment_id = deployment_id
+        self._node = node
+
+    @property
+    def type_hierarchy(self):
+        return self._snapshot.get_node_type_hierarchy(
+            self._tenant_name,
+            self._deployment_id,
+            self._node
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._node, name)
+
+
+class _SnapshotNodeInstance(object):
+
+    def __init__(self, snapshot, tenant_name, deployment_id, instance):
+        self._snapshot = snapshot
+        self._tenant_name = tenant_name
+        self._deployment_id = deployment_id
+        self._instance = instance
+
+    @property
+    def runtime_properties(self):
+        return self._snapshot.get_runtime_properties(
+            self._tenant_name,
+            self._deployment_id,
+            self._instance
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._instance, name)
+
+
+class _SnapshotRelationshipSubject(object):
+
+    def __init__(self, node, instance):
+        self.node = node
+        self.instance = instance
+
+
+class _SnapshotRelationship(object):
+
+    def __init__(self,
+                 snapshot,
+                 tenant_name,
+                 deployment_id,
+                 relationship,
+                 target):
+
+        self._snapshot = snapshot
+        self._tenant_name = tenant_name
+        self._deployment_id = deployment_id
+        self._relationship = relationship
+
+        self.target = target
+
+    @property
+    def type_hierarchy(self):
+        return self._snapshot.get_relationship_type_hierarchy(
+            self._tenant_name,
+            self._deployment_id,
+            self._relationship
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._relationship, name)
+
+
+class DeploymentSnapshot(object):
+    # entries are keyed by tenant name and deployment id - deployment ids
+    # are unique only within tenant
+
+    def __init__(self, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE):
+        # ttl - the only bound of staleness of node instances changed by
+        # other worker processes (own operations invalidate their instances)
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, load):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            # (value, expires_at)
+            if entry and entry[1] > now:
+                self.hits += 1
+                self._entries[key] = self._entries.pop(key)
+
+                return entry[0]
+
+            self.misses += 1
+
+        value = load()
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, now + self.ttl)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def get_node_type_hierarchy(self, tenant_name, deployment_id, node):
+        return self._get(
+            ('node', tenant_name, deployment_id, node.id),
+            lambda: node.type_hierarchy
+        )
+
+    def get_relationship_type_hierarchy(self,
+                                        tenant_name,
+                                        deployment_id,
+                                        relationship):
+        return self._get(
+            ('relationship', tenant_name, deployment_id, relationship.type),
+            lambda: relationship.type_hierarchy
+        )
+
+    def get_runtime_properties(self, tenant_name, deployment_id, instance):
+        return self._get(
+            ('instance', tenant_name, deployment_id, instance.id),
+            lambda: instance.runtime_properties
+        )
+
+    def get_node(self, tenant_name, deployment_id, node):
+        return _SnapshotNode(self, tenant_name, deployment_id, node)
+
+    def get_node_instance(self, tenant_name, deployment_id, instance):
+        return _SnapshotNodeInstance(
+            self,
+            tenant_name,
+            deployment_id,
+            instance
+        )
+
+    def get_relationship(self, tenant_name, deployment_id, relationship):
+        return _SnapshotRelationship(
+            self,
+            tenant_name,
+            deployment_id,
+            relationship,
+            _SnapshotRelationshipSubject(
+                self.get_node(
+                    tenant_name,
+                    deployment_id,
+                    relationship.target.node
+                ),
+                self.get_node_instance(
+                    tenant_name,
+                    deployment_id,
+                    relationship.target.instance
+                )
+            )
+        )
+
+    def invalidate(self, tenant_name, deployment_id, instance_id):
+        with self._lock:
+            self._entries.pop(
+                ('instance', tenant_name, deployment_id, instance_id),
+                None
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries)
+        }
+
+
+DEPLOYMENT_SNAPSHOT = DeploymentSnapshot()
@@ -1,7 +1,12 @@
+import os
+import shutil
+import stat
+import tempfile
 import unittest
 from mock import Mock
 
 from cloudify_plugin_tools import api
+from cloudify_plugin_tools.cache import ApiContextCache
 
 
 class TestApiContext(unittest.TestCase):
@@ -40,3 +45,225 @@ class TestApiContextProvider(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             # when
             api_ctx_provider.get_api_ctx(input_paramaters)
+
+
+class AuthError(Exception):
+    pass
+
+
+class TestCachingApiContextProvider(unittest.TestCase):
+
+    class Provider(api.CachingApiContextProvider):
+
+        CREDENTIALS_ARGUMENTS = ['host', 'user', 'password']
+
+        AUTH_ERRORS = (AuthError,)
+
+        created = []
+
+        def create_api_ctx(self, input_parameters):
+            api_ctx = api.ApiContext(Mock(), dict(input_parameters))
+            self.created.append(api_ctx)
+
+            return api_ctx
+
+    def setUp(self):
+        self.Provider.API_CTX_CACHE = ApiContextCache(ttl=30, max_size=2)
+        self.Provider.created = []
+
+        self.input_parameters = {
+            'host': '1.2.3.4',
+            'user': 'admin',
+            'password': 'secret',
+            'name': 'vn1'
+        }
+
+    def _get(self, **changes):
+        input_parameters = dict(self.input_parameters, **changes)
+
+        return self.Provider(Mock()).get_api_ctx(input_parameters)
+
+    def test_get_api_ctx_reused_between_operations(self):
+        # when
+        first = self._get()
+        second = self._get(name='vn2')
+
+        # then
+        self.assertIs(first, second)
+        self.assertEquals(len(self.Provider.created), 1)
+
+    def test_get_api_ctx_keyed_by_credentials(self):
+        # when
+        first = self._get()
+        second = self._get(user='other')
+
+        # then
+        self.assertIsNot(first, second)
+        self.assertEquals(len(self.Provider.created), 2)
+
+    def test_get_api_ctx_ttl(self):
+        # given
+        self.Provider.API_CTX_CACHE = ApiContextCache(ttl=0)
+
+        # when
+        self._get()
+        self._get()
+
+        # then
+        self.assertEquals(len(self.Provider.created), 2)
+
+    def test_get_api_ctx_lru(self):
+        # given
+        self._get(user='a')
+        self._get(user='b')
+        self._get(user='a')
+        self._get(user='c')
+
+        # when
+        self._get(user='a')
+        self._get(user='b')
+
+        # then
+        self.assertEquals(len(self.Provider.created), 4)
+
+    def test_get_credentials_key_is_hash(self):
+        # when
+        key = self.Provider(Mock()).get_credentials_key(self.input_parameters)
+
+        # then
+        self.assertEquals(len(key), 64)
+        self.assertNotIn('secret', key)
+
+    def test_get_api_ctx_without_credentials_arguments_not_cached(self):
+        # given
+        class Provider(self.Provider):
+            CREDENTIALS_ARGUMENTS = None
+
+        provider = Provider(Mock())
+
+        # when
+        first = provider.get_api_ctx(self.input_parameters)
+        second = provider.get_api_ctx(self.input_parameters)
+        provider.handle_error(self.input_parameters, AuthError())
+
+        # then
+        self.assertIsNot(first, second)
+        self.assertIsNone(provider.get_credentials_key(self.input_parameters))
+        self.assertEquals(self.Provider.API_CTX_CACHE.stats['size'], 0)
+
+    def test_handle_error_auth_error_invalidates(self):
+        # given
+        provider = self.Provider(Mock())
+        first = self._get()
+
+        # when
+        provider.handle_error(self.input_parameters, AuthError())
+        second = self._get()
+
+        # then
+        self.assertIsNot(first, second)
+        self.assertEquals(
+            self.Provider.API_CTX_CACHE.stats['invalidations'],
+            1
+        )
+
+    def test_handle_error_other_error(self):
+        # given
+        provider = self.Provider(Mock())
+        first = self._get()
+
+        # when
+        provider.handle_error(self.input_parameters, IOError())
+
+        # then
+        self.assertIs(self._get(), first)
+
+    def test_create_api_ctx(self):
+        # then
+        with self.assertRaises(NotImplementedError):
+            # when
+            api.CachingApiContextProvider(Mock()).get_api_ctx({})
+
+    def test_get_token_without_store_key(self):
+        # given
+        login = Mock(return_value=('token', 3600))
+        provider = self.Provider(Mock())
+
+        # when
+        first = provider.get_token(self.input_parameters, login)
+        second = provider.get_token(self.input_parameters, login)
+
+        # then
+        self.assertEquals((first, second), ('token', 'token'))
+        self.assertEquals(login.call_count, 2)
+        self.assertIsNone(provider.get_token_store(self.input_parameters))
+
+
+class TestCachingApiContextProviderTokenStore(unittest.TestCase):
+
+    class Provider(api.CachingApiContextProvider):
+
+        CREDENTIALS_ARGUMENTS = ['host', 'user', 'password']
+
+        AUTH_ERRORS = (AuthError,)
+
+        TOKEN_STORE_KEY_ARGUMENT = 'token_store_key'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.Provider.TOKEN_STORE_PATH = os.path.join(
+            self.directory,
+            'tokens'
+        )
+
+        self.input_parameters = {
+            'host': '1.2.3.4',
+            'user': 'admin',
+            'password': 'secret',
+            'token_store_key': 'key'
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestCachingApiContextProviderTokenStore, self).tearDown()
+
+    def test_get_token_stored(self):
+        # given
+        login = Mock(return_value=('token', 3600))
+
+        # when
+        first = self.Provider(Mock()).get_token(self.input_parameters, login)
+        second = self.Provider(Mock()).get_token(self.input_parameters, login)
+
+        # then
+        self.assertEquals((first, second), ('token', 'token'))
+        login.assert_called_once_with()
+        self.Provider(Mock()).get_token_store(self.input_parameters).close()
+
+    def test_handle_error_auth_error_invalidates_token(self):
+        # given
+        login = Mock(side_effect=[('token1', 3600), ('token2', 3600)])
+        provider = self.Provider(Mock())
+        provider.get_token(self.input_parameters, login)
+
+        # when
+        provider.handle_error(self.input_parameters, AuthError())
+        token = provider.get_token(self.input_parameters, login)
+
+        # then
+        self.assertEquals(token, 'token2')
+        provider.get_token_store(self.input_parameters).close()
+
+    def test_get_token_store_default_path(self):
+        # given
+        directory = os.path.join(self.directory, 'private', 'tokens')
+        self.Provider.TOKEN_STORE_PATH = None
+        self.Provider.TOKEN_STORE_DIRECTORY = directory
+
+        # when
+        store = self.Provider(Mock()).get_token_store(self.input_parameters)
+
+        # then
+        self.assertEquals(os.path.dirname(store.path), directory)
+        self.assertIn(self.Provider.__name__, store.path)
+        self.assertEquals(stat.S_IMODE(os.stat(directory).st_mode), 0o700)
@@ -0,0 +1,162 @@
+import unittest
+
+from cloudify.context import ImmutableProperties
+from mock import Mock, patch
+
+from cloudify_plugin_tools.cache import (
+    ApiContextCache,
+    SourceCache
+)
+
+
+class TestSourceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SourceCache(max_size=2)
+
+    def test_get_loads_once(self):
+        # given
+        load = Mock(return_value={'a': 1})
+
+        # when
+        results = [self.cache.get('key', load) for _ in range(3)]
+
+        # then
+        self.assertEquals(results, [{'a': 1}] * 3)
+        load.assert_called_once_with()
+        self.assertEquals(
+            self.cache.stats,
+            {'hits': 2, 'misses': 1, 'size': 1}
+        )
+
+    def test_get_returns_copies(self):
+        # given
+        loaded = {'a': [1]}
+        first = self.cache.get('key', lambda: loaded)
+
+        # when
+        first['a'].append(2)
+        second = self.cache.get('key', None)
+        second['a'].append(3)
+
+        # then
+        self.assertEquals(self.cache.get('key', None), {'a': [1]})
+        self.assertIs(first, loaded)
+
+    def test_get_immutable_properties(self):
+        # given
+        properties = ImmutableProperties({'a': {'b': 1}})
+
+        # when
+        first = self.cache.get('key', lambda: properties)
+        second = self.cache.get('key', None)
+        second['a']['b'] = 2
+
+        # then
+        self.assertIs(first, properties)
+        self.assertEquals(second, {'a': {'b': 2}})
+        self.assertEquals(self.cache.get('key', None), {'a': {'b': 1}})
+
+    def test_get_expired(self):
+        # given
+        self.cache.ttl = 10
+        self.cache.get('key', lambda: 1)
+
+        # when
+        with patch('time.time', return_value=10 ** 10):
+            result = self.cache.get('key', lambda: 'reloaded')
+
+        # then
+        self.assertEquals(result, 'reloaded')
+        self.assertEquals(self.cache.stats['misses'], 2)
+
+    def test_get_lru(self):
+        # given
+        self.cache.get('a', lambda: 1)
+        self.cache.get('b', lambda: 2)
+        self.cache.get('a', lambda: 1)
+
+        # when
+        self.cache.get('c', lambda: 3)
+
+        # then
+        self.assertEquals(self.cache.get('a', lambda: 'reloaded'), 1)
+        self.assertEquals(self.cache.get('b', lambda: 'reloaded'), 'reloaded')
+
+    def test_get_error_not_cached(self):
+        # given
+        load = Mock(side_effect=[IOError, 'value'])
+
+        # then
+        with self.assertRaises(IOError):
+            self.cache.get('key', load)
+
+        self.assertEquals(self.cache.get('key', load), 'value')
+
+    def test_clear(self):
+        # given
+        self.cache.get('a', lambda: 1)
+
+        # when
+        self.cache.clear()
+
+        # then
+        self.assertEquals(self.cache.stats['size'], 0)
+
+
+class TestApiContextCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ApiContextCache(ttl=30, max_size=2)
+
+    def test_get_set(self):
+        # given
+        api_ctx = Mock()
+
+        # when
+        missing = self.cache.get('key')
+        self.cache.set('key', api_ctx)
+
+        # then
+        self.assertIsNone(missing)
+        self.assertIs(self.cache.get('key'), api_ctx)
+        self.assertEquals(self.cache.stats, {
+            'hits': 1,
+            'misses': 1,
+            'invalidations': 0,
+            'size': 1
+        })
+
+    def test_get_expired(self):
+        # given
+        cache = ApiContextCache(ttl=0)
+        cache.set('key', Mock())
+
+        # then
+        self.assertIsNone(cache.get('key'))
+        self.assertEquals(cache.stats['size'], 0)
+
+    def test_set_lru(self):
+        # given
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+
+        # when
+        self.cache.set('c', 3)
+
+        # then
+        self.assertEquals(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_invalidate(self):
+        # given
+        self.cache.set('a', 1)
+
+        # when
+        self.cache.invalidate('a')
+        self.cache.invalidate('b')
+
+        # then
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEquals(self.cache.stats['invalidations'], 1)
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+
+from mock import patch
+
+from cloudify_plugin_tools import concurrency
+from cloudify_plugin_tools.concurrency import (
+    get_thread_pool,
+    map_limited
+)
+
+
+class TestGetThreadPool(unittest.TestCase):
+
+    def test_get_thread_pool_shared(self):
+        # then
+        self.assertIs(get_thread_pool(3), get_thread_pool(3))
+        self.assertIsNot(get_thread_pool(3), get_thread_pool(3, 'other'))
+
+    def test_get_thread_pool_size_capped(self):
+        # given
+        pools = {}
+
+        # when
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_POOL_SIZE', 3):
+            pool = get_thread_pool(1000)
+
+        # then
+        self.assertEquals(pools.keys(), [(None, 3)])
+        self.assertIs(pools[(None, 3)], pool)
+
+    def test_get_thread_pool_count_capped_per_name(self):
+        # given
+        pools = {}
+
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_THREAD_POOLS', 1):
+            first = get_thread_pool(2)
+
+            # when
+            closest = get_thread_pool(5)
+            named = get_thread_pool(5, 'fan-out')
+
+        # then
+        self.assertIs(closest, first)
+        self.assertIsNot(named, first)
+        self.assertEquals(sorted(pools.keys()), [(None, 2), ('fan-out', 5)])
+
+
+class TestMapLimited(unittest.TestCase):
+
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _run(self, item):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.01)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        return item * 2
+
+    def test_map_limited(self):
+        # when
+        result = map_limited(self._run, range(5), 2)
+
+        # then
+        self.assertEquals(result, [0, 2, 4, 6, 8])
+
+    def test_map_limited_bigger_pool(self):
+        # given
+        pools = {(None, 8): ThreadPool(8)}
+
+        # when
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_THREAD_POOLS', 1):
+            result = map_limited(self._run, range(8), 2)
+
+        # then
+        self.assertEquals(result, range(0, 16, 2))
+        self.assertEquals(self.max_in_flight, 2)
+        pools[(None, 8)].terminate()
+
+    def test_map_limited_error(self):
+        # then
+        with self.assertRaises(ZeroDivisionError):
+            # when
+            map_limited(lambda item: 1 / item, [1, 0, 2], 2)
@@ -12,8 +12,17 @@ from cloudify.mocks import MockCloudifyContext
 
 from cloudify_plugin_tools import InputArgumentResolvingRule
 from cloudify_plugin_tools.constants import SOURCES_DEFAULT_ORDER
-from cloudify_plugin_tools.decorators import run_with
-from cloudify_plugin_tools.exceptions import UnreachableApiError
+from cloudify_plugin_tools.decorators import (
+    ExecutionPlan,
+    run_with
+)
+from cloudify_plugin_tools.exceptions import (
+    FanOutError,
+    UnreachableApiError
+)
+from cloudify_plugin_tools.input_arguments import CompiledRuleSet
+from cloudify_plugin_tools.retry import RetryPolicy
+from cloudify_plugin_tools.runner import TaskRunner
 
 
 class TestRunWith(unittest.TestCase):
@@ -169,6 +178,24 @@ class TestRunWith(unittest.TestCase):
         self.assertEquals(call.args, ())
         self.assertEquals(call.kwargs, {})
 
+    def test_init_compiles_rules(self):
+        # when
+        decorator = run_with(**self.default_init_input_args)
+
+        # then
+        self.assertIsInstance(
+            decorator.input_arguments_resolve_rules,
+            CompiledRuleSet
+        )
+        self.assertEquals(
+            decorator.input_arguments_resolve_rules.groups.keys(),
+            [(
+                InputArgumentResolvingRule,
+                None,
+                'cloudify.nodes.some_plugin.SomeType'
+            )]
+        )
+
     def test_call_full_init_no_runner(self):
         # given
         task = self.MockedTask()
@@ -291,6 +318,167 @@ class TestRunWith(unittest.TestCase):
                 **self.some_kwargs
             )
 
+    def _retry_policy(self, **kwargs):
+        policy = RetryPolicy(initial_delay=1, jitter=0, **kwargs)
+        policy.sleep = Mock()
+
+        return policy
+
+    def _failing_task(self, *errors):
+        calls = []
+
+        def task(args, kwargs, **rp):
+            calls.append(args)
+
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+
+        return task, calls
+
+    def test_call_retry_recoverable_then_success(self):
+        # given
+        policy = self._retry_policy(max_attempts=3)
+        task, calls = self._failing_task(IOError(), RecoverableError())
+
+        # when
+        run_with(
+            self.default_runner_class,
+            retry_policy=policy,
+            recoverable_exceptions=(IOError,)
+        ).call(task, self.mocked_ctx)
+
+        # then
+        self.assertEquals(len(calls), 3)
+        self.assertEquals(
+            [call[0][0] for call in policy.sleep.call_args_list],
+            [1, 2]
+        )
+
+    def test_call_retry_escalated_after_max_attempts(self):
+        # given
+        policy = self._retry_policy(max_attempts=2)
+        task, calls = self._failing_task(IOError(), IOError(), IOError())
+
+        # then
+        with self.assertRaises(RecoverableError):
+            # when
+            run_with(
+                self.default_runner_class,
+                retry_policy=policy,
+                recoverable_exceptions=(IOError,)
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(len(calls), 2)
+
+    def test_call_retry_escalated_after_budget(self):
+        # given
+        policy = self._retry_policy(max_attempts=10, budget=0.5)
+        task, calls = self._failing_task(IOError(), IOError())
+
+        # then
+        with self.assertRaises(RecoverableError):
+            # when
+            run_with(
+                self.default_runner_class,
+                retry_policy=policy,
+                recoverable_exceptions=(IOError,)
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(len(calls), 1)
+        policy.sleep.assert_not_called()
+
+    def test_call_retry_non_recoverable_not_retried(self):
+        # given
+        policy = self._retry_policy(max_attempts=3)
+        task, calls = self._failing_task(UnreachableApiError())
+
+        # then
+        with self.assertRaises(NonRecoverableError):
+            # when
+            run_with(
+                self.default_runner_class,
+                retry_policy=policy
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(len(calls), 1)
+
+    def test_call_no_retry_policy(self):
+        # given
+        task, calls = self._failing_task(IOError())
+
+        # then
+        with self.assertRaises(RecoverableError):
+            # when
+            run_with(
+                self.default_runner_class,
+                recoverable_exceptions=(IOError,)
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(len(calls), 1)
+
+    def test_call_recoverable_exception_retry_after(self):
+        # given
+        error = IOError()
+        error.retry_after = 42
+        task, calls = self._failing_task(error)
+
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            # when
+            run_with(
+                self.default_runner_class,
+                recoverable_exceptions=(IOError,)
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(e.exception.retry_after, 42)
+
+    def test_call_non_recoverable_exception_retry_after_ignored(self):
+        # given
+        error = UnreachableApiError()
+        error.retry_after = 42
+        task, calls = self._failing_task(error)
+
+        # then
+        with self.assertRaises(NonRecoverableError):
+            # when
+            run_with(self.default_runner_class).call(task, self.mocked_ctx)
+
+    def test_call_retry_waits_retry_after(self):
+        # given
+        error = IOError()
+        error.retry_after = 5
+        policy = self._retry_policy(max_attempts=3)
+        task, calls = self._failing_task(error)
+
+        # when
+        run_with(
+            self.default_runner_class,
+            retry_policy=policy,
+            recoverable_exceptions=(IOError,)
+        ).call(task, self.mocked_ctx)
+
+        # then
+        policy.sleep.assert_called_once_with(5)
+
+    def test_call_retry_after_beyond_budget_escalated(self):
+        # given
+        error = IOError()
+        error.retry_after = 60
+        policy = self._retry_policy(max_attempts=3, budget=30)
+        task, calls = self._failing_task(error)
+
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            # when
+            run_with(
+                self.default_runner_class,
+                retry_policy=policy,
+                recoverable_exceptions=(IOError,)
+            ).call(task, self.mocked_ctx)
+
+        self.assertEquals(e.exception.retry_after, 60)
+        policy.sleep.assert_not_called()
+
     def test__call__(self):
         # given
         task = self.MockedTask()
@@ -303,3 +491,160 @@ class TestRunWith(unittest.TestCase):
 
         # then
         mocked_run_with_call.assert_called_once()
+
+
+class TestExecutionPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = Mock()
+
+    def _plan(self, runner_class=TaskRunner, sources_order=None, **kwargs):
+        return ExecutionPlan(
+            runner_class,
+            kwargs.get('resolving_rules'),
+            sources_order or SOURCES_DEFAULT_ORDER,
+            kwargs.get('api_ctx_provider_cls'),
+            kwargs.get('non_recoverable_exceptions', ()),
+            kwargs.get('recoverable_exceptions', ())
+        )
+
+    def test_unknown_sources_skipped_and_reported_once(self):
+        # given
+        plan = self._plan(sources_order=['inputs', 'unknown', 'properties'])
+
+        # when
+        plan.create_runner(self.ctx)
+        plan.create_runner(self.ctx)
+
+        # then
+        self.assertEquals(plan.sources_order, ('inputs', 'properties'))
+        self.assertEquals(plan.unknown_sources, ('unknown',))
+        self.ctx.logger.warn.assert_called_once_with(
+            'Unknown input arguments source: unknown. Skipping.'
+        )
+
+    def test_inputs_provider_shared_by_runners(self):
+        # given
+        plan = self._plan()
+
+        # when
+        first = plan.create_runner(self.ctx)
+        second = plan.create_runner(Mock())
+
+        # then
+        self.assertIs(first.inputs_provider, second.inputs_provider)
+        self.assertIs(first.inputs_resolver, second.inputs_resolver)
+        self.assertIs(first.inputs_resolver.rules, plan.resolving_rules)
+        self.assertEquals(
+            first.inputs_provider.sources_order,
+            SOURCES_DEFAULT_ORDER
+        )
+
+    def test_runner_without_create_inputs_provider(self):
+        # given
+        plan = self._plan(runner_class=TestRunWith.MockedRunner)
+
+        # when
+        runner = plan.create_runner(self.ctx)
+
+        # then
+        self.assertEquals(runner.ctx, self.ctx)
+        self.assertIs(runner.resolving_rules, plan.resolving_rules)
+        self.assertEquals(runner.sources_order, SOURCES_DEFAULT_ORDER)
+        self.assertIsNone(runner.api_ctx_provider_cls)
+
+    def test_runner_init_without_inputs_provider(self):
+        # given
+        class CustomRunner(TaskRunner):
+
+            def __init__(self,
+                         ctx,
+                         resolving_rules,
+                         sources_order,
+                         api_ctx_provider_cls=None):
+
+                super(CustomRunner, self).__init__(
+                    ctx,
+                    resolving_rules,
+                    sources_order,
+                    api_ctx_provider_cls
+                )
+
+        plan = self._plan(runner_class=CustomRunner)
+
+        # when
+        runner = plan.create_runner(self.ctx)
+
+        # then
+        self.assertIsInstance(runner, CustomRunner)
+        self.assertEquals(
+            runner.inputs_provider.sources_order,
+            SOURCES_DEFAULT_ORDER
+        )
+
+    def test_classify(self):
+        # given
+        plan = self._plan(
+            non_recoverable_exceptions=(ValueError,),
+            recoverable_exceptions=(IOError,)
+        )
+
+        # then
+        self.assertEquals(
+            plan.classify(RecoverableError()),
+            (None, None)
+        )
+        self.assertEquals(
+            plan.classify(UnreachableApiError()),
+            (NonRecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(ValueError()),
+            (NonRecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(IOError()),
+            (RecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(KeyError())[0],
+            RecoverableError
+        )
+
+    def test_classify_exceptions_lists(self):
+        # given
+        plan = self._plan(
+            non_recoverable_exceptions=[ValueError],
+            recoverable_exceptions=[IOError]
+        )
+
+        # then
+        self.assertEquals(
+            plan.classify(ValueError()),
+            (NonRecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(IOError()),
+            (RecoverableError, None)
+        )
+
+    def test_classify_fan_out_error(self):
+        # given
+        plan = self._plan(
+            non_recoverable_exceptions=(ValueError,),
+            recoverable_exceptions=(IOError,)
+        )
+
+        # then
+        self.assertEquals(
+            plan.classify(FanOutError([None, IOError(), KeyError()], [])),
+            (RecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(FanOutError([IOError(), ValueError()], [])),
+            (NonRecoverableError, None)
+        )
+        self.assertEquals(
+            plan.classify(FanOutError([NonRecoverableError()], [])),
+            (NonRecoverableError, None)
+        )
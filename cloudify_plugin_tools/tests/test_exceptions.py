@@ -1,7 +1,10 @@
+# -*- coding: utf-8 -*-
 import sys
 from traceback import format_tb
 import unittest
 
+from cloudify.exceptions import RecoverableError
+
 from cloudify_plugin_tools import exceptions
 
 
@@ -68,3 +71,87 @@ class TestReraise(unittest.TestCase):
             format_tb(traceback)[1:],
             format_tb(original_traceback)
         )
+
+    def test_reraise_with_kwargs(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise RuntimeError('throttled')
+            except RuntimeError:
+                # when
+                exceptions.reraise(RecoverableError, 'Details', retry_after=7)
+
+        self.assertEquals(e.exception.retry_after, 7)
+        self.assertIn('throttled', str(e.exception))
+
+    def test_reraise_with_kwargs_unicode(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise ValueError(u'błąd')
+            except ValueError:
+                # when
+                exceptions.reraise(RecoverableError, retry_after=5)
+
+        self.assertEquals(e.exception.retry_after, 5)
+        self.assertEquals(
+            unicode(e.exception),
+            u'błąd [retry_after=5]'
+        )
+
+    def test_reraise_with_message_unicode(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise ValueError(u'błąd')
+            except ValueError:
+                # when
+                exceptions.reraise(RecoverableError, 'Details', retry_after=5)
+
+        self.assertEquals(e.exception.retry_after, 5)
+        self.assertIn(u'błąd', unicode(e.exception))
+
+
+class TestGetRetryAfter(unittest.TestCase):
+
+    def test_attribute(self):
+        # given
+        error = IOError()
+        error.retry_after = 5
+
+        # then
+        self.assertEquals(exceptions.get_retry_after(error), 5)
+        self.assertIsNone(exceptions.get_retry_after(IOError()))
+
+    def test_fan_out_error(self):
+        # given
+        first = IOError()
+        first.retry_after = 5
+        second = IOError()
+        second.retry_after = 30
+
+        # then
+        self.assertEquals(
+            exceptions.get_retry_after(
+                exceptions.FanOutError([first, None, second, IOError()], [])
+            ),
+            30
+        )
+        self.assertIsNone(
+            exceptions.get_retry_after(
+                exceptions.FanOutError([IOError()], [])
+            )
+        )
+
+
+class TestFanOutError(unittest.TestCase):
+
+    def test_message(self):
+        # when
+        error = exceptions.FanOutError([None, IOError('down')], [1, None])
+
+        # then
+        self.assertEquals(
+            str(error),
+            "1 of 2 targets failed: target 1: IOError('down',)"
+        )
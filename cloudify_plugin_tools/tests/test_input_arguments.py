@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 
 from cloudify.mocks import (
@@ -6,22 +8,141 @@ from cloudify.mocks import (
     MockRelationshipContext,
     MockRelationshipSubjectContext
 )
+from cloudify.state import current_ctx
 from mock import (
     Mock,
-    call
+    call,
+    patch
 )
 
-from cloudify_plugin_tools.constants import SOURCES_DEFAULT_ORDER
+from cloudify_plugin_tools.constants import (
+    SOURCE_PROPERTIES,
+    SOURCE_RUNTIME_PROPERTIES,
+    SOURCES_DEFAULT_ORDER
+)
 from cloudify_plugin_tools.exceptions import InputArgumentResolvingError
+from cloudify_plugin_tools.cache import SourceCache
+from cloudify_plugin_tools.mapping import LayeredMapping
+from cloudify_plugin_tools.metrics import InMemorySink
+from cloudify_plugin_tools.snapshot import DeploymentSnapshot
 from cloudify_plugin_tools.input_arguments import (
+    compile_rules,
+    CompiledRuleSet,
     InputArgumentResolvingRule,
     InputArgumentResolver,
     InstanceInputArgumentResolver,
+    RelationshipIndex,
     RelationshipInputArgumentResolver,
+    RuntimePropertiesTrie,
     InputArgumentProvider
 )
 
 
+class SlowManager(object):
+    # stand-in of manager REST API loading node instances with latency
+
+    def __init__(self, latency=0.1, errors=()):
+        self.latency = latency
+        self.errors = errors
+
+        self.fetched = []
+        self.contexts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self._lock = threading.Lock()
+
+    def get_runtime_properties(self, instance_id):
+        # like manager client of CloudifyContext - raises without ctx
+        ctx = current_ctx.get_ctx()
+
+        with self._lock:
+            self.fetched.append(instance_id)
+            self.contexts.append(ctx)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(self.latency)
+
+        with self._lock:
+            self.in_flight -= 1
+
+        if instance_id in self.errors:
+            raise IOError('Cannot load {0}'.format(instance_id))
+
+        return {'ref': instance_id}
+
+
+class ManagedNodeInstance(object):
+    # loads runtime properties on first access, like CloudifyContext does
+
+    def __init__(self, manager, instance_id):
+        self.id = instance_id
+
+        self._manager = manager
+        self._runtime_properties = None
+
+    @property
+    def runtime_properties(self):
+        if self._runtime_properties is None:
+            self._runtime_properties = \
+                self._manager.get_runtime_properties(self.id)
+
+        return self._runtime_properties
+
+
+class ManagedNode(object):
+    # records reads of its type hierarchy (e.g. node loaded from manager)
+
+    def __init__(self, loaded, node_id, type_hierarchy):
+        self.id = node_id
+
+        self._loaded = loaded
+        self._type_hierarchy = type_hierarchy
+
+    @property
+    def type_hierarchy(self):
+        self._loaded.append(self.id)
+
+        return self._type_hierarchy
+
+
+class CountingDict(dict):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingDict, self).__init__(*args, **kwargs)
+        self.reads = 0
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return super(CountingDict, self).__getitem__(key)
+
+
+def _relationship(relationship_type,
+                  node_type,
+                  runtime_properties=None,
+                  instance_id=None):
+    node = MockNodeContext()
+    node.type_hierarchy = ['cloudify.nodes.Root', node_type]
+
+    relationship = MockRelationshipContext(
+        target=MockRelationshipSubjectContext(
+            node=node,
+            instance=MockNodeInstanceContext(
+                id=instance_id,
+                runtime_properties=runtime_properties or {}
+            )
+        ),
+        type=relationship_type
+    )
+    relationship.type_hierarchy = [
+        'cloudify.relationships.depends_on',
+        relationship_type
+    ]
+
+    return relationship
+
+
 class TestInputArgumentResolvingRule(unittest.TestCase):
 
     def setUp(self):
@@ -377,6 +498,299 @@ class TestInputArgumentResolvingRule(unittest.TestCase):
         self.assertEquals((False, None), result)
 
 
+class TestRuntimePropertiesTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.references = CountingDict(
+            virtual_network='vn',
+            logical_interface='lif'
+        )
+        self.runtime_properties = CountingDict(
+            object_references=self.references,
+            items=[{'name': 'first'}]
+        )
+
+        self.vn_rule = InputArgumentResolvingRule(
+            'vn_ref',
+            runtime_properties_path=['object_references', 'virtual_network']
+        )
+        self.lif_rule = InputArgumentResolvingRule(
+            'lif_ref',
+            runtime_properties_path=[
+                'object_references',
+                'logical_interface'
+            ]
+        )
+
+        self.trie = RuntimePropertiesTrie()
+
+    def test_evaluate_shared_prefix_traversed_once(self):
+        # given
+        self.trie.add(self.vn_rule)
+        self.trie.add(self.lif_rule)
+
+        # when
+        result = self.trie.evaluate(self.runtime_properties)
+
+        # then
+        self.assertEquals(result, {
+            self.vn_rule: (None, 'vn'),
+            self.lif_rule: (None, 'lif')
+        })
+        self.assertEquals(self.runtime_properties.reads, 1)
+        self.assertEquals(self.references.reads, 2)
+        self.assertEquals(len(self.trie.children), 1)
+
+    def test_evaluate_list_index_and_empty_path(self):
+        # given
+        index_rule = InputArgumentResolvingRule(
+            'name',
+            runtime_properties_path=['items', 0, 'name']
+        )
+        whole_rule = InputArgumentResolvingRule('all')
+        self.trie.add(index_rule)
+        self.trie.add(whole_rule)
+
+        # when
+        result = self.trie.evaluate(self.runtime_properties)
+
+        # then
+        self.assertEquals(result[index_rule], (None, 'first'))
+        self.assertEquals(result[whole_rule], (None, self.runtime_properties))
+
+    def test_evaluate_missing_key_same_error_as_rule(self):
+        # given
+        rule = InputArgumentResolvingRule(
+            'ref',
+            runtime_properties_path=['object_references', 'missing']
+        )
+        self.trie.add(rule)
+        self.trie.add(self.vn_rule)
+        instance = MockNodeInstanceContext(
+            runtime_properties=self.runtime_properties
+        )
+
+        with self.assertRaises(InputArgumentResolvingError) as expected:
+            rule.get_runtime_property(instance)
+
+        # when
+        result = self.trie.evaluate(self.runtime_properties)
+
+        # then
+        exc_info, value = result[rule]
+        self.assertEquals(exc_info[0], InputArgumentResolvingError)
+        self.assertEquals(str(exc_info[1]), str(expected.exception))
+        self.assertEquals(result[self.vn_rule], (None, 'vn'))
+
+    def test_evaluate_index_error(self):
+        # given
+        rule = InputArgumentResolvingRule(
+            'ref',
+            runtime_properties_path=['items', 5]
+        )
+        self.trie.add(rule)
+
+        # when
+        result = self.trie.evaluate(self.runtime_properties)
+
+        # then
+        self.assertEquals(result[rule][0][0], IndexError)
+
+
+class TestCompiledRuleSet(unittest.TestCase):
+
+    def test_groups_by_types(self):
+        # given
+        rules = [
+            InputArgumentResolvingRule('a', node_type='type.A'),
+            InputArgumentResolvingRule('b', node_type='type.B'),
+            InputArgumentResolvingRule('c', node_type='type.A')
+        ]
+
+        # when
+        result = CompiledRuleSet(rules)
+
+        # then
+        self.assertEquals(result, rules)
+        self.assertEquals(
+            result.groups.keys(),
+            [
+                (InputArgumentResolvingRule, None, 'type.A'),
+                (InputArgumentResolvingRule, None, 'type.B')
+            ]
+        )
+        self.assertIs(result.get_group(rules[0]), result.get_group(rules[2]))
+
+    def test_custom_rules_not_compiled(self):
+        # given
+        class CustomRule(InputArgumentResolvingRule):
+
+            def evaluate(self, relationship, node, instance):
+                return True, 'custom'
+
+        rules = [Mock(), CustomRule('custom')]
+
+        # when
+        result = CompiledRuleSet(rules)
+
+        # then
+        self.assertEquals(result.groups, {})
+        self.assertIsNone(result.get_group(rules[0]))
+        self.assertIsNone(result.get_group(rules[1]))
+
+    def test_rules_with_own_type_checks_not_compiled(self):
+        # given
+        class NodeTypeRule(InputArgumentResolvingRule):
+
+            def check_node_type(self, node_type_hierarchy):
+                return False
+
+        class RelationshipTypeRule(InputArgumentResolvingRule):
+
+            def check_relationship_type(self, relationship_type_hierarchy):
+                return False
+
+        rules = [NodeTypeRule('a'), RelationshipTypeRule('b')]
+
+        # when
+        result = CompiledRuleSet(rules)
+
+        # then
+        self.assertEquals(result.groups, {})
+        self.assertIsNone(result.get_group(rules[0]))
+        self.assertIsNone(result.get_group(rules[1]))
+
+    def test_compile_rules(self):
+        # given
+        rules = compile_rules([InputArgumentResolvingRule('a')])
+
+        # then
+        self.assertIs(compile_rules(rules), rules)
+        self.assertEquals(compile_rules(None), [])
+
+
+class TestCompiledRulesResolve(unittest.TestCase):
+
+    def test_instance_resolve_one_traversal_per_group(self):
+        # given
+        references = CountingDict(
+            virtual_network='vn',
+            logical_interface='lif'
+        )
+        runtime_properties = CountingDict(object_references=references)
+        relationships = [
+            _relationship('rel.Test', 'type.B', {'object_references': {}}),
+            _relationship('rel.Test', 'type.A', runtime_properties)
+        ]
+        ctx = Mock()
+        ctx.instance.relationships = relationships
+
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule(
+                name,
+                node_type='type.A',
+                runtime_properties_path=['object_references', key]
+            )
+            for name, key in (
+                ('vn_ref', 'virtual_network'),
+                ('lif_ref', 'logical_interface')
+            )
+        ])
+
+        # when
+        result = resolver.resolve(ctx)
+
+        # then
+        self.assertEquals(result, {'vn_ref': 'vn', 'lif_ref': 'lif'})
+        self.assertEquals(runtime_properties.reads, 1)
+
+    def test_instance_resolve_error_of_first_failing_rule(self):
+        # given
+        rules = [
+            InputArgumentResolvingRule(
+                'var{0}'.format(i),
+                runtime_properties_path=['missing{0}'.format(i)]
+            )
+            for i in range(2)
+        ]
+        ctx = Mock()
+        ctx.instance.relationships = [_relationship('rel.Test', 'type.A')]
+
+        # then
+        with self.assertRaises(InputArgumentResolvingError) as e:
+            # when
+            InstanceInputArgumentResolver(rules).resolve(ctx)
+
+        self.assertIn('missing0', str(e.exception))
+
+    def test_instance_resolve_rule_order_independent(self):
+        # given
+        class NeverRule(InputArgumentResolvingRule):
+
+            def check_node_type(self, node_type_hierarchy):
+                return False
+
+        ctx = Mock()
+        ctx.instance.relationships = [
+            _relationship('rel.Test', 'type.A', {'ref': 1})
+        ]
+
+        def resolve(rules):
+            return InstanceInputArgumentResolver(rules).resolve(ctx)
+
+        plain = InputArgumentResolvingRule(
+            'a',
+            node_type='type.A',
+            runtime_properties_path=['ref']
+        )
+        never = NeverRule(
+            'b',
+            node_type='type.A',
+            runtime_properties_path=['ref'],
+            required=False
+        )
+
+        # then
+        self.assertEquals(resolve([plain, never]), {'a': 1, 'b': None})
+        self.assertEquals(resolve([never, plain]), {'a': 1, 'b': None})
+
+    def test_relationship_resolve_source_when_target_does_not_match(self):
+        # given
+        target = _relationship('rel.Test', 'type.A', {'ref': 'target'}, '1')
+        source = _relationship('rel.Test', 'type.B', {'ref': 'source'})
+
+        ctx = Mock()
+        ctx.target = target.target
+        ctx.source = MockRelationshipSubjectContext(
+            node=source.target.node,
+            instance=MockNodeInstanceContext(
+                runtime_properties=source.target.instance.runtime_properties,
+                relationships=[target]
+            )
+        )
+
+        resolver = RelationshipInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'source_ref',
+                node_type='type.B',
+                runtime_properties_path=['ref']
+            ),
+            InputArgumentResolvingRule(
+                'target_ref',
+                runtime_properties_path=['ref']
+            )
+        ])
+
+        # when
+        result = resolver.resolve(ctx)
+
+        # then
+        self.assertEquals(
+            result,
+            {'source_ref': 'source', 'target_ref': 'target'}
+        )
+
+
 class TestInputArgumentResolver(unittest.TestCase):
 
     def test_resolve_1(self):
@@ -429,6 +843,35 @@ class TestInputArgumentResolver(unittest.TestCase):
             argument2_name: None
         })
 
+    def test_resolve_names(self):
+        # given
+        rules = [
+            InputArgumentResolvingRule('var1'),
+            InputArgumentResolvingRule('var2')
+        ]
+        resolver = InputArgumentResolver(rules)
+        resolver._resolve = Mock(return_value='some_value')
+        ctx_mock = Mock()
+
+        # when
+        result = resolver.resolve(ctx_mock, frozenset(['var2', 'other']))
+
+        # then
+        self.assertEquals(result, {'var2': 'some_value'})
+        resolver._resolve.assert_called_once_with(rules[1], ctx_mock)
+
+    def test_resolve_no_names_skips_preparation(self):
+        # given
+        resolver = InputArgumentResolver([InputArgumentResolvingRule('var')])
+        resolver._prepare = Mock()
+
+        # when
+        result = resolver.resolve(Mock(), frozenset())
+
+        # then
+        self.assertEquals(result, {})
+        resolver._prepare.assert_not_called()
+
 
 class TestInstanceInputArgumentResolver(unittest.TestCase):
 
@@ -519,6 +962,559 @@ class TestInstanceInputArgumentResolver(unittest.TestCase):
             resolver.resolve(ctx_mock)
 
 
+class TestRelationshipIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.relationships = [
+            _relationship('cloudify.relationships.contained_in', 'type.A'),
+            _relationship('cloudify.relationships.connected_to', 'type.B'),
+            _relationship('cloudify.relationships.connected_to', 'type.A'),
+            _relationship('cloudify.relationships.contained_in', 'type.B')
+        ]
+        self.index = RelationshipIndex(self.relationships)
+
+    def test_get_candidates_no_filters(self):
+        # then
+        self.assertEquals(self.index.get_candidates(), self.relationships)
+
+    def test_get_candidates_relationship_type(self):
+        # when
+        result = self.index.get_candidates(
+            relationship_type='cloudify.relationships.connected_to'
+        )
+
+        # then
+        self.assertEquals(list(result), self.relationships[1:3])
+        self.assertEquals(list(result), self.relationships[1:3])
+
+    def test_get_candidates_unknown_type(self):
+        # then
+        self.assertEquals(
+            list(self.index.get_candidates(relationship_type='rel.Unknown')),
+            []
+        )
+
+    def test_get_candidates_scanned_lazily(self):
+        # given
+        read = []
+        relationships = [
+            ManagedNode(read, i, ['rel.Test']) for i in range(3)
+        ]
+        index = RelationshipIndex(relationships)
+
+        # when
+        first = next(iter(index.get_candidates('rel.Test')))
+        read_first = list(read)
+        result = list(index.get_candidates('rel.Test'))
+
+        # then
+        self.assertIs(first, relationships[0])
+        self.assertEquals(read_first, [0])
+        self.assertEquals(result, relationships)
+        self.assertEquals(read, [0, 1, 2])
+
+    def test_iter_candidates_node_type(self):
+        # when
+        result = list(self.index.iter_candidates(node_type='type.B'))
+
+        # then
+        self.assertEquals(
+            result,
+            [self.relationships[1], self.relationships[3]]
+        )
+
+    def test_iter_candidates_both_types_keeps_order(self):
+        # when
+        result = list(self.index.iter_candidates(
+            relationship_type='cloudify.relationships.depends_on',
+            node_type='type.A'
+        ))
+
+        # then
+        self.assertEquals(
+            result,
+            [self.relationships[0], self.relationships[2]]
+        )
+
+    def test_iter_candidates_loads_nodes_lazily(self):
+        # given
+        loaded = []
+        relationships = [
+            _relationship('rel.Other', 'type.A'),
+            _relationship('rel.Test', 'type.B'),
+            _relationship('rel.Test', 'type.A'),
+            _relationship('rel.Test', 'type.A')
+        ]
+
+        for i, relationship in enumerate(relationships):
+            relationship.target.node = ManagedNode(
+                loaded,
+                i,
+                relationship.target.node.type_hierarchy
+            )
+
+        index = RelationshipIndex(relationships)
+
+        # when
+        candidates = index.iter_candidates('rel.Test', 'type.A')
+
+        # then
+        self.assertEquals(loaded, [])
+        self.assertIs(next(candidates), relationships[2])
+        self.assertEquals(loaded, [1, 2])
+
+
+class TestInstanceInputArgumentResolverIndex(unittest.TestCase):
+
+    def _ctx(self, relationships):
+        ctx = Mock()
+        ctx.instance.relationships = relationships
+
+        return ctx
+
+    def test_resolve_first_match(self):
+        # given
+        relationships = [
+            _relationship('rel.Other', 'type.A', {'ref': 'other'}),
+            _relationship('rel.Test', 'type.B', {'ref': 'wrong_node'}),
+            _relationship('rel.Test', 'type.A', {'ref': 'first'}),
+            _relationship('rel.Test', 'type.A', {'ref': 'second'})
+        ]
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'ref',
+                node_type='type.A',
+                relationship_type='rel.Test',
+                runtime_properties_path=['ref']
+            ),
+            InputArgumentResolvingRule(
+                'any_ref',
+                runtime_properties_path=['ref']
+            )
+        ])
+
+        # when
+        result = resolver.resolve(self._ctx(relationships))
+
+        # then
+        self.assertEquals(result, {'ref': 'first', 'any_ref': 'other'})
+
+    def test_resolve_loads_nodes_until_first_match(self):
+        # given
+        loaded = []
+        relationships = [
+            _relationship('rel.Test', 'type.A', {'ref': i})
+            for i in range(300)
+        ]
+
+        for i, relationship in enumerate(relationships):
+            relationship.target.node = ManagedNode(
+                loaded,
+                i,
+                relationship.target.node.type_hierarchy
+            )
+
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'ref',
+                node_type='type.A',
+                relationship_type='rel.Test',
+                runtime_properties_path=['ref']
+            )
+        ])
+
+        # when
+        result = resolver.resolve(self._ctx(relationships))
+
+        # then
+        self.assertEquals(result, {'ref': 0})
+        self.assertEquals(loaded, [0])
+
+    def test_resolve_required_not_found(self):
+        # given
+        rule = InputArgumentResolvingRule(
+            'ref',
+            node_type='type.C',
+            runtime_properties_path=['ref']
+        )
+        resolver = InstanceInputArgumentResolver([rule])
+
+        # then
+        with self.assertRaises(InputArgumentResolvingError) as e:
+            # when
+            resolver.resolve(
+                self._ctx([_relationship('rel.Test', 'type.A')])
+            )
+
+        self.assertEquals(
+            str(e.exception),
+            'Cannot resolve {0} - no suitable relationships / nodes found'
+            .format(str(rule))
+        )
+
+    def test_resolve_optional_not_found(self):
+        # given
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'ref',
+                node_type='type.C',
+                required=False
+            )
+        ])
+
+        # when
+        result = resolver.resolve(
+            self._ctx([_relationship('rel.Test', 'type.A')])
+        )
+
+        # then
+        self.assertEquals(result, {'ref': None})
+
+    def test_resolve_rule_with_own_check(self):
+        # given
+        class AnyTypeRule(InputArgumentResolvingRule):
+
+            def check(self, relationship_type_hierarchy,
+                      node_type_hierarchy):
+                return 'type.B' in node_type_hierarchy
+
+        resolver = InstanceInputArgumentResolver([
+            AnyTypeRule(
+                'ref',
+                node_type='type.A',
+                runtime_properties_path=['ref']
+            )
+        ])
+
+        # when
+        result = resolver.resolve(self._ctx([
+            _relationship('rel.Test', 'type.A', {'ref': 'a'}),
+            _relationship('rel.Test', 'type.B', {'ref': 'b'})
+        ]))
+
+        # then
+        self.assertEquals(result, {'ref': 'b'})
+
+    def test_resolve_subclass_resolve_without_state(self):
+        # given
+        class Resolver(InstanceInputArgumentResolver):
+
+            def _resolve(self, rule, ctx):
+                return super(Resolver, self)._resolve(rule, ctx).upper()
+
+        resolver = Resolver([
+            InputArgumentResolvingRule('ref', runtime_properties_path=['ref'])
+        ])
+
+        # when
+        result = resolver.resolve(self._ctx([
+            _relationship('rel.Test', 'type.A', {'ref': 'a'})
+        ]))
+
+        # then
+        self.assertEquals(result, {'ref': 'A'})
+
+    def test_resolve_builds_index_once(self):
+        # given
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule('var1', node_type='type.A'),
+            InputArgumentResolvingRule('var2', node_type='type.A')
+        ])
+        ctx = self._ctx([_relationship('rel.Test', 'type.A')])
+
+        # when
+        with patch(
+                'cloudify_plugin_tools.input_arguments.RelationshipIndex',
+                wraps=RelationshipIndex) as index_mock:
+            resolver.resolve(ctx)
+
+        # then
+        index_mock.assert_called_once_with(ctx.instance.relationships)
+
+    def test_resolve_metrics(self):
+        # given
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'var1',
+                node_type='type.A',
+                runtime_properties_path=['a']
+            ),
+            InputArgumentResolvingRule(
+                'var2',
+                node_type='type.A',
+                runtime_properties_path=['b']
+            ),
+            InputArgumentResolvingRule('var3', node_type='type.B')
+        ])
+        resolver.METRICS_SINK = InMemorySink()
+        ctx = self._ctx([
+            _relationship('rel.Test', 'type.A', {'a': 1, 'b': 2}),
+            _relationship('rel.Test', 'type.B'),
+            _relationship('rel.Test', 'type.C')
+        ])
+
+        # when
+        resolver.resolve(ctx)
+
+        # then
+        stats = resolver.METRICS_SINK.stats
+        self.assertEquals(stats['resolver.resolve']['count'], 1)
+        self.assertEquals(stats['resolver.rules'], 3)
+        self.assertEquals(stats['resolver.rule_groups'], 2)
+        self.assertEquals(stats['resolver.relationships'], 3)
+
+    def test_resolve_metrics_reported_on_error(self):
+        # given
+        resolver = InstanceInputArgumentResolver([
+            InputArgumentResolvingRule('var1', node_type='type.C')
+        ])
+        resolver.METRICS_SINK = InMemorySink()
+
+        # then
+        with self.assertRaises(InputArgumentResolvingError):
+            # when
+            resolver.resolve(self._ctx([]))
+
+        self.assertEquals(
+            resolver.METRICS_SINK.stats['resolver.resolve']['count'],
+            1
+        )
+
+
+class TestInstanceInputArgumentResolverPrefetch(unittest.TestCase):
+
+    TARGETS = 8
+
+    def setUp(self):
+        self.manager = SlowManager(latency=0.1)
+
+        self.relationships = []
+        for i in range(self.TARGETS):
+            relationship = _relationship('rel.Test', 'type.{0}'.format(i))
+            relationship.target.instance = ManagedNodeInstance(
+                self.manager,
+                'instance_{0}'.format(i)
+            )
+            self.relationships.append(relationship)
+
+        self.ctx = Mock()
+        self.ctx.instance.relationships = self.relationships
+        current_ctx.set(self.ctx)
+
+        self.rules = [
+            InputArgumentResolvingRule(
+                'ref_{0}'.format(i),
+                node_type='type.{0}'.format(i),
+                runtime_properties_path=['ref']
+            )
+            for i in range(self.TARGETS)
+        ]
+        self.expected_result = dict(
+            ('ref_{0}'.format(i), 'instance_{0}'.format(i))
+            for i in range(self.TARGETS)
+        )
+
+    def tearDown(self):
+        current_ctx.clear()
+        super(TestInstanceInputArgumentResolverPrefetch, self).tearDown()
+
+    def test_resolve_prefetch_concurrently(self):
+        # given
+        resolver = InstanceInputArgumentResolver(
+            self.rules,
+            prefetch_workers=self.TARGETS
+        )
+        start = time.time()
+
+        # when
+        result = resolver.resolve(self.ctx)
+
+        # then
+        self.assertEquals(result, self.expected_result)
+        self.assertTrue(time.time() - start < 0.1 * self.TARGETS / 2)
+        self.assertTrue(self.manager.max_in_flight > 1)
+        self.assertEquals(len(self.manager.fetched), self.TARGETS)
+        self.assertEquals(self.manager.contexts, [self.ctx] * self.TARGETS)
+
+    def test_resolve_prefetch_disabled_by_default(self):
+        # given
+        resolver = InstanceInputArgumentResolver(self.rules[:2])
+
+        # when
+        result = resolver.resolve(self.ctx)
+
+        # then
+        self.assertEquals(result, {
+            'ref_0': 'instance_0',
+            'ref_1': 'instance_1'
+        })
+        self.assertEquals(self.manager.max_in_flight, 1)
+
+    def test_resolve_prefetch_first_candidates_only(self):
+        # given
+        resolver = InstanceInputArgumentResolver(
+            [
+                InputArgumentResolvingRule(
+                    'any_ref',
+                    runtime_properties_path=['ref']
+                ),
+                self.rules[3],
+                self.rules[5]
+            ],
+            prefetch_workers=4
+        )
+
+        # when
+        result = resolver.resolve(self.ctx, frozenset(['any_ref', 'ref_3']))
+
+        # then
+        self.assertEquals(result, {
+            'any_ref': 'instance_0',
+            'ref_3': 'instance_3'
+        })
+        self.assertEquals(
+            sorted(self.manager.fetched),
+            ['instance_0', 'instance_3']
+        )
+
+    def test_resolve_prefetch_error_raised_during_evaluation(self):
+        # given
+        self.manager.errors = ('instance_1',)
+
+        class Resolver(InstanceInputArgumentResolver):
+            PREFETCH_WORKERS = 4
+
+        resolver = Resolver(self.rules[:3])
+
+        # then
+        with self.assertRaises(IOError):
+            # when
+            resolver.resolve(self.ctx)
+
+        self.assertTrue(self.ctx.logger.debug.called)
+
+
+class TestInputArgumentResolverSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = SlowManager(latency=0)
+        self.snapshot = DeploymentSnapshot()
+        current_ctx.set(Mock())
+
+        self.shared_target = _relationship('rel.Test', 'type.Shared')
+        self.shared_target.target.instance = ManagedNodeInstance(
+            self.manager,
+            'shared'
+        )
+
+        self.rules = [
+            InputArgumentResolvingRule(
+                'shared_ref',
+                node_type='type.Shared',
+                runtime_properties_path=['ref']
+            )
+        ]
+
+    def tearDown(self):
+        current_ctx.clear()
+        super(TestInputArgumentResolverSnapshot, self).tearDown()
+
+    def _instance_ctx(self, instance_id, tenant_name='tenant'):
+        ctx = Mock()
+        ctx.tenant_name = tenant_name
+        ctx.deployment.id = 'deployment'
+        ctx.instance.id = instance_id
+        ctx.instance.relationships = [self.shared_target]
+
+        return ctx
+
+    def test_instance_resolvers_share_snapshot(self):
+        # when
+        results = [
+            InstanceInputArgumentResolver(
+                self.rules,
+                snapshot=self.snapshot
+            ).resolve(self._instance_ctx('instance_{0}'.format(i)))
+            for i in range(5)
+        ]
+
+        # then
+        self.assertEquals(results, [{'shared_ref': 'shared'}] * 5)
+        self.assertEquals(self.manager.fetched, ['shared'])
+
+    def test_instance_resolvers_snapshot_keyed_by_tenant(self):
+        # given
+        resolver = InstanceInputArgumentResolver(
+            self.rules,
+            snapshot=self.snapshot
+        )
+        resolver.resolve(self._instance_ctx('instance_1', 'tenant_1'))
+
+        # when
+        self.shared_target.target.instance = ManagedNodeInstance(
+            self.manager,
+            'shared'
+        )
+        resolver.resolve(self._instance_ctx('instance_1', 'tenant_2'))
+
+        # then
+        self.assertEquals(self.manager.fetched, ['shared', 'shared'])
+
+    def test_instance_resolver_invalidate(self):
+        # given
+        class Resolver(InstanceInputArgumentResolver):
+            SNAPSHOT = self.snapshot
+
+        resolver = Resolver(self.rules)
+        resolver.resolve(self._instance_ctx('instance_1'))
+
+        # when
+        resolver.invalidate(self._instance_ctx('shared'))
+        self.shared_target.target.instance = ManagedNodeInstance(
+            self.manager,
+            'shared'
+        )
+        resolver.resolve(self._instance_ctx('instance_2'))
+
+        # then
+        self.assertEquals(self.manager.fetched, ['shared', 'shared'])
+
+    def test_relationship_resolver_types_from_snapshot(self):
+        # given
+        target = _relationship('rel.Test', 'type.A', {'ref': 'target'}, '1')
+        ctx = Mock()
+        ctx.tenant_name = 'tenant'
+        ctx.deployment.id = 'deployment'
+        ctx.target = target.target
+        ctx.source = MockRelationshipSubjectContext(
+            node=MockNodeContext(id='source'),
+            instance=MockNodeInstanceContext(id='2', relationships=[target])
+        )
+        ctx.source.node.type_hierarchy = ['type.B']
+
+        resolver = RelationshipInputArgumentResolver(
+            [
+                InputArgumentResolvingRule(
+                    'ref',
+                    node_type='type.A',
+                    relationship_type='rel.Test',
+                    runtime_properties_path=['ref']
+                )
+            ],
+            snapshot=self.snapshot
+        )
+
+        # when
+        result = resolver.resolve(ctx)
+        resolver.resolve(ctx)
+        resolver.invalidate(ctx)
+
+        # then
+        self.assertEquals(result, {'ref': 'target'})
+        self.assertEquals(self.snapshot.stats['hits'], 2)
+        self.assertEquals(self.snapshot.stats['size'], 2)
+
+
 class TestRelationshipInputArgumentResolver(unittest.TestCase):
 
     def test_resolve_positive(self):
@@ -682,6 +1678,39 @@ class TestRelationshipInputArgumentResolver(unittest.TestCase):
             # when
             resolver.resolve(ctx_mock)
 
+    def test_resolve_gets_relationship_ctx_once(self):
+        # given
+        relationships = [
+            _relationship('rel.Test', 'type.A', {'ref': i}, str(i))
+            for i in range(10)
+        ]
+
+        ctx = Mock()
+        ctx.source = MockRelationshipSubjectContext(
+            node=MockNodeContext(),
+            instance=Mock(relationships=relationships)
+        )
+        ctx.target = relationships[7].target
+
+        resolver = RelationshipInputArgumentResolver([
+            InputArgumentResolvingRule(
+                'var{0}'.format(i),
+                node_type='type.A',
+                runtime_properties_path=['ref']
+            )
+            for i in range(3)
+        ])
+        resolver._get_relationship_ctx = Mock(
+            wraps=resolver._get_relationship_ctx
+        )
+
+        # when
+        result = resolver.resolve(ctx)
+
+        # then
+        self.assertEquals(result, {'var0': 7, 'var1': 7, 'var2': 7})
+        resolver._get_relationship_ctx.assert_called_once_with(ctx)
+
 
 class TestInputArgumentProvider(unittest.TestCase):
 
@@ -730,6 +1759,101 @@ class TestInputArgumentProvider(unittest.TestCase):
         self.assertEquals(result, self.expected_result)
         self.mocked_resolver_resolve.assert_called_once_with(self.mocked_ctx)
 
+    def test_get_input_arguments_dict_by_default(self):
+        # given
+        provider = InputArgumentProvider(
+            self.mocked_resolver,
+            SOURCES_DEFAULT_ORDER
+        )
+
+        # when
+        result = provider.get_input_arguments(
+            self.mocked_ctx,
+            **self.input_args
+        )
+
+        # then
+        self.assertIs(type(result), dict)
+        self.assertEquals(result, self.expected_result)
+
+    def test_get_input_arguments_no_copy(self):
+        # given
+        self.runtime_properties['response'] = {'items': range(100)}
+        provider = InputArgumentProvider(
+            self.mocked_resolver,
+            SOURCES_DEFAULT_ORDER,
+            layered=True
+        )
+
+        # when
+        result = provider.get_input_arguments(
+            self.mocked_ctx,
+            **self.input_args
+        )
+
+        # then
+        self.assertIsInstance(result, LayeredMapping)
+        self.assertIs(result['response'], self.runtime_properties['response'])
+
+    def test_get_named_input_arguments(self):
+        # given
+        provider = InputArgumentProvider(
+            self.mocked_resolver,
+            SOURCES_DEFAULT_ORDER
+        )
+
+        # when
+        result = provider.get_named_input_arguments(
+            self.mocked_ctx,
+            ('b', 'd', 'f'),
+            self.input_args
+        )
+
+        # then
+        self.assertEquals(result, {'b': 2, 'd': 5, 'f': 9})
+        self.mocked_resolver_resolve.assert_called_once_with(
+            self.mocked_ctx,
+            frozenset(['f'])
+        )
+
+    def test_get_named_input_arguments_stops_when_satisfied(self):
+        # given
+        provider = InputArgumentProvider(
+            self.mocked_resolver,
+            SOURCES_DEFAULT_ORDER
+        )
+        self.mocked_ctx.instance = Mock()
+
+        # when
+        result = provider.get_named_input_arguments(
+            self.mocked_ctx,
+            ('a', 'b'),
+            self.input_args
+        )
+
+        # then
+        self.assertEquals(result, {'a': 1, 'b': 2})
+        self.assertEquals(self.mocked_ctx.instance.mock_calls, [])
+        self.mocked_resolver_resolve.assert_not_called()
+
+    def test_get_named_input_arguments_missing(self):
+        # given
+        provider = InputArgumentProvider(
+            self.mocked_resolver,
+            SOURCES_DEFAULT_ORDER + ['unknown_method']
+        )
+
+        # when
+        result = provider.get_named_input_arguments(
+            self.mocked_ctx,
+            ('x',),
+            self.input_args
+        )
+
+        # then
+        self.assertEquals(result, {})
+        self.mocked_logger_warn.assert_called_once()
+
     def test_get_input_arguments_unknown_method(self):
         # given
         provider = InputArgumentProvider(
@@ -747,3 +1871,119 @@ class TestInputArgumentProvider(unittest.TestCase):
         self.assertEquals(result, {})
         self.mocked_resolver_resolve.assert_not_called()
         self.mocked_logger_warn.assert_called_once()
+
+
+class TestInputArgumentProviderSourceCache(unittest.TestCase):
+
+    class Provider(InputArgumentProvider):
+        pass
+
+    def setUp(self):
+        self.Provider.SOURCE_CACHE = SourceCache()
+
+    def _ctx(self,
+             deployment_id='deployment',
+             node_id='node',
+             tenant_name='tenant'):
+        ctx = Mock()
+        ctx.tenant_name = tenant_name
+        ctx.deployment.id = deployment_id
+        ctx.node.id = node_id
+        ctx.node.type = 'type.A'
+        ctx.node.properties = {'a': 1}
+        ctx.instance.runtime_properties = {'b': 2}
+
+        return ctx
+
+    def _get(self, ctx):
+        return self.Provider(
+            None,
+            [SOURCE_PROPERTIES, SOURCE_RUNTIME_PROPERTIES]
+        ).get_input_arguments(ctx)
+
+    def test_properties_cached_runtime_properties_not(self):
+        # given
+        first_ctx = self._get(self._ctx())
+        ctx = self._ctx()
+        ctx.node = Mock(id='node')
+        ctx.instance.runtime_properties = {'b': 3}
+
+        # when
+        result = self._get(ctx)
+
+        # then
+        self.assertEquals(first_ctx, {'a': 1, 'b': 2})
+        self.assertEquals(result, {'a': 1, 'b': 3})
+        self.assertEquals(ctx.node.mock_calls, [])
+        self.assertEquals(
+            self.Provider.SOURCE_CACHE.stats,
+            {'hits': 1, 'misses': 1, 'size': 1}
+        )
+
+    def test_cached_by_tenant_deployment_and_node(self):
+        # when
+        self._get(self._ctx())
+        self._get(self._ctx(node_id='other_node'))
+        self._get(self._ctx(deployment_id='other_deployment'))
+        self._get(self._ctx(tenant_name='other_tenant'))
+
+        # then
+        self.assertEquals(self.Provider.SOURCE_CACHE.stats['size'], 4)
+
+    def test_disabled_by_default(self):
+        # then
+        self.assertIsNone(InputArgumentProvider.SOURCE_CACHE)
+
+    def test_no_deployment_not_cached(self):
+        # when
+        self._get(self._ctx(deployment_id=None))
+
+        # then
+        self.assertEquals(self.Provider.SOURCE_CACHE.stats['size'], 0)
+
+    def test_named_input_arguments_cached(self):
+        # given
+        provider = self.Provider(None, [SOURCE_PROPERTIES])
+
+        # when
+        for _ in range(2):
+            result = provider.get_named_input_arguments(
+                self._ctx(),
+                ('a',),
+                {}
+            )
+
+        # then
+        self.assertEquals(result, {'a': 1})
+        self.assertEquals(self.Provider.SOURCE_CACHE.stats['hits'], 1)
+
+    def test_register_source(self):
+        # given
+        class Provider(self.Provider):
+            pass
+
+        Provider.register_source(
+            'node_type',
+            lambda ctx, provider, kwargs: {'node_type': ctx.node.type},
+            cache_key=lambda ctx: ctx.node.id
+        )
+        Provider.register_source(
+            SOURCE_PROPERTIES,
+            lambda ctx, provider, kwargs: {'mutable': True}
+        )
+
+        # when
+        for _ in range(2):
+            result = Provider(
+                None,
+                ['node_type', SOURCE_PROPERTIES]
+            ).get_input_arguments(self._ctx())
+
+        # then
+        self.assertEquals(result, {
+            'node_type': 'type.A',
+            'mutable': True
+        })
+        self.assertEquals(self.Provider.SOURCE_CACHE.stats['hits'], 1)
+        self.assertNotIn('node_type', InputArgumentProvider.SOURCES)
+        self.assertIn(SOURCE_PROPERTIES, InputArgumentProvider.CACHED_SOURCES)
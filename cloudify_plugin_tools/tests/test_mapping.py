@@ -0,0 +1,58 @@
+import unittest
+
+from cloudify_plugin_tools.mapping import LayeredMapping
+
+
+class TestLayeredMapping(unittest.TestCase):
+
+    def setUp(self):
+        self.properties = {'a': 1, 'b': 2, 'response': {'items': [1, 2]}}
+        self.runtime_properties = {'a': 10, 'c': 3}
+
+        self.layered = LayeredMapping(self.properties, self.runtime_properties)
+
+    def test_get_precedence(self):
+        # then
+        self.assertEquals(self.layered['a'], 1)
+        self.assertEquals(self.layered['c'], 3)
+        self.assertEquals(self.layered.get('d'), None)
+        self.assertTrue('c' in self.layered)
+        self.assertFalse('d' in self.layered)
+
+        with self.assertRaises(KeyError):
+            self.layered['d']
+
+    def test_no_copy(self):
+        # then
+        self.assertIs(self.layered['response'], self.properties['response'])
+
+    def test_iter_len_eq(self):
+        # then
+        self.assertEquals(sorted(self.layered), ['a', 'b', 'c', 'response'])
+        self.assertEquals(len(self.layered), 4)
+        self.assertEquals(self.layered, {
+            'a': 1, 'b': 2, 'c': 3, 'response': {'items': [1, 2]}
+        })
+
+    def test_kwargs(self):
+        # given
+        def task(a, c, **kwargs):
+            return a, c, sorted(kwargs)
+
+        # when
+        result = task(**self.layered)
+
+        # then
+        self.assertEquals(result, (1, 3, ['b', 'response']))
+
+    def test_read_only(self):
+        # then
+        with self.assertRaises(TypeError):
+            self.layered['a'] = 5
+
+    def test_repr(self):
+        # then
+        self.assertEquals(
+            repr(LayeredMapping({'a': 1}, {'a': 2})),
+            "LayeredMapping({'a': 1})"
+        )
@@ -0,0 +1,219 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import unittest
+
+from cloudify_plugin_tools.metrics import (
+    get_sink,
+    set_sink,
+    InMemorySink,
+    MetricsSink,
+    NULL_SINK,
+    PrometheusTextfileSink,
+    StatsdSink
+)
+
+
+class TestSink(unittest.TestCase):
+
+    def tearDown(self):
+        set_sink(None)
+        super(TestSink, self).tearDown()
+
+    def test_default_sink(self):
+        # then
+        self.assertIs(get_sink(), NULL_SINK)
+        self.assertFalse(get_sink().enabled)
+
+    def test_set_sink(self):
+        # given
+        sink = InMemorySink()
+
+        # when
+        set_sink(sink)
+
+        # then
+        self.assertIs(get_sink(), sink)
+
+        set_sink(None)
+        self.assertIs(get_sink(), NULL_SINK)
+
+    def test_null_sink(self):
+        # given
+        sink = MetricsSink()
+
+        # then
+        sink.timing('a', 1)
+        sink.increment('a')
+        sink.flush()
+
+
+class TestInMemorySink(unittest.TestCase):
+
+    def test_timing(self):
+        # given
+        sink = InMemorySink()
+
+        # when
+        sink.timing('runner.run', 0.5)
+        sink.timing('runner.run', 1.5)
+        sink.timing('runner.run', 2, {'task': 'create'})
+
+        # then
+        self.assertEquals(sink.stats['runner.run'], {
+            'count': 2,
+            'total': 2.0,
+            'max': 1.5
+        })
+        self.assertEquals(
+            sink.stats[('runner.run', (('task', 'create'),))]['count'],
+            1
+        )
+
+    def test_increment(self):
+        # given
+        sink = InMemorySink()
+
+        # when
+        sink.increment('resolver.rules', 3)
+        sink.increment('resolver.rules')
+
+        # then
+        self.assertEquals(sink.stats['resolver.rules'], 4)
+
+    def test_clear(self):
+        # given
+        sink = InMemorySink()
+        sink.increment('a')
+
+        # when
+        sink.clear()
+
+        # then
+        self.assertEquals(sink.stats, {})
+
+
+class TestStatsdSink(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(5)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+        super(TestStatsdSink, self).tearDown()
+
+    def test_timing(self):
+        # given
+        sink = StatsdSink(port=self.port)
+
+        # when
+        sink.timing('runner.run', 0.25, {'task': 'create'})
+
+        # then
+        self.assertEquals(
+            self.server.recv(1024),
+            'cloudify.runner.run:250.000|ms'
+        )
+
+    def test_increment_with_tags(self):
+        # given
+        sink = StatsdSink(port=self.port, prefix=None, use_tags=True)
+
+        # when
+        sink.increment('resolver.rules', 3, {'b': 2, 'a': 1})
+
+        # then
+        self.assertEquals(
+            self.server.recv(1024),
+            'resolver.rules:3|c|#a:1,b:2'
+        )
+
+    def test_send_error_ignored(self):
+        # given
+        sink = StatsdSink(host='256.0.0.1')
+
+        # then
+        sink.increment('a')
+
+
+class TestPrometheusTextfileSink(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'plugin-{pid}.prom')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestPrometheusTextfileSink, self).tearDown()
+
+    def test_render(self):
+        # given
+        sink = PrometheusTextfileSink(self.path)
+        sink.timing('runner.run', 0.5, {'task': 'create'})
+        sink.timing('runner.run', 0.25, {'task': 'de"lete'})
+        sink.increment('resolver.rules', 3)
+
+        # when
+        content = sink.render()
+
+        # then
+        self.assertEquals(content.splitlines(), [
+            '# TYPE cloudify_runner_run_seconds summary',
+            'cloudify_runner_run_seconds_count{task="create"} 1',
+            'cloudify_runner_run_seconds_sum{task="create"} 0.5',
+            'cloudify_runner_run_seconds_count{task="de\\"lete"} 1',
+            'cloudify_runner_run_seconds_sum{task="de\\"lete"} 0.25',
+            '# TYPE cloudify_resolver_rules_total counter',
+            'cloudify_resolver_rules_total 3'
+        ])
+
+    def test_flush_writes_file(self):
+        # given
+        sink = PrometheusTextfileSink(self.path)
+        sink.increment('resolver.rules')
+
+        # when
+        sink.flush()
+
+        # then
+        self.assertEquals(sink.path, os.path.join(
+            self.directory,
+            'plugin-{0}.prom'.format(os.getpid())
+        ))
+        self.assertEquals(os.listdir(self.directory), [
+            os.path.basename(sink.path)
+        ])
+        self.assertEquals(
+            stat.S_IMODE(os.stat(sink.path).st_mode),
+            0o644
+        )
+
+        with open(sink.path) as f:
+            self.assertEquals(f.read(), sink.render())
+
+    def test_flush_interval(self):
+        # given
+        sink = PrometheusTextfileSink(self.path, interval=60)
+        sink.flush()
+
+        # when
+        sink.increment('resolver.rules')
+        sink.flush()
+
+        # then
+        with open(sink.path) as f:
+            self.assertNotIn('resolver_rules', f.read())
+
+    def test_flush_error_ignored(self):
+        # given
+        sink = PrometheusTextfileSink(
+            os.path.join(self.directory, 'missing', 'plugin.prom')
+        )
+
+        # then
+        sink.flush()
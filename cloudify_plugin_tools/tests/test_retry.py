@@ -0,0 +1,53 @@
+import unittest
+
+from mock import Mock
+
+from cloudify_plugin_tools.retry import RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_get_delay_exponential(self):
+        # given
+        policy = RetryPolicy(initial_delay=1, max_delay=5, jitter=0)
+
+        # then
+        self.assertEquals(
+            [policy.get_delay(attempt) for attempt in range(1, 6)],
+            [1, 2, 4, 5, 5]
+        )
+
+    def test_get_delay_jitter(self):
+        # given
+        policy = RetryPolicy(initial_delay=4, jitter=0.5)
+
+        # when
+        delays = [policy.get_delay(1) for _ in range(100)]
+
+        # then
+        self.assertTrue(all(2 <= delay <= 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_get_retry_delay_max_attempts(self):
+        # given
+        policy = RetryPolicy(max_attempts=3, initial_delay=1, jitter=0)
+        policy.clock = Mock(return_value=100)
+
+        # then
+        self.assertEquals(policy.get_retry_delay(1, 100), 1)
+        self.assertEquals(policy.get_retry_delay(2, 100), 2)
+        self.assertIsNone(policy.get_retry_delay(3, 100))
+
+    def test_get_retry_delay_budget(self):
+        # given
+        policy = RetryPolicy(
+            max_attempts=10,
+            initial_delay=1,
+            jitter=0,
+            budget=4.5
+        )
+        policy.clock = Mock(return_value=103)
+
+        # then
+        self.assertEquals(policy.get_retry_delay(1, 100), 1)
+        self.assertIsNone(policy.get_retry_delay(2, 100))
@@ -1,3 +1,4 @@
+import time
 import unittest
 
 from mock import Mock
@@ -5,8 +6,16 @@ from mock import Mock
 from cloudify.state import current_ctx
 from cloudify.mocks import MockCloudifyContext
 
+from cloudify_plugin_tools.exceptions import FanOutError
+from cloudify_plugin_tools.metrics import (
+    InMemorySink,
+    set_sink
+)
 from cloudify_plugin_tools.runner import (
+    get_task_signature,
+    FanOutTaskRunner,
     TaskRunner,
+    TaskSignature,
     InstanceTaskRunner,
     RelationshipTaskRunner
 )
@@ -60,6 +69,7 @@ class TestTaskRunner(unittest.TestCase):
 
     def tearDown(self):
         current_ctx.clear()
+        set_sink(None)
         super(TestTaskRunner, self).tearDown()
 
     @property
@@ -118,6 +128,39 @@ class TestTaskRunner(unittest.TestCase):
         self.api_ctx_provider_cls.assert_called_once()
         self.assertEquals(runner.api_ctx_provider, self.api_ctx_provider)
 
+    def test_init_with_inputs_provider(self):
+        # given
+        inputs_provider = Mock()
+
+        # when
+        runner = self.runner_cls(
+            self.mocked_ctx,
+            self.resolving_rules,
+            self.sources_order,
+            inputs_provider=inputs_provider
+        )
+
+        # then
+        self.resolver_cls.assert_not_called()
+        self.provider_cls.assert_not_called()
+        self.assertEquals(runner.inputs_provider, inputs_provider)
+        self.assertEquals(runner.inputs_resolver, inputs_provider.resolver)
+
+    def test_create_inputs_provider(self):
+        # when
+        result = self.runner_cls.create_inputs_provider(
+            self.resolving_rules,
+            self.sources_order
+        )
+
+        # then
+        self.resolver_cls.assert_called_once_with(self.resolving_rules)
+        self.provider_cls.assert_called_once_with(
+            self.resolver,
+            self.sources_order
+        )
+        self.assertEquals(result, self.provider)
+
     def test_prepare_input_arguments(self):
         # given
         kwargs = {'a': 1, 'b': 2}
@@ -229,6 +272,323 @@ class TestTaskRunner(unittest.TestCase):
         # then
         self.assertEquals(result, expected_result)
 
+    def test_run_metrics(self):
+        # given
+        def create(ctx, api_ctx, a):
+            return a
+
+        self.api_ctx_provider.INPUT_ARGUMENTS = None
+        sink = InMemorySink()
+        sink.flush = Mock()
+        set_sink(sink)
+
+        # when
+        self.runner_with_api_ctx_provider.run(create)
+
+        # then
+        self.assertEquals(
+            sorted(sink.stats.keys()),
+            sorted(
+                ('runner.' + phase, (('task', 'create'),))
+                for phase in (
+                    'run',
+                    'prepare_input_arguments',
+                    'prepare_api_context',
+                    'do_run'
+                )
+            )
+        )
+        sink.flush.assert_called_once_with()
+
+    def test_run_metrics_on_error(self):
+        # given
+        def create(ctx):
+            raise RuntimeError()
+
+        sink = InMemorySink()
+        set_sink(sink)
+
+        # then
+        with self.assertRaises(RuntimeError):
+            # when
+            self.runner_no_api_ctx_provider.run(create)
+
+        self.assertEquals(
+            sink.stats[('runner.do_run', (('task', 'create'),))]['count'],
+            1
+        )
+
+    def test_run_invalidates_resolver(self):
+        # given
+        task = Mock(side_effect=RuntimeError)
+
+        # then
+        with self.assertRaises(RuntimeError):
+            # when
+            self.runner_no_api_ctx_provider.run(task)
+
+        self.resolver.invalidate.assert_called_once_with(self.mocked_ctx)
+
+    def test_run_error_handled_by_api_ctx_provider(self):
+        # given
+        error = IOError()
+        task = Mock(side_effect=error)
+
+        # then
+        with self.assertRaises(IOError):
+            # when
+            self.runner_with_api_ctx_provider.run(task)
+
+        self.api_ctx_provider.handle_error.assert_called_once_with(
+            self.provider_final_input_values,
+            error
+        )
+
+    def test_run_named_input_arguments(self):
+        # given
+        def task(ctx, vn_ref, name=None):
+            return vn_ref, name
+
+        self.provider.get_named_input_arguments = Mock(
+            return_value={'vn_ref': 'vn', 'name': 'n'}
+        )
+        kwargs = {'name': 'n'}
+
+        # when
+        result = self.runner_no_api_ctx_provider.run(task, **kwargs)
+
+        # then
+        self.assertEquals(result, ('vn', 'n'))
+        self.provider.get_named_input_arguments.assert_called_once_with(
+            self.mocked_ctx,
+            ('vn_ref', 'name'),
+            kwargs
+        )
+        self.provider_get_input_arguments.assert_not_called()
+
+    def test_run_named_input_arguments_api_ctx_provider_arguments(self):
+        # given
+        def task(ctx, api_ctx, vn_ref):
+            return api_ctx, vn_ref
+
+        self.api_ctx_provider.INPUT_ARGUMENTS = ['host', 'vn_ref']
+        self.provider.get_named_input_arguments = Mock(
+            return_value={'vn_ref': 'vn', 'host': '1.2.3.4'}
+        )
+
+        # when
+        result = self.runner_with_api_ctx_provider.run(task)
+
+        # then
+        self.assertEquals(result, (self.api_ctx, 'vn'))
+        self.provider.get_named_input_arguments.assert_called_once_with(
+            self.mocked_ctx,
+            ('vn_ref', 'host'),
+            {}
+        )
+        self.api_ctx_provider_get_api_ctx.assert_called_once_with(
+            {'vn_ref': 'vn', 'host': '1.2.3.4'}
+        )
+
+    def test_run_api_ctx_provider_needs_all_arguments(self):
+        # given
+        def task(ctx, api_ctx, a):
+            return a
+
+        self.api_ctx_provider.INPUT_ARGUMENTS = None
+
+        # when
+        result = self.runner_with_api_ctx_provider.run(task)
+
+        # then
+        self.assertEquals(result, 1)
+        self.provider_get_input_arguments.assert_called_once_with(
+            self.mocked_ctx
+        )
+        self.api_ctx_provider_get_api_ctx.assert_called_once_with(
+            self.provider_final_input_values
+        )
+
+    def test_run_task_with_kwargs_gets_all_arguments(self):
+        # given
+        def task(ctx, a, **kwargs):
+            return dict(kwargs, a=a)
+
+        # when
+        result = self.runner_no_api_ctx_provider.run(task)
+
+        # then
+        self.assertEquals(result, self.provider_final_input_values)
+
+
+class TestTaskSignature(unittest.TestCase):
+
+    def test_function(self):
+        # given
+        def task(ctx, api_ctx, a, b=None):
+            pass
+
+        # when
+        signature = TaskSignature(task)
+
+        # then
+        self.assertFalse(signature.accepts_kwargs)
+        self.assertEquals(signature.get_input_argument_names(), (
+            'api_ctx', 'a', 'b'
+        ))
+        self.assertEquals(signature.get_input_argument_names(2), ('a', 'b'))
+
+    def test_function_with_kwargs(self):
+        # given
+        def task(ctx, a, **kwargs):
+            pass
+
+        # then
+        self.assertIsNone(TaskSignature(task).get_input_argument_names())
+
+    def test_bound_method(self):
+        # given
+        class Tasks(object):
+
+            def task(self, ctx, a):
+                pass
+
+        # then
+        self.assertEquals(
+            TaskSignature(Tasks().task).get_input_argument_names(),
+            ('a',)
+        )
+
+    def test_not_introspectable(self):
+        # then
+        self.assertIsNone(TaskSignature(Mock()).get_input_argument_names())
+
+    def test_get_task_signature_cached(self):
+        # given
+        def task(ctx):
+            pass
+
+        # then
+        self.assertIs(get_task_signature(task), get_task_signature(task))
+
+
+class TestFanOutTaskRunner(unittest.TestCase):
+
+    class Runner(FanOutTaskRunner):
+        pass
+
+    def setUp(self):
+        self.input_arguments = {
+            'name': 'vn',
+            'credentials_list': [
+                {'host': '10.0.0.{0}'.format(i)} for i in range(5)
+            ]
+        }
+
+        self.provider = Mock()
+        self.provider.get_named_input_arguments = Mock(
+            return_value=self.input_arguments
+        )
+        self.api_ctx_provider = Mock()
+        self.api_ctx_provider.INPUT_ARGUMENTS = ['host']
+        self.api_ctx_provider.get_api_ctx = Mock(
+            side_effect=lambda input_parameters: input_parameters['host']
+        )
+
+        self.Runner.RESOLVER_CLASS = Mock()
+        self.Runner.INPUTS_PROVIDER_CLASS = Mock(return_value=self.provider)
+
+        self.mocked_ctx = MockCloudifyContext(
+            'node_name',
+            properties={},
+            runtime_properties={},
+        )
+        current_ctx.set(self.mocked_ctx)
+
+        self.runner = self.Runner(
+            self.mocked_ctx,
+            [],
+            [],
+            Mock(return_value=self.api_ctx_provider)
+        )
+
+    def tearDown(self):
+        current_ctx.clear()
+        super(TestFanOutTaskRunner, self).tearDown()
+
+    def test_run_once_per_credentials_set_concurrently(self):
+        # given
+        def task(ctx, api_ctx, name):
+            time.sleep(0.2)
+            return api_ctx, name
+
+        # when
+        start = time.time()
+        result = self.runner.run(task)
+
+        # then
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEquals(result, [
+            ('10.0.0.{0}'.format(i), 'vn') for i in range(5)
+        ])
+        self.provider.get_named_input_arguments.assert_called_once_with(
+            self.mocked_ctx,
+            ('name', 'host', 'credentials_list'),
+            {}
+        )
+
+    def test_run_without_credentials_list(self):
+        # given
+        def task(ctx, api_ctx, name):
+            return api_ctx, name
+
+        self.input_arguments.pop('credentials_list')
+        self.input_arguments['host'] = '1.2.3.4'
+
+        # when
+        result = self.runner.run(task)
+
+        # then
+        self.assertEquals(result, ('1.2.3.4', 'vn'))
+
+    def test_run_errors_aggregated(self):
+        # given
+        error = IOError()
+
+        def task(ctx, api_ctx, name):
+            if api_ctx == '10.0.0.3':
+                raise error
+
+            return api_ctx
+
+        # then
+        with self.assertRaises(FanOutError) as e:
+            # when
+            self.runner.run(task)
+
+        self.assertEquals(e.exception.errors, [None, None, None, error, None])
+        self.assertEquals(
+            e.exception.results,
+            ['10.0.0.0', '10.0.0.1', '10.0.0.2', None, '10.0.0.4']
+        )
+        self.assertEquals(self.api_ctx_provider.handle_error.call_count, 1)
+
+        input_parameters, handled = \
+            self.api_ctx_provider.handle_error.call_args[0]
+        self.assertEquals(input_parameters['host'], '10.0.0.3')
+        self.assertIs(handled, error)
+
+    def test_run_ctx_set_in_worker_threads(self):
+        # given
+        def task(ctx, api_ctx):
+            return current_ctx.get_ctx()
+
+        # when
+        result = self.runner.run(task)
+
+        # then
+        self.assertEquals(result, [self.mocked_ctx] * 5)
+
 
 class TestInstanceTaskRunner(TestTaskRunner):
 
@@ -0,0 +1,164 @@
+import unittest
+
+from mock import Mock
+
+from cloudify_plugin_tools.snapshot import DeploymentSnapshot
+
+
+class LazyNode(object):
+
+    def __init__(self, node_id):
+        self.id = node_id
+        self.loads = 0
+
+    @property
+    def type_hierarchy(self):
+        self.loads += 1
+        return ['cloudify.nodes.Root', 'type.A']
+
+
+class LazyNodeInstance(object):
+
+    def __init__(self, instance_id):
+        self.id = instance_id
+        self.loads = 0
+        self.other = 'other'
+
+    @property
+    def runtime_properties(self):
+        self.loads += 1
+        return {'ref': self.id}
+
+
+class TestDeploymentSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = DeploymentSnapshot(ttl=30, max_size=10)
+
+    def test_node_type_hierarchy_cached(self):
+        # given
+        node = LazyNode('node_a')
+
+        # when
+        for _ in range(3):
+            result = self.snapshot.get_node(
+                't',
+                'deployment',
+                LazyNode('node_a') if node.loads else node
+            ).type_hierarchy
+
+        # then
+        self.assertEquals(result, ['cloudify.nodes.Root', 'type.A'])
+        self.assertEquals(node.loads, 1)
+        self.assertEquals(
+            self.snapshot.stats,
+            {'hits': 2, 'misses': 1, 'size': 1}
+        )
+
+    def test_keyed_by_deployment(self):
+        # given
+        node = LazyNode('node_a')
+
+        # when
+        self.snapshot.get_node_type_hierarchy('t', 'deployment_1', node)
+        self.snapshot.get_node_type_hierarchy('t', 'deployment_2', node)
+
+        # then
+        self.assertEquals(node.loads, 2)
+
+    def test_keyed_by_tenant(self):
+        # given
+        instance = LazyNodeInstance('instance_a')
+
+        # when
+        self.snapshot.get_runtime_properties('t1', 'deployment', instance)
+        self.snapshot.get_runtime_properties('t2', 'deployment', instance)
+        self.snapshot.invalidate('t1', 'deployment', 'instance_a')
+        self.snapshot.get_runtime_properties('t2', 'deployment', instance)
+
+        # then
+        self.assertEquals(instance.loads, 2)
+
+    def test_relationship_type_hierarchy_cached_by_type(self):
+        # given
+        relationships = [
+            Mock(type='rel.Test', type_hierarchy=['rel.Test'])
+            for _ in range(2)
+        ]
+
+        # when
+        results = [
+            self.snapshot.get_relationship_type_hierarchy('t', 'deployment', r)
+            for r in relationships
+        ]
+
+        # then
+        self.assertEquals(results, [['rel.Test'], ['rel.Test']])
+        self.assertEquals(self.snapshot.stats['hits'], 1)
+
+    def test_runtime_properties_cached(self):
+        # given
+        instance = LazyNodeInstance('instance_a')
+        view = self.snapshot.get_node_instance('t', 'deployment', instance)
+
+        # when
+        view.runtime_properties
+        result = self.snapshot.get_node_instance(
+            't',
+            'deployment',
+            LazyNodeInstance('instance_a')
+        ).runtime_properties
+
+        # then
+        self.assertEquals(result, {'ref': 'instance_a'})
+        self.assertEquals(instance.loads, 1)
+        self.assertEquals(view.id, 'instance_a')
+        self.assertEquals(view.other, 'other')
+
+    def test_runtime_properties_ttl(self):
+        # given
+        snapshot = DeploymentSnapshot(ttl=0)
+        instance = LazyNodeInstance('instance_a')
+
+        # when
+        snapshot.get_runtime_properties('t', 'deployment', instance)
+        snapshot.get_runtime_properties('t', 'deployment', instance)
+
+        # then
+        self.assertEquals(instance.loads, 2)
+
+    def test_invalidate(self):
+        # given
+        instance = LazyNodeInstance('instance_a')
+        self.snapshot.get_runtime_properties('t', 'deployment', instance)
+
+        # when
+        self.snapshot.invalidate('t', 'deployment', 'instance_a')
+        self.snapshot.get_runtime_properties('t', 'deployment', instance)
+
+        # then
+        self.assertEquals(instance.loads, 2)
+
+    def test_max_size(self):
+        # given
+        instances = [LazyNodeInstance(str(i)) for i in range(11)]
+
+        # when
+        for instance in instances:
+            self.snapshot.get_runtime_properties('t', 'deployment', instance)
+
+        self.snapshot.get_runtime_properties('t', 'deployment', instances[0])
+
+        # then
+        self.assertEquals(self.snapshot.stats['size'], 10)
+        self.assertEquals(instances[0].loads, 2)
+
+    def test_clear(self):
+        # given
+        self.snapshot.get_node_type_hierarchy('t', 'deployment', LazyNode('a'))
+
+        # when
+        self.snapshot.clear()
+
+        # then
+        self.assertEquals(self.snapshot.stats['size'], 0)
@@ -0,0 +1,306 @@
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from cloudify_plugin_tools.tokens import (
+    get_private_directory,
+    get_token_store,
+    TokenStore
+)
+
+
+def _login_and_count(path, counter_path, start):
+    def login():
+        with open(counter_path, 'a') as f:
+            f.write('x')
+
+        time.sleep(0.2)
+        return 'shared-token', 3600
+
+    start.wait()
+    token = TokenStore(path, 'secret').get('key', login)
+
+    if token != 'shared-token':
+        os._exit(1)
+
+
+class TestTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tokens')
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+
+        shutil.rmtree(self.directory)
+        super(TestTokenStore, self).tearDown()
+
+    @staticmethod
+    def _login(token='token', expires_in=3600):
+        calls = []
+
+        def login():
+            calls.append(token)
+            return '{0}-{1}'.format(token, len(calls)), expires_in
+
+        return login, calls
+
+    def _store(self, secret='secret', **kwargs):
+        store = TokenStore(self.path, secret, **kwargs)
+        self.stores.append(store)
+
+        return store
+
+    def test_get_logs_in_once(self):
+        # given
+        store = self._store()
+        login, calls = self._login()
+
+        # when
+        first = store.get('key', login)
+        second = store.get('key', login)
+
+        # then
+        self.assertEquals(first, 'token-1')
+        self.assertEquals(second, 'token-1')
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(store.stats['logins'], 1)
+
+    def test_token_shared_by_stores(self):
+        # given
+        login, calls = self._login()
+        self._store().get('key', login)
+
+        # when
+        token = self._store().get('key', login)
+
+        # then
+        self.assertEquals(token, 'token-1')
+        self.assertEquals(len(calls), 1)
+
+    def test_encrypted_at_rest(self):
+        # given
+        store = self._store()
+
+        # when
+        store.get('key', lambda: ('plain-token-value', 3600))
+
+        # then
+        with open(self.path, 'rb') as f:
+            self.assertNotIn('plain-token-value', f.read())
+
+    def test_other_key_cannot_read(self):
+        # given
+        self._store().get('key', lambda: ('a', 3600))
+        login, calls = self._login()
+
+        # when
+        token = self._store('other').get('key', login)
+
+        # then
+        self.assertEquals(token, 'token-1')
+        self.assertEquals(len(calls), 1)
+
+    def test_corrupted_file_ignored(self):
+        # given
+        with open(self.path, 'wb') as f:
+            f.write('{not json')
+
+        login, calls = self._login()
+
+        # when
+        token = self._store().get('key', login)
+
+        # then
+        self.assertEquals(token, 'token-1')
+
+    def test_write_is_atomic(self):
+        # given
+        store = self._store()
+        store.get('a', lambda: ('a', 3600))
+        inode = os.stat(self.path).st_ino
+
+        # when
+        store.get('b', lambda: ('b', 3600))
+
+        # then
+        self.assertNotEquals(os.stat(self.path).st_ino, inode)
+        self.assertEquals(
+            sorted(os.listdir(self.directory)),
+            ['tokens', 'tokens.lock']
+        )
+
+    def test_failed_login_not_stored(self):
+        # given
+        store = self._store()
+
+        def login():
+            raise IOError()
+
+        # then
+        with self.assertRaises(IOError):
+            # when
+            store.get('key', login)
+
+        self.assertEquals(store.stats['scheduled_refreshes'], 0)
+
+    def test_expired_token_logs_in_again(self):
+        # given
+        store = self._store(refresh_margin=0)
+        login, calls = self._login(expires_in=0.05)
+        store.get('key', login)
+        store.invalidate('key')
+
+        # when
+        time.sleep(0.1)
+        token = store.get('key', login)
+
+        # then
+        self.assertEquals(token, 'token-2')
+
+    def test_background_refresh(self):
+        # given
+        store = self._store(refresh_margin=0.8, min_refresh_interval=0)
+        login, calls = self._login(expires_in=1)
+
+        # when
+        first = store.get('key', login)
+        store.get('key', login)
+        # margin is capped to half of lifetime - refreshed after 0.5s
+        time.sleep(0.7)
+        second = store.get('key', login)
+
+        # then
+        self.assertEquals(first, 'token-1')
+        self.assertEquals(second, 'token-2')
+        self.assertEquals(store.stats['logins'], 1)
+        self.assertEquals(store.stats['refreshes'], 1)
+
+    def test_unused_token_not_refreshed(self):
+        # given
+        store = self._store(refresh_margin=0.8, min_refresh_interval=0)
+        login, calls = self._login(expires_in=0.2)
+        store.get('key', login)
+
+        # when
+        time.sleep(0.3)
+
+        # then
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(store.stats['refreshes'], 0)
+        self.assertEquals(store.stats['scheduled_refreshes'], 0)
+
+    def test_short_lived_token_refresh_interval(self):
+        # given
+        store = self._store(refresh_margin=60, min_refresh_interval=0.2)
+        login, calls = self._login(expires_in=0.05)
+
+        # when
+        end = time.time() + 0.5
+
+        while time.time() < end:
+            store.get('key', login)
+            time.sleep(0.01)
+
+        # then
+        self.assertLessEqual(store.stats['refreshes'], 3)
+
+    def test_invalidate(self):
+        # given
+        store = self._store()
+        login, calls = self._login()
+        store.get('key', login)
+
+        # when
+        store.invalidate('key')
+        token = store.get('key', login)
+
+        # then
+        self.assertEquals(token, 'token-2')
+        self.assertEquals(store.stats['scheduled_refreshes'], 1)
+
+        store.invalidate('key')
+        self.assertEquals(store.stats['scheduled_refreshes'], 0)
+
+    def test_one_login_across_processes(self):
+        # given
+        counter_path = os.path.join(self.directory, 'counter')
+        start = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=_login_and_count,
+                args=(self.path, counter_path, start)
+            )
+            for _ in range(4)
+        ]
+
+        # when
+        for process in processes:
+            process.start()
+
+        start.set()
+
+        for process in processes:
+            process.join(10)
+
+        # then
+        self.assertEquals(
+            [process.exitcode for process in processes],
+            [0, 0, 0, 0]
+        )
+
+        with open(counter_path) as f:
+            self.assertEquals(f.read(), 'x')
+
+    def test_close(self):
+        # given
+        store = self._store()
+        store.get('key', lambda: ('a', 3600))
+
+        # when
+        store.close()
+
+        # then
+        self.assertEquals(store.stats['scheduled_refreshes'], 0)
+        self.assertEquals(store.get('key', None), 'a')
+
+    def test_get_private_directory(self):
+        # given
+        path = os.path.join(self.directory, 'a', 'b')
+
+        # when
+        result = get_private_directory(path)
+
+        # then
+        self.assertEquals(result, path)
+        self.assertEquals(stat.S_IMODE(os.stat(path).st_mode), 0o700)
+
+    def test_get_private_directory_existing_restricted(self):
+        # given
+        path = os.path.join(self.directory, 'tokens_directory')
+        os.mkdir(path)
+        os.chmod(path, 0o755)
+
+        # when
+        get_private_directory(path)
+
+        # then
+        self.assertEquals(stat.S_IMODE(os.stat(path).st_mode), 0o700)
+
+    def test_get_token_store_shared(self):
+        # then
+        self.assertIs(
+            get_token_store(self.path, 'secret'),
+            get_token_store(self.path, 'secret')
+        )
+        self.assertIsNot(
+            get_token_store(self.path, 'secret'),
+            get_token_store(self.path, 'other')
+        )
@@ -0,0 +1,275 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from cryptography.fernet import (
+    Fernet,
+    InvalidToken
+)
+
+try:
+    import fcntl
+except ImportError:
+    # no inter-process locking available (e.g. Windows)
+    fcntl = None
+
+
+DEFAULT_REFRESH_MARGIN = 60
+DEFAULT_MIN_REFRESH_INTERVAL = 5
+KEY_DERIVATION_ITERATIONS = 10000
+
+
+def get_private_directory(path):
+    # directory readable only by current user (created when missing)
+    try:
+        os.makedirs(path, 0o700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+    path_stat = os.stat(path)
+
+    if hasattr(os, 'getuid') and path_stat.st_uid != os.getuid():
+        raise OSError(
+            'Directory {0} is not owned by current user'.format(path)
+        )
+
+    # umask could drop bits only, but directory could exist before
+    if path_stat.st_mode & 0o077:
+        os.chmod(path, 0o700)
+
+    return path
+
+
+class TokenStore(object):
+
+    def __init__(self, path, secret, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 min_refresh_interval=DEFAULT_MIN_REFRESH_INTERVAL):
+        # refresh_margin - seconds before expiration when token is refreshed
+        # (at most half of token lifetime)
+        # min_refresh_interval - minimal number of seconds between refreshes
+        # of the same token
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+
+        self.logins = 0
+        self.refreshes = 0
+
+        self._secret = secret \
+            if isinstance(secret, bytes) else secret.encode('utf-8')
+        self._fernets = {}
+        self._timers = {}
+        # keys read since their refresh was scheduled
+        self._used = set()
+        self._lock = threading.RLock()
+
+    def _get_fernet(self, salt):
+        if salt not in self._fernets:
+            key = hashlib.pbkdf2_hmac(
+                'sha256',
+                self._secret,
+                salt,
+                KEY_DERIVATION_ITERATIONS
+            )
+            self._fernets = {salt: Fernet(base64.urlsafe_b64encode(key))}
+
+        return self._fernets[salt]
+
+    @contextmanager
+    def _locked(self, exclusive=True):
+        with self._lock:
+            with open(self.path + '.lock', 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(
+                        lock_file,
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+                    )
+
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                content = json.load(f)
+
+            salt = base64.b64decode(content['salt'])
+            data = self._get_fernet(salt).decrypt(bytes(content['data']))
+
+            return json.loads(data)
+        except (IOError, ValueError, KeyError, TypeError, InvalidToken):
+            # missing, corrupted or encrypted with other key - start again
+            return {}
+
+    def _write(self, tokens):
+        now = time.time()
+        tokens = dict(
+            (key, entry) for key, entry in tokens.iteritems()
+            if entry['expires_at'] > now
+        )
+
+        salt = os.urandom(16)
+        content = json.dumps({
+            'salt': base64.b64encode(salt),
+            'data': self._get_fernet(salt).encrypt(json.dumps(tokens))
+        })
+
+        # file is replaced atomically - readers see old or new content
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)),
+            prefix='.tokens'
+        )
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.rename(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def _is_valid(entry, margin=0):
+        return entry is not None and entry['expires_at'] - margin > time.time()
+
+    def _get_margin(self, entry):
+        # token valid shorter than margin would be refreshed immediately
+        lifetime = entry.get('lifetime', entry['expires_at'] - time.time())
+
+        return min(self.refresh_margin, max(lifetime, 0) / 2.0)
+
+    def _login(self, tokens, key, login):
+        # login() - returns token and number of seconds it is valid for
+        token, expires_in = login()
+        tokens[key] = {
+            'token': token,
+            'expires_at': time.time() + expires_in,
+            'lifetime': expires_in
+        }
+        self._write(tokens)
+
+        return tokens[key]
+
+    def _schedule_refresh(self, key, entry, login):
+        delay = max(
+            entry['expires_at'] - self._get_margin(entry) - time.time(),
+            self.min_refresh_interval
+        )
+
+        with self._lock:
+            if key in self._timers:
+                self._timers[key].cancel()
+
+            timer = threading.Timer(delay, self._refresh, (key, login))
+            timer.daemon = True
+            self._timers[key] = timer
+            self._used.discard(key)
+
+        timer.start()
+
+    def _refresh(self, key, login):
+        with self._lock:
+            # token nobody asked for is not kept alive - it is obtained
+            # again when needed
+            if key not in self._used:
+                self._timers.pop(key, None)
+                return
+
+        try:
+            with self._locked():
+                tokens = self._read()
+                entry = tokens.get(key)
+
+                # other process could refresh token already
+                if entry is None or \
+                        not self._is_valid(entry, self._get_margin(entry)):
+                    entry = self._login(tokens, key, login)
+                    self.refreshes += 1
+        except Exception:
+            # token will be obtained again when needed
+            with self._lock:
+                self._timers.pop(key, None)
+
+            return
+
+        self._schedule_refresh(key, entry, login)
+
+    def get(self, key, login):
+        with self._locked(exclusive=False):
+            entry = self._read().get(key)
+
+        if not self._is_valid(entry):
+            # only one process (holding the lock) logs in
+            with self._locked():
+                tokens = self._read()
+                entry = tokens.get(key)
+
+                if not self._is_valid(entry):
+                    entry = self._login(tokens, key, login)
+                    self.logins += 1
+
+        with self._lock:
+            is_scheduled = key in self._timers
+            self._used.add(key)
+
+        if not is_scheduled:
+            self._schedule_refresh(key, entry, login)
+
+        return entry['token']
+
+    def invalidate(self, key):
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            self._used.discard(key)
+
+            if timer:
+                timer.cancel()
+
+        with self._locked():
+            tokens = self._read()
+
+            if tokens.pop(key, None):
+                self._write(tokens)
+
+    def close(self):
+        # cancels scheduled refreshes, stored tokens are kept
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+
+            self._timers.clear()
+            self._used.clear()
+
+    @property
+    def stats(self):
+        return {
+            'logins': self.logins,
+            'refreshes': self.refreshes,
+            'scheduled_refreshes': len(self._timers)
+        }
+
+
+_TOKEN_STORES = {}
+_TOKEN_STORES_LOCK = threading.Lock()
+
+
+def get_token_store(path, secret, refresh_margin=DEFAULT_REFRESH_MARGIN):
+    with _TOKEN_STORES_LOCK:
+        key = (os.path.abspath(path), secret)
+
+        if key not in _TOKEN_STORES:
+            _TOKEN_STORES[key] = TokenStore(path, secret, refresh_margin)
+
+        return _TOKEN_STORES[key]
@@ -1,3 +1,3 @@
 import exceptions  # noqa
-from .rest import RestSDKClient  # noqa
+from .rest import AsyncRestSDKClient, RestSDKClient  # noqa
 from .decorators import with_arguments  # noqa
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_MEMORY = 16 * 1024 * 1024
+
+VALIDATOR_HEADERS = {
+    'ETag': 'If-None-Match',
+    'Last-Modified': 'If-Modified-Since'
+}
+
+
+def get_request_key(hosts, port, object_name, method_name, params):
+    return (
+        tuple(hosts),
+        port,
+        object_name,
+        method_name,
+        json.dumps(dict(params), sort_keys=True, default=repr)
+    )
+
+
+class CacheEntry(object):
+
+    def __init__(self, result, validators, expires_at, size):
+        self.result = result
+        self.validators = validators
+        self.expires_at = expires_at
+        self.size = size
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+    @property
+    def conditional_headers(self):
+        return dict(
+            (VALIDATOR_HEADERS[name], value)
+            for name, value in self.validators.iteritems()
+        )
+
+
+class ResponseCache(object):
+
+    def __init__(self, ttl=DEFAULT_TTL, max_memory=DEFAULT_MAX_MEMORY):
+        self.ttl = ttl
+        self.max_memory = max_memory
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.memory = 0
+
+        self._entries = OrderedDict()
+        self._keys_by_object = {}
+        self._lock = threading.Lock()
+
+    get_key = staticmethod(get_request_key)
+
+    @staticmethod
+    def _get_validators(headers):
+        return dict(
+            (name, headers[name])
+            for name in VALIDATOR_HEADERS
+            if headers and headers.get(name)
+        )
+
+    @staticmethod
+    def _get_size(result):
+        return len(json.dumps(result, default=repr))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry:
+            self.memory -= entry.size
+            object_key = key[:3]
+            self._keys_by_object[object_key].discard(key)
+
+            if not self._keys_by_object[object_key]:
+                del self._keys_by_object[object_key]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = self._entries.pop(key)
+
+            if entry.is_fresh():
+                self.hits += 1
+            else:
+                self.misses += 1
+
+            return entry
+
+    def set(self, key, result, headers=None):
+        size = self._get_size(result)
+
+        with self._lock:
+            self._remove(key)
+
+            if size > self.max_memory:
+                return
+
+            self._entries[key] = CacheEntry(
+                result,
+                self._get_validators(headers),
+                time.time() + self.ttl,
+                size
+            )
+            self._keys_by_object.setdefault(key[:3], set()).add(key)
+            self.memory += size
+
+            while self.memory > self.max_memory:
+                self._remove(next(iter(self._entries)))
+
+    def revalidated(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry:
+                self.revalidations += 1
+                entry.expires_at = time.time() + self.ttl
+
+            return entry
+
+    def invalidate(self, hosts, port, object_name):
+        with self._lock:
+            keys = self._keys_by_object.get(
+                (tuple(hosts), port, object_name),
+                set()
+            )
+
+            for key in list(keys):
+                self.invalidations += 1
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_object.clear()
+            self.memory = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+            'invalidations': self.invalidations,
+            'size': len(self._entries),
+            'memory': self.memory
+        }
@@ -0,0 +1,130 @@
+import copy
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+DEFAULT_MAX_WORKERS = 10
+
+# pools are never closed - number of pools and their size are capped, so
+# threads count stays bounded whatever sizes callers ask for
+MAX_THREAD_POOLS = 4
+MAX_POOL_SIZE = 64
+
+_THREAD_POOLS = {}
+_THREAD_POOLS_LOCK = threading.Lock()
+
+
+def _get_closest_size(sizes, max_workers):
+    # smallest pool not smaller than requested, otherwise the biggest one
+    bigger = [size for size in sizes if size >= max_workers]
+
+    return min(bigger) if bigger else max(sizes)
+
+
+def get_thread_pool(max_workers=DEFAULT_MAX_WORKERS):
+    max_workers = max(min(max_workers, MAX_POOL_SIZE), 1)
+
+    with _THREAD_POOLS_LOCK:
+        if max_workers not in _THREAD_POOLS:
+            if len(_THREAD_POOLS) >= MAX_THREAD_POOLS:
+                return _THREAD_POOLS[
+                    _get_closest_size(_THREAD_POOLS.keys(), max_workers)
+                ]
+
+            _THREAD_POOLS[max_workers] = ThreadPool(max_workers)
+
+        return _THREAD_POOLS[max_workers]
+
+
+def map_limited(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    # pool may be shared with other sizes (see MAX_THREAD_POOLS) - at most
+    # max_workers items of this call run at once, results in items order
+    max_workers = max(max_workers, 1)
+    pool = get_thread_pool(max_workers)
+    semaphore = threading.BoundedSemaphore(max_workers)
+
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            semaphore.release()
+
+    results = []
+
+    for item in items:
+        semaphore.acquire()
+        results.append(pool.apply_async(run, (item,)))
+
+    return [result.get() for result in results]
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exc_info = None
+        self.followers = 0
+
+
+class SingleFlight(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+
+            if flight:
+                self.coalesced += 1
+                flight.followers += 1
+                is_leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                is_leader = True
+
+        if not is_leader:
+            flight.event.wait()
+
+            if flight.exc_info:
+                raise flight.exc_info[0], flight.exc_info[1], \
+                    flight.exc_info[2]
+
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = func(*args, **kwargs)
+        except BaseException:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.event.set()
+
+        # followers copy shared result after event is set - leader must not
+        # get (and modify) the same object meanwhile
+        if flight.followers:
+            return copy.deepcopy(flight.result)
+
+        return flight.result
+
+    @property
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._flights)
+        }
+
+
+# not used by default - clients opt in by SINGLE_FLIGHT class attribute
+SINGLE_FLIGHT = SingleFlight()
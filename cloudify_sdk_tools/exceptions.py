@@ -4,6 +4,14 @@ from cloudify_common_sdk import exceptions as cloudify_rest_sdk_exceptions
 from requests import exceptions as requests_exceptions
 
 
+# Fix for flake 8
+try:
+    basestring
+    unicode
+except NameError:
+    basestring = unicode = str
+
+
 class RestSdkException(Exception):
     pass
 
@@ -53,19 +61,63 @@ RECOVERABLE_EXCEPTIONS = (
 )
 
 
-def reraise(exception_class, message=None):
+def is_recoverable(exception):
+    if isinstance(exception, NON_RECOVERABLE_EXCEPTIONS):
+        return False
+
+    # RECOVERABLE_EXCEPTIONS and unknown ones - task can be rerun
+    return True
+
+
+def _get_text(value):
+    # str() of exception with non-ASCII unicode message fails
+    if isinstance(value, basestring):
+        return value
+
+    try:
+        return str(value)
+    except UnicodeError:
+        return unicode(value)
+
+
+def reraise(exception_class, message=None, **kwargs):
+    # kwargs - passed to exception_class, e.g. retry_after of
+    # RecoverableError
     original_type, original_message, original_traceback = tuple(
         sys.exc_info()
     )
 
     if message:
-        message = \
+        original_text = _get_text(original_message)
+        template = \
             '\nDetails: {0}\n' \
             'Original exception: {1}\n' \
-            'Original exception message: {2}\n'\
-            .format(message, original_type.__name__, original_message)
+            'Original exception message: {2}\n'
+
+        if isinstance(original_text, unicode):
+            template = unicode(template)
+
+        message = template.format(
+            message,
+            original_type.__name__,
+            original_text
+        )
 
     else:
         message = original_message
 
+    if kwargs:
+        message = _get_text(message)
+
+        # RecoverableError adds this suffix using str.format, which fails
+        # for non-ASCII unicode message
+        if isinstance(message, unicode) and \
+                kwargs.get('retry_after') is not None:
+            message = u'{0} [retry_after={1}]'.format(
+                message,
+                kwargs['retry_after']
+            )
+
+        raise exception_class(message, **kwargs), None, original_traceback
+
     raise exception_class, message, original_traceback
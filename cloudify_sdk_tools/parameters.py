@@ -0,0 +1,69 @@
+from collections import MutableMapping
+
+
+class LayeredParameters(MutableMapping):
+
+    def __init__(self, *layers):
+        # layers are ordered by priority - value from first layer wins
+        self._layers = layers
+        self._changes = None
+        self._deleted = None
+
+    def _is_deleted(self, key):
+        return self._deleted is not None and key in self._deleted
+
+    def __getitem__(self, key):
+        if self._changes is not None and key in self._changes:
+            return self._changes[key]
+
+        if not self._is_deleted(key):
+            for layer in self._layers:
+                if key in layer:
+                    return layer[key]
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if self._changes is not None and key in self._changes:
+            return True
+
+        if self._is_deleted(key):
+            return False
+
+        return any(key in layer for layer in self._layers)
+
+    def __setitem__(self, key, value):
+        if self._changes is None:
+            self._changes = {}
+
+        self._changes[key] = value
+
+        if self._deleted is not None:
+            self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        if self._changes is not None:
+            self._changes.pop(key, None)
+
+        if self._deleted is None:
+            self._deleted = set()
+
+        self._deleted.add(key)
+
+    def __iter__(self):
+        seen = set(self._deleted or ())
+
+        for layer in ((self._changes or {}),) + self._layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, dict(self.items()))
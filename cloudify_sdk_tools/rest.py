@@ -2,9 +2,33 @@ import copy
 import os
 import sys
 
-from cloudify_rest_sdk.utility import process as send_rest_request
+from cloudify_common_sdk.filters import shorted_text
 
-from .exceptions import TemplateNotFoundError
+from .cache import get_request_key
+from .concurrency import (
+    DEFAULT_MAX_WORKERS,
+    get_thread_pool,
+    map_limited
+)
+from .exceptions import (
+    is_recoverable,
+    ResourceProcessingError,
+    TemplateNotFoundError
+)
+from .parameters import LayeredParameters
+from .streaming import (
+    DEFAULT_CHUNK_SIZE,
+    iter_json_items
+)
+from .templates import (
+    process as send_rest_request,
+    send_call,
+    TEMPLATE_CACHE
+)
+from .transport import (
+    DEFAULT_POOL_SIZE,
+    get_transport
+)
 
 
 # Fix for flake 8
@@ -14,10 +38,41 @@ except NameError:
     basestring = str
 
 
+class CallResult(object):
+
+    def __init__(self, result=None, exc_info=None):
+        self.result = result
+        self.exc_info = exc_info
+
+    @property
+    def error(self):
+        return self.exc_info[1] if self.exc_info else None
+
+    @property
+    def is_successful(self):
+        return self.exc_info is None
+
+    @property
+    def is_recoverable(self):
+        return self.is_successful or is_recoverable(self.error)
+
+    def get(self):
+        if self.exc_info:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+        return self.result
+
+
 class RestSDKClient(object):
 
     TEMPLATES_PATH = '{0}/templates/{1}/{2}.yaml'
 
+    TEMPLATE_CACHE = TEMPLATE_CACHE
+
+    # SINGLE_FLIGHT - e.g. concurrency.SINGLE_FLIGHT to coalesce concurrent
+    # identical read only calls
+    SINGLE_FLIGHT = None
+
     def __init__(self,
                  logger,
                  ip,
@@ -27,7 +82,9 @@ class RestSDKClient(object):
                  ssl=False,
                  verify=False,
                  common_parameters=None,
-                 module_name=__name__):
+                 module_name=__name__,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 response_cache=None):
 
         def _str_to_bool(some_value):
             if isinstance(some_value, bool):
@@ -50,14 +107,11 @@ class RestSDKClient(object):
         self.ssl = _str_to_bool(ssl)
         self.verify = _str_to_bool(verify)
 
-    def _combine_parameters(self, parameters):
-        result = copy.deepcopy(parameters)
-
-        for k, v in self.common_parameters.iteritems():
-            if k not in result:
-                result[k] = v
+        self.transport = get_transport(pool_size)
+        self.response_cache = response_cache
 
-        return result
+    def _combine_parameters(self, parameters):
+        return LayeredParameters(parameters, self.common_parameters)
 
     def _get_template(self, object_name, method_name):
         path = self.TEMPLATES_PATH.format(
@@ -66,7 +120,9 @@ class RestSDKClient(object):
             method_name
         )
 
-        if not os.path.isfile(path):
+        template = self.TEMPLATE_CACHE.get(path)
+
+        if template is None:
             raise TemplateNotFoundError(
                 'REST request template supposed to be located in: '
                 '"{0}" not found. '
@@ -74,36 +130,117 @@ class RestSDKClient(object):
                 .format(path)
             )
 
-        with open(path, 'r') as f:
-            return f.read()
+        return template
+
+    def _get_request_props(self):
+        return {
+            'port': self.port,
+            'ssl': self.ssl,
+            'verify': self.verify,
+            'hosts': self.hosts
+        }
 
     def _get_request(self, object_name, method_name, parameters):
         return {
             'params': self._combine_parameters(parameters),
             'template': self._get_template(object_name, method_name),
-            'request_props': {
-                'port': self.port,
-                'ssl': self.ssl,
-                'verify': self.verify,
-                'hosts': self.hosts
-            }
+            'request_props': self._get_request_props(),
+            'transport': self.transport
         }
 
+    def _send(self, object_name, method_name, params, headers=None):
+        return send_rest_request(
+            headers=headers,
+            **self._get_request(object_name, method_name, params)
+        )
+
+    def _get_request_key(self, object_name, method_name, params):
+        return get_request_key(
+            self.hosts,
+            self.port,
+            object_name,
+            method_name,
+            self._combine_parameters(params)
+        )
+
+    def _call_cached(self, object_name, method_name, params):
+        template = self._get_template(object_name, method_name)
+
+        if not template.cacheable:
+            try:
+                return self._send(object_name, method_name, params)[
+                    'result_properties'
+                ]
+            finally:
+                if not template.read_only:
+                    self.response_cache.invalidate(
+                        self.hosts,
+                        self.port,
+                        object_name
+                    )
+
+        key = self._get_request_key(object_name, method_name, params)
+        entry = self.response_cache.get(key)
+
+        if entry and entry.is_fresh():
+            self.logger.debug(
+                'Using cached response for {0}.{1} request'
+                .format(object_name, method_name)
+            )
+
+            return copy.deepcopy(entry.result)
+
+        # conditional request only if response of single call is cached
+        headers = entry.conditional_headers \
+            if entry and len(template.calls) == 1 else None
+
+        response = self._send(object_name, method_name, params, headers)
+
+        if response.get('not_modified'):
+            if self.response_cache.revalidated(key):
+                return copy.deepcopy(entry.result)
+
+            response = self._send(object_name, method_name, params)
+
+        self.response_cache.set(
+            key,
+            response['result_properties'],
+            response.get('headers')
+        )
+
+        return copy.deepcopy(response['result_properties'])
+
+    def _do_call(self, object_name, method_name, params):
+        if self.response_cache:
+            return self._call_cached(object_name, method_name, params)
+
+        return self._send(object_name, method_name, params)[
+            'result_properties'
+        ]
+
     def _call(self, object_name, method_name, params):
         self.logger.info(
             'Sending {0} request for {1}'
             .format(method_name, object_name)
         )
 
-        result = send_rest_request(
-            **self._get_request(object_name, method_name, params)
-        )['result_properties']
+        if self.SINGLE_FLIGHT and \
+                self._get_template(object_name, method_name).read_only:
+            result = self.SINGLE_FLIGHT.do(
+                self._get_request_key(object_name, method_name, params),
+                self._do_call,
+                object_name,
+                method_name,
+                params
+            )
+        else:
+            result = self._do_call(object_name, method_name, params)
 
         self.logger.debug(
             'Received response for {0}.{1} request: {2}'.format(
                 object_name,
                 method_name,
-                result
+                shorted_text(result)
             )
         )
 
@@ -113,3 +250,82 @@ class RestSDKClient(object):
         result = self._call(object_name, method_name, params)
 
         return result
+
+    def stream(self,
+               object_name,
+               method_name,
+               params,
+               items_path=None,
+               fields=None,
+               max_size=None,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+
+        template = self._get_template(object_name, method_name)
+
+        if len(template.calls) != 1:
+            raise ResourceProcessingError(
+                'Streaming of {0}.{1} response is not possible - '
+                'only templates with single REST call are supported'
+                .format(object_name, method_name)
+            )
+
+        call = template.calls[0].render(self._combine_parameters(params))
+
+        self.logger.info(
+            'Sending {0} request for {1} (streaming)'
+            .format(method_name, object_name)
+        )
+
+        response = send_call(
+            call,
+            self._get_request_props(),
+            self.transport,
+            stream=True
+        )
+
+        try:
+            for item in iter_json_items(
+                response.iter_content(chunk_size),
+                items_path,
+                fields,
+                max_size
+            ):
+                yield item
+        finally:
+            response.close()
+
+    def _call_safe(self, object_name, method_name, params):
+        try:
+            return CallResult(
+                result=self.call(object_name, method_name, params)
+            )
+        except Exception:
+            return CallResult(exc_info=sys.exc_info())
+
+    def call_many(self, calls, max_workers=DEFAULT_MAX_WORKERS):
+        return map_limited(
+            lambda call: self._call_safe(*call),
+            calls,
+            max_workers
+        )
+
+
+class AsyncRestSDKClient(RestSDKClient):
+
+    def __init__(self, *args, **kwargs):
+        self.max_workers = kwargs.pop('max_workers', DEFAULT_MAX_WORKERS)
+
+        super(AsyncRestSDKClient, self).__init__(*args, **kwargs)
+
+    def acall(self, object_name, method_name, params):
+        return get_thread_pool(self.max_workers).apply_async(
+            self.call,
+            (object_name, method_name, params)
+        )
+
+    def gather(self, calls, concurrency=None):
+        return map_limited(
+            lambda call: self.call(*call),
+            calls,
+            concurrency or self.max_workers
+        )
@@ -0,0 +1,147 @@
+import codecs
+import json
+
+from .exceptions import ResourceProcessingError
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class _JSONReader(object):
+
+    WHITESPACE = u' \t\n\r'
+    DELIMITERS = WHITESPACE + u',:]}'
+
+    def __init__(self, chunks, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = u''
+        self._position = 0
+        self._finished = False
+
+    def _fill(self):
+        if self._finished:
+            return False
+
+        chunk = next(self._chunks, None)
+
+        if chunk is None:
+            self._finished = True
+            text = self._decoder.decode(b'', final=True)
+        else:
+            self.size += len(chunk)
+
+            if self.max_size and self.size > self.max_size:
+                raise ResourceProcessingError(
+                    'Response size exceeds limit of {0} bytes'
+                    .format(self.max_size)
+                )
+
+            text = self._decoder.decode(chunk)
+
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+
+        return True
+
+    def peek(self):
+        while True:
+            while self._position < len(self._buffer) and \
+                    self._buffer[self._position] in self.WHITESPACE:
+                self._position += 1
+
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+
+            if not self._fill():
+                return None
+
+    def expect(self, *characters):
+        character = self.peek()
+
+        if character not in characters:
+            raise ResourceProcessingError(
+                'Unexpected character in JSON response: {0}, expected: {1}'
+                .format(repr(character), ' or '.join(characters))
+            )
+
+        self._position += 1
+
+        return character
+
+    def decode(self):
+        self.peek()
+
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(
+                    self._buffer,
+                    self._position
+                )
+            except ValueError:
+                value, end = None, None
+
+            # number may be incomplete if it is not followed by delimiter
+            if end is not None and (
+                    self._finished or
+                    (end < len(self._buffer) and
+                     self._buffer[end] in self.DELIMITERS)):
+                self._position = end
+                return value
+
+            if not self._fill():
+                if end is not None:
+                    self._position = end
+                    return value
+
+                raise ResourceProcessingError(
+                    'Invalid or incomplete JSON response'
+                )
+
+
+def _find_items(reader, items_path):
+    for key in items_path:
+        character = reader.expect(u'{')
+
+        while True:
+            if character == u'}' or reader.peek() == u'}':
+                raise ResourceProcessingError(
+                    'Key "{0}" of items path {1} not found in response'
+                    .format(key, items_path)
+                )
+
+            name = reader.decode()
+            reader.expect(u':')
+
+            if name == key:
+                break
+
+            reader.decode()
+            character = reader.expect(u',', u'}')
+
+    reader.expect(u'[')
+
+
+def project(item, fields):
+    if not fields or not isinstance(item, dict):
+        return item
+
+    return dict((k, item[k]) for k in fields if k in item)
+
+
+def iter_json_items(chunks, items_path=None, fields=None, max_size=None):
+    reader = _JSONReader(chunks, max_size)
+    _find_items(reader, items_path or [])
+
+    if reader.peek() == u']':
+        return
+
+    while True:
+        yield project(reader.decode(), fields)
+
+        if reader.expect(u',', u']') == u']':
+            return
@@ -0,0 +1,380 @@
+import ast
+import logging
+import os
+import re
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import xmltodict
+import yaml
+from cloudify_common_sdk.exceptions import (
+    ExpectationException,
+    NonRecoverableResponseException,
+    RecoverableResponseException,
+    WrongTemplateDataException
+)
+from cloudify_common_sdk.filters import (
+    _toxml,
+    obfuscate_passwords,
+    shorted_text,
+    translate_and_save
+)
+from cloudify_rest_sdk import LOGGER_NAME
+from jinja2 import Environment
+
+from .transport import get_transport
+
+
+# Fix for flake 8
+try:
+    basestring
+except NameError:
+    basestring = str
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+ENVIRONMENT = Environment()
+ENVIRONMENT.filters['toxml'] = _toxml
+
+
+class CompiledCall(object):
+
+    JINJA_MARKERS = ('{{', '{%', '{#')
+
+    def __init__(self, call):
+        # Same transformation as in cloudify_rest_sdk.utility.process -
+        # python representation of call with jinja blocks unquoted
+        text = '{0}'.format(call)
+        text = re.sub(r'\'\{\%', '{%', text)
+        text = re.sub(r'\%\}\'', '%}', text)
+
+        self.method = str(call.get('method', 'GET')).upper() \
+            if isinstance(call, dict) else 'GET'
+        self.text = text
+        self.renderer = ENVIRONMENT.from_string(text) \
+            if any(marker in text for marker in self.JINJA_MARKERS) else None
+
+    def render(self, params):
+        if self.renderer:
+            return ast.literal_eval(self.renderer.render(params))
+
+        return ast.literal_eval(self.text)
+
+
+class CompiledTemplate(object):
+
+    def __init__(self, source):
+        self.source = source
+
+        template_yaml = yaml.safe_load(source)
+
+        if isinstance(template_yaml, dict):
+            rest_calls = template_yaml.get('rest_calls') or []
+        else:
+            rest_calls = []
+
+        self.calls = [CompiledCall(call) for call in rest_calls]
+        self.read_only = all(call.method == 'GET' for call in self.calls)
+        self.cacheable = bool(
+            template_yaml.get('cacheable', self.read_only)
+            if isinstance(template_yaml, dict) else self.read_only
+        )
+
+
+# _check_response and _process_response are copied from
+# cloudify_rest_sdk.utility (cloudify-utilities-plugins-sdk==0.0.27, pinned
+# in setup.py) - they are private there, keep in sync when bumping the pin
+def _check_response(json, response, is_recoverable):
+    logger.debug(
+        'Check response ({0}) in json: {1} by {2}'.format(
+            'recoverable' if is_recoverable else 'nonrecoverable',
+            shorted_text(obfuscate_passwords(json)),
+            repr(response)
+        )
+    )
+
+    if not response:
+        return
+
+    if not isinstance(response, list):
+        raise WrongTemplateDataException(
+            'Response ({0}) had to be list. Type {1} not supported. '.format(
+                'recoverable' if is_recoverable else 'nonrecoverable',
+                type(response)
+            )
+        )
+
+    if isinstance(response[0], list):
+        for item in response:
+            _check_response(json, item, is_recoverable)
+
+        return
+
+    pattern = response.pop(-1)
+
+    for key in response:
+        try:
+            json = json[key]
+        except (TypeError, IndexError, KeyError) as e:
+            logger.debug(repr(e))
+            raise ExpectationException(
+                'No key or index "{0}" in json {1}'.format(key, json)
+            )
+
+    matches = re.match(pattern, '{0}'.format(json))
+
+    if matches and not is_recoverable:
+        raise NonRecoverableResponseException(
+            'Giving up... \n'
+            'Response value: {0} matches regexp:{1} from '
+            'nonrecoverable_response. '.format(json, pattern)
+        )
+
+    if not matches and is_recoverable:
+        raise RecoverableResponseException(
+            'Trying one more time...\n'
+            'Response value:{0} does not match regexp: {1} from '
+            'response_expectation'.format(json, pattern)
+        )
+
+
+def _get_response_format(response, call):
+    response_format = call.get('response_format', 'auto').lower()
+
+    if response_format != 'auto':
+        return response_format
+
+    content_type = (response.headers.get('Content-Type') or '').lower()
+
+    if content_type.startswith(('application/xml', 'text/xml')):
+        return 'xml'
+
+    # for backward compatibility json is used for unknown types
+    return 'json'
+
+
+def _process_response(response, call, store_props):
+    logger.debug('Store props: {0}'.format(shorted_text(store_props)))
+    logger.debug('Store headers: {0}'.format(shorted_text(response.headers)))
+    translation_version = call.get('translation_format', 'auto')
+
+    if response.headers:
+        translate_and_save(logger, response.headers,
+                           call.get('header_translation', None),
+                           store_props, translation_version)
+
+    if response.cookies:
+        translate_and_save(logger, response.cookies.get_dict(),
+                           call.get('cookies_translation', None),
+                           store_props, translation_version)
+
+    response_format = _get_response_format(response, call)
+    logger.debug('Response format is {0}'.format(repr(response_format)))
+
+    if response_format in ('json', 'xml'):
+        if response_format == 'json':
+            json = response.json()
+        else:
+            json = xmltodict.parse(response.text)
+            logger.debug('XML transformed to dict: {0}'.format(
+                shorted_text(obfuscate_passwords(json))
+            ))
+
+        _check_response(json, call.get('nonrecoverable_response'), False)
+        _check_response(json, call.get('response_expectation'), True)
+
+        translate_and_save(logger, json,
+                           call.get('response_translation', None),
+                           store_props, translation_version)
+    elif response_format == 'text':
+        store_props['text'] = response.text
+    elif response_format == 'raw':
+        logger.debug('No action for raw response_format')
+    else:
+        raise WrongTemplateDataException(
+            'Response_format {0} is not supported. '
+            'Only json/xml or raw response_format is supported'
+            .format(repr(response_format))
+        )
+
+
+def _store_certificates(request):
+    files_to_remove = []
+
+    for field in ['verify', 'cert']:
+        value = request.get(field)
+
+        if isinstance(value, basestring) and not os.path.isfile(value):
+            fd, destination = tempfile.mkstemp()
+            os.write(fd, value)
+            os.close(fd)
+
+            request[field] = destination
+            files_to_remove.append(destination)
+
+    return files_to_remove
+
+
+def send_call(call, request_props, transport=None, headers=None,
+              stream=False):
+    # rendered call is sent with request properties (hosts, port, ssl,
+    # verify...) - the same way for normal and streamed responses
+    transport = transport or get_transport()
+
+    request = request_props.copy()
+    request.update(call)
+
+    if headers:
+        request['headers'] = dict(request.get('headers') or {}, **headers)
+
+    files_to_remove = _store_certificates(request)
+
+    try:
+        return transport.send(request, stream=stream)
+    finally:
+        for path in files_to_remove:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.debug(
+                    'Cant remove temporary file {0}: {1}'
+                    .format(path, repr(e))
+                )
+
+
+def process(params, template, request_props, transport=None, headers=None):
+    result_properties = {}
+    calls = []
+    response = None
+
+    for compiled_call in template.calls:
+        # enrich params with items stored by previous calls
+        params.update(result_properties)
+
+        call = compiled_call.render(params)
+        calls.append(call)
+        logger.debug('Rendered call: {0}'.format(
+            shorted_text(obfuscate_passwords(call))
+        ))
+
+        response = send_call(call, request_props, transport, headers)
+
+        logger.info('Response content: \n{0}...'.format(
+            shorted_text(response.content)
+        ))
+        logger.info('Status code: {0}'.format(repr(response.status_code)))
+
+        if response.status_code == 304:
+            return {
+                'result_properties': None,
+                'calls': calls,
+                'headers': response.headers,
+                'not_modified': True
+            }
+
+        _process_response(response, call, result_properties)
+
+    return {
+        'result_properties': result_properties,
+        'calls': calls,
+        'headers': response.headers if response is not None else {},
+        'not_modified': False
+    }
+
+
+class TemplateCache(object):
+
+    def __init__(self, max_size=256, check_interval=5, negative_ttl=5):
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return None
+
+        if not stat.S_ISREG(path_stat.st_mode):
+            return None
+
+        return path_stat.st_mtime
+
+    def _is_fresh(self, entry, now):
+        content, _, checked_at = entry
+
+        if content is None:
+            return now - checked_at < self.negative_ttl
+
+        return now - checked_at < self.check_interval
+
+    def _load(self, path, entry):
+        mtime = self._get_mtime(path)
+
+        if mtime is None:
+            return None, None
+
+        if entry and entry[0] is not None and entry[1] == mtime:
+            return entry[0], mtime
+
+        with open(path, 'r') as f:
+            return CompiledTemplate(f.read()), mtime
+
+    def _store(self, path, entry):
+        self._entries.pop(path, None)
+        self._entries[path] = entry
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry and self._is_fresh(entry, now):
+                self.hits += 1
+                self._store(path, entry)
+
+                return entry[0]
+
+            content, mtime = self._load(path, entry)
+
+            if entry and content is not None and content is entry[0]:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+            self._store(path, (content, mtime, now))
+
+            return content
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries)
+        }
+
+
+TEMPLATE_CACHE = TemplateCache()
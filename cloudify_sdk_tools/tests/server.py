@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from BaseHTTPServer import (
+    BaseHTTPRequestHandler,
+    HTTPServer
+)
+from SocketServer import ThreadingMixIn
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+
+        with server.lock:
+            server.requests.append((self.command, self.path, body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        path = self.path.split('?')[0]
+        status, content, headers = server.routes.get(
+            (self.command, path),
+            (404, {'error': 'not found'}, {})
+        )
+
+        if callable(content):
+            content = content(self, body)
+
+            if isinstance(content, tuple):
+                status, content, headers = content
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        with server.lock:
+            server.in_flight -= 1
+
+        payload = json.dumps(content) if status != 304 else ''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = _respond
+    do_POST = _respond
+    do_PUT = _respond
+    do_DELETE = _respond
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # client gone (e.g. after timeout)
+        pass
+
+    def get_request(self):
+        connection = HTTPServer.get_request(self)
+
+        with self.lock:
+            self.connections += 1
+
+        return connection
+
+
+class LocalServer(object):
+
+    def __init__(self, routes=None, delay=0):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.routes = routes or {}
+        self._server.delay = delay
+        self._server.requests = []
+        self._server.connections = 0
+        self._server.in_flight = 0
+        self._server.max_in_flight = 0
+        self._server.lock = threading.Lock()
+
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    @property
+    def connections(self):
+        return self._server.connections
+
+    @property
+    def max_in_flight(self):
+        return self._server.max_in_flight
+
+    def route(self, method, path, content, status=200, headers=None):
+        self._server.routes[(method, path)] = (status, content, headers or {})
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.01}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
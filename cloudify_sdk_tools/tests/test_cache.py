@@ -0,0 +1,146 @@
+import time
+import unittest
+
+from cloudify_sdk_tools.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60)
+        self.key = ResponseCache.get_key(
+            ['host'],
+            80,
+            'project',
+            'get',
+            {'uuid': 'some-uuid'}
+        )
+        self.result = {'data': {'uuid': 'some-uuid'}}
+
+    def test_get_key_canonical(self):
+        # when
+        key = ResponseCache.get_key(
+            ['host'],
+            80,
+            'project',
+            'get',
+            {'b': [1, 2], 'a': {'y': 1, 'x': 2}}
+        )
+        same_key = ResponseCache.get_key(
+            ['host'],
+            80,
+            'project',
+            'get',
+            {'a': {'x': 2, 'y': 1}, 'b': [1, 2]}
+        )
+
+        # then
+        self.assertEquals(key, same_key)
+        self.assertNotEqual(key, self.key)
+
+    def test_get_miss(self):
+        # then
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEquals(self.cache.stats['misses'], 1)
+
+    def test_set_get_fresh(self):
+        # given
+        self.cache.set(self.key, self.result)
+
+        # when
+        entry = self.cache.get(self.key)
+
+        # then
+        self.assertTrue(entry.is_fresh())
+        self.assertEquals(entry.result, self.result)
+        self.assertEquals(self.cache.stats['hits'], 1)
+
+    def test_get_expired(self):
+        # given
+        self.cache.ttl = 0
+        self.cache.set(self.key, self.result, {'ETag': '"v1"'})
+
+        # when
+        entry = self.cache.get(self.key)
+
+        # then
+        self.assertFalse(entry.is_fresh())
+        self.assertEquals(
+            entry.conditional_headers,
+            {'If-None-Match': '"v1"'}
+        )
+        self.assertEquals(self.cache.stats['misses'], 1)
+
+    def test_revalidated(self):
+        # given
+        self.cache.ttl = 0
+        self.cache.set(
+            self.key,
+            self.result,
+            {'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'}
+        )
+        self.cache.ttl = 60
+
+        # when
+        entry = self.cache.revalidated(self.key)
+
+        # then
+        self.assertTrue(entry.is_fresh(time.time() + 30))
+        self.assertEquals(
+            entry.conditional_headers,
+            {'If-Modified-Since': 'Mon, 05 Oct 2026 10:00:00 GMT'}
+        )
+        self.assertEquals(self.cache.stats['revalidations'], 1)
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        # given
+        size = len('{"data": "xxxxxxxxxx"}')
+        cache = ResponseCache(max_memory=2 * size)
+        keys = [
+            ResponseCache.get_key(['host'], 80, 'project', 'get', {'i': i})
+            for i in range(3)
+        ]
+
+        # when
+        cache.set(keys[0], {'data': 'x' * 10})
+        cache.set(keys[1], {'data': 'y' * 10})
+        cache.get(keys[0])
+        cache.set(keys[2], {'data': 'z' * 10})
+
+        # then
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertEquals(cache.stats['memory'], 2 * size)
+
+    def test_set_too_big(self):
+        # given
+        cache = ResponseCache(max_memory=10)
+
+        # when
+        cache.set(self.key, {'data': 'x' * 100})
+
+        # then
+        self.assertIsNone(cache.get(self.key))
+        self.assertEquals(cache.stats['memory'], 0)
+
+    def test_invalidate(self):
+        # given
+        other_key = ResponseCache.get_key(
+            ['host'],
+            80,
+            'virtual_network',
+            'get',
+            {}
+        )
+        self.cache.set(self.key, self.result)
+        self.cache.set(other_key, self.result)
+
+        # when
+        self.cache.invalidate(['host'], 80, 'project')
+
+        # then
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertIsNotNone(self.cache.get(other_key))
+        self.assertEquals(self.cache.stats['invalidations'], 1)
+        self.assertEquals(self.cache.stats['size'], 1)
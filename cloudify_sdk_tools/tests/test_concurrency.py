@@ -0,0 +1,208 @@
+import threading
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+
+from mock import Mock, patch
+
+from cloudify_sdk_tools import concurrency
+from cloudify_sdk_tools.concurrency import (
+    get_thread_pool,
+    map_limited,
+    SingleFlight
+)
+
+
+class TestGetThreadPool(unittest.TestCase):
+
+    def test_get_thread_pool_shared(self):
+        # then
+        self.assertIs(get_thread_pool(3), get_thread_pool(3))
+        self.assertIsNot(get_thread_pool(3), get_thread_pool(4))
+
+    def test_get_thread_pool_size_capped(self):
+        # given
+        pools = {}
+
+        # when
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_POOL_SIZE', 3):
+            pool = get_thread_pool(1000)
+
+        # then
+        self.assertEquals(pools.keys(), [3])
+        self.assertIs(pools[3], pool)
+
+    def test_get_thread_pool_count_capped(self):
+        # given
+        pools = {}
+
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_THREAD_POOLS', 2):
+            small = get_thread_pool(2)
+            big = get_thread_pool(5)
+
+            # when
+            closest = get_thread_pool(3)
+            biggest = get_thread_pool(7)
+
+        # then
+        self.assertEquals(sorted(pools.keys()), [2, 5])
+        self.assertIs(closest, big)
+        self.assertIs(biggest, big)
+        self.assertIsNot(small, big)
+
+    def test_get_thread_pool_apply(self):
+        # when
+        result = get_thread_pool(2).map(lambda x: x * 2, range(5))
+
+        # then
+        self.assertEquals(result, [0, 2, 4, 6, 8])
+
+
+class TestMapLimited(unittest.TestCase):
+
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _run(self, item):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.01)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        return item * 2
+
+    def test_map_limited(self):
+        # when
+        result = map_limited(self._run, range(5), 2)
+
+        # then
+        self.assertEquals(result, [0, 2, 4, 6, 8])
+
+    def test_map_limited_bigger_pool(self):
+        # given
+        pools = {8: ThreadPool(8)}
+
+        # when
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_THREAD_POOLS', 1):
+            result = map_limited(self._run, range(8), 2)
+
+        # then
+        self.assertEquals(result, range(0, 16, 2))
+        self.assertEquals(self.max_in_flight, 2)
+        pools[8].terminate()
+
+    def test_map_limited_error(self):
+        # then
+        with self.assertRaises(ZeroDivisionError):
+            # when
+            map_limited(lambda item: 1 / item, [1, 0, 2], 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _blocking(self, result):
+        def func():
+            self.started.set()
+            self.release.wait(5)
+
+            if isinstance(result, Exception):
+                raise result
+
+            return result
+
+        return Mock(side_effect=func)
+
+    def _run_concurrently(self, func, count=5):
+        results = []
+        errors = []
+
+        def target():
+            try:
+                results.append(self.single_flight.do('key', func))
+            except Exception as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=target)
+        leader.start()
+        self.started.wait(5)
+
+        followers = [threading.Thread(target=target) for _ in range(count - 1)]
+
+        for thread in followers:
+            thread.start()
+
+        while self.single_flight.stats['coalesced'] < count - 1:
+            pass
+
+        self.release.set()
+
+        for thread in [leader] + followers:
+            thread.join()
+
+        return results, errors
+
+    def test_do_coalesced(self):
+        # given
+        value = {'data': [1, 2]}
+        func = self._blocking(value)
+
+        # when
+        results, errors = self._run_concurrently(func)
+
+        # then
+        func.assert_called_once_with()
+        self.assertEquals(errors, [])
+        self.assertEquals(results, [{'data': [1, 2]}] * 5)
+        self.assertEquals(len(set(id(result) for result in results)), 5)
+        self.assertFalse(any(result is value for result in results))
+        self.assertEquals(
+            self.single_flight.stats,
+            {'calls': 5, 'coalesced': 4, 'in_flight': 0}
+        )
+
+    def test_do_error_shared(self):
+        # given
+        func = self._blocking(RuntimeError('failed'))
+
+        # when
+        results, errors = self._run_concurrently(func, count=3)
+
+        # then
+        func.assert_called_once_with()
+        self.assertEquals(results, [])
+        self.assertEquals(len(errors), 3)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in errors))
+
+    def test_do_sequential_not_coalesced(self):
+        # given
+        func = Mock(return_value=1)
+
+        # when
+        self.single_flight.do('key', func)
+        self.single_flight.do('key', func)
+
+        # then
+        self.assertEquals(func.call_count, 2)
+        self.assertEquals(self.single_flight.coalesced, 0)
+
+    def test_do_different_keys(self):
+        # when
+        first = self.single_flight.do('a', Mock(return_value=1))
+        second = self.single_flight.do('b', Mock(return_value=2))
+
+        # then
+        self.assertEquals((first, second), (1, 2))
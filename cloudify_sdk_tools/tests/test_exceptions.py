@@ -1,7 +1,10 @@
+# -*- coding: utf-8 -*-
 import sys
 from traceback import format_tb
 import unittest
 
+from cloudify.exceptions import RecoverableError
+
 from cloudify_sdk_tools import exceptions
 
 
@@ -94,3 +97,61 @@ class InvalidInputArgumentsErrorTest(unittest.TestCase):
                 .format(missing_args, function_name, resource_name),
                 str(e)
             )
+
+
+class IsRecoverableTest(unittest.TestCase):
+
+    def test_is_recoverable_recoverable(self):
+        # then
+        self.assertTrue(
+            exceptions.is_recoverable(exceptions.RestSdkException())
+        )
+
+    def test_is_recoverable_non_recoverable(self):
+        # then
+        self.assertFalse(
+            exceptions.is_recoverable(exceptions.TemplateNotFoundError())
+        )
+
+    def test_is_recoverable_unknown(self):
+        # then
+        self.assertTrue(exceptions.is_recoverable(RuntimeError()))
+
+    def test_reraise_with_kwargs(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise RuntimeError('throttled')
+            except RuntimeError:
+                # when
+                exceptions.reraise(RecoverableError, retry_after=7)
+
+        self.assertEquals(e.exception.retry_after, 7)
+        self.assertIn('throttled', str(e.exception))
+
+    def test_reraise_with_kwargs_unicode(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise ValueError(u'błąd')
+            except ValueError:
+                # when
+                exceptions.reraise(RecoverableError, retry_after=5)
+
+        self.assertEquals(e.exception.retry_after, 5)
+        self.assertEquals(
+            unicode(e.exception),
+            u'błąd [retry_after=5]'
+        )
+
+    def test_reraise_with_message_unicode(self):
+        # then
+        with self.assertRaises(RecoverableError) as e:
+            try:
+                raise ValueError(u'błąd')
+            except ValueError:
+                # when
+                exceptions.reraise(RecoverableError, 'Details', retry_after=5)
+
+        self.assertEquals(e.exception.retry_after, 5)
+        self.assertIn(u'błąd', unicode(e.exception))
@@ -0,0 +1,79 @@
+import unittest
+
+from cloudify_sdk_tools.parameters import LayeredParameters
+
+
+class TestLayeredParameters(unittest.TestCase):
+
+    def setUp(self):
+        self.params = {'uuid': 'some-uuid', 'a': 1, 'payload': {'x': [1]}}
+        self.common_params = {'a': 2, 'b': 3}
+
+        self.layered = LayeredParameters(self.params, self.common_params)
+
+    def test_get_precedence(self):
+        # then
+        self.assertEquals(self.layered['uuid'], 'some-uuid')
+        self.assertEquals(self.layered['a'], 1)
+        self.assertEquals(self.layered['b'], 3)
+        self.assertEquals(self.layered.get('c'), None)
+        self.assertTrue('b' in self.layered)
+        self.assertFalse('c' in self.layered)
+
+    def test_no_copy(self):
+        # then
+        self.assertIs(self.layered['payload'], self.params['payload'])
+
+    def test_iter_len_eq(self):
+        # then
+        self.assertEquals(
+            sorted(self.layered),
+            ['a', 'b', 'payload', 'uuid']
+        )
+        self.assertEquals(len(self.layered), 4)
+        self.assertEquals(
+            self.layered,
+            {'uuid': 'some-uuid', 'a': 1, 'b': 3, 'payload': {'x': [1]}}
+        )
+        self.assertEquals(dict(self.layered)['a'], 1)
+
+    def test_update_does_not_mutate_layers(self):
+        # when
+        self.layered.update({'a': 10, 'c': 11})
+        self.layered['b'] = 12
+
+        # then
+        self.assertEquals(self.layered['a'], 10)
+        self.assertEquals(self.layered['b'], 12)
+        self.assertEquals(self.layered['c'], 11)
+        self.assertEquals(
+            self.params,
+            {'uuid': 'some-uuid', 'a': 1, 'payload': {'x': [1]}}
+        )
+        self.assertEquals(self.common_params, {'a': 2, 'b': 3})
+
+    def test_delete_does_not_mutate_layers(self):
+        # when
+        del self.layered['a']
+
+        # then
+        self.assertFalse('a' in self.layered)
+        self.assertEquals(len(self.layered), 3)
+        self.assertEquals(self.params['a'], 1)
+
+        with self.assertRaises(KeyError):
+            self.layered['a']
+
+        with self.assertRaises(KeyError):
+            del self.layered['a']
+
+    def test_set_after_delete(self):
+        # given
+        del self.layered['b']
+
+        # when
+        self.layered['b'] = 5
+
+        # then
+        self.assertEquals(self.layered['b'], 5)
+        self.assertEquals(self.common_params['b'], 3)
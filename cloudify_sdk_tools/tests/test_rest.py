@@ -1,11 +1,21 @@
 import unittest
 from mock import Mock, patch
+from multiprocessing.pool import ThreadPool
 
 from cloudify.state import current_ctx
 from cloudify.mocks import MockCloudifyContext
 
+from requests import exceptions as requests_exceptions
+
+from cloudify_sdk_tools import concurrency
+from cloudify_sdk_tools.cache import ResponseCache
+from cloudify_sdk_tools.concurrency import SingleFlight
 from cloudify_sdk_tools.exceptions import TemplateNotFoundError
-from cloudify_sdk_tools.rest import RestSDKClient
+from cloudify_sdk_tools.rest import (
+    AsyncRestSDKClient,
+    RestSDKClient
+)
+from cloudify_sdk_tools.tests.server import LocalServer
 
 
 class TestRestSDKClient(unittest.TestCase):
@@ -131,15 +141,20 @@ class TestRestSDKClient(unittest.TestCase):
             # then
             self.assertEqual(response, expected_result)
 
-            send_rest_request.assert_called_with(
-                params=expected_params,
-                request_props={
+            _, kwargs = send_rest_request.call_args
+            self.assertEqual(kwargs['params'], expected_params)
+            self.assertEqual(
+                kwargs['request_props'],
+                {
                     'ssl': expected_ssl,
                     'verify': expected_verify,
                     'port': client_parameters.get('port', 80),
                     'hosts': [client_parameters.get('ip')]
-                },
-                template=self.EXPECTED_TEMPLATE
+                }
+            )
+            self.assertEqual(
+                kwargs['template'].source,
+                self.EXPECTED_TEMPLATE
             )
 
     def test_call(self):
@@ -204,3 +219,394 @@ class TestRestSDKClient(unittest.TestCase):
             expected_params=expected_params,
             common_parameters={'a': 1}
         )
+
+    def test_call_does_not_mutate_parameters(self):
+        # given
+        parameters = {'uuid': self.TEST_PROJECT_UUID}
+        common_parameters = {'a': 1}
+
+        def process_response(response, call, store_props):
+            store_props['project'] = self.GET_PROJECT_RESPONSE['project']
+
+        # when
+        with patch('cloudify_sdk_tools.transport.Transport.send', Mock()), \
+                patch('cloudify_sdk_tools.templates._process_response',
+                      Mock(side_effect=process_response)):
+            response = RestSDKClient(
+                logger=Mock(),
+                module_name='cloudify_sdk_tools.tests',
+                ip='host',
+                common_parameters=common_parameters
+            ).call('project', 'get', parameters)
+
+        # then
+        self.assertEqual(response, self.GET_PROJECT_RESPONSE)
+        self.assertEqual(parameters, {'uuid': self.TEST_PROJECT_UUID})
+        self.assertEqual(common_parameters, {'a': 1})
+
+    def test_call_local_server(self):
+        # given
+        with LocalServer() as server:
+            server.route(
+                'GET',
+                '/project/{0}'.format(self.TEST_PROJECT_UUID),
+                self.GET_PROJECT_RESPONSE
+            )
+            client = RestSDKClient(
+                logger=Mock(),
+                module_name='cloudify_sdk_tools.tests',
+                ip='127.0.0.1',
+                port=server.port,
+                pool_size=1
+            )
+
+            # when
+            for _ in range(3):
+                response = client.call(
+                    'project',
+                    'get',
+                    {'uuid': self.TEST_PROJECT_UUID}
+                )
+
+            # then
+            self.assertEqual(
+                response,
+                {'data': self.GET_PROJECT_RESPONSE['project']}
+            )
+            self.assertEqual(len(server.requests), 3)
+            self.assertEqual(server.connections, 1)
+
+
+class TestAsyncRestSDKClient(unittest.TestCase):
+
+    UUIDS = ['uuid-{0}'.format(i) for i in range(8)]
+
+    def setUp(self):
+        self.server = LocalServer(delay=0.05).__enter__()
+
+        for uuid in self.UUIDS:
+            self.server.route(
+                'GET',
+                '/project/{0}'.format(uuid),
+                {'project': {'uuid': uuid}}
+            )
+
+        self.client = AsyncRestSDKClient(
+            logger=Mock(),
+            module_name='cloudify_sdk_tools.tests',
+            ip='127.0.0.1',
+            port=self.server.port,
+            common_parameters={'uuid': 'common-uuid'},
+            max_workers=8,
+            pool_size=8
+        )
+
+    def tearDown(self):
+        self.server.__exit__()
+        super(TestAsyncRestSDKClient, self).tearDown()
+
+    def test_acall(self):
+        # when
+        result = self.client.acall('project', 'get', {'uuid': 'uuid-1'})
+
+        # then
+        self.assertEqual(result.get(5), {'data': {'uuid': 'uuid-1'}})
+
+    def test_acall_common_parameters(self):
+        # given
+        self.server.route(
+            'GET',
+            '/project/common-uuid',
+            {'project': {'uuid': 'common-uuid'}}
+        )
+
+        # when
+        result = self.client.acall('project', 'get', {})
+
+        # then
+        self.assertEqual(result.get(5), {'data': {'uuid': 'common-uuid'}})
+
+    def test_gather(self):
+        # when
+        results = self.client.gather(
+            [('project', 'get', {'uuid': uuid}) for uuid in self.UUIDS]
+        )
+
+        # then
+        self.assertEqual(
+            results,
+            [{'data': {'uuid': uuid}} for uuid in self.UUIDS]
+        )
+        self.assertTrue(self.server.max_in_flight > 1)
+
+    def test_gather_concurrency_limit(self):
+        # when
+        self.client.gather(
+            [('project', 'get', {'uuid': uuid}) for uuid in self.UUIDS],
+            concurrency=2
+        )
+
+        # then
+        self.assertEqual(len(self.server.requests), len(self.UUIDS))
+        self.assertTrue(self.server.max_in_flight <= 2)
+
+    def test_gather_concurrency_limit_bigger_pool(self):
+        # given
+        pools = {8: ThreadPool(8)}
+
+        # when
+        with patch.object(concurrency, '_THREAD_POOLS', pools), \
+                patch.object(concurrency, 'MAX_THREAD_POOLS', 1):
+            self.client.gather(
+                [('project', 'get', {'uuid': uuid}) for uuid in self.UUIDS],
+                concurrency=2
+            )
+
+        # then
+        self.assertEqual(len(self.server.requests), len(self.UUIDS))
+        self.assertTrue(self.server.max_in_flight <= 2)
+        pools[8].terminate()
+
+    def test_gather_error(self):
+        # then
+        with self.assertRaises(TemplateNotFoundError):
+            # when
+            self.client.gather([
+                ('project', 'get', {'uuid': 'uuid-1'}),
+                ('not_supported_resource', 'get', {})
+            ])
+
+
+class TestRestSDKClientCallMany(unittest.TestCase):
+
+    def test_call_many(self):
+        # given
+        with LocalServer(delay=0.02) as server:
+            server.route('GET', '/project/a', {'project': 'a'})
+            server.route('GET', '/project/b', {'project': 'b'})
+            server.route('GET', '/project/c', {'error': 'c'}, 500)
+
+            client = RestSDKClient(
+                logger=Mock(),
+                module_name='cloudify_sdk_tools.tests',
+                ip='127.0.0.1',
+                port=server.port
+            )
+
+            # when
+            results = client.call_many(
+                [
+                    ('project', 'get', {'uuid': 'a'}),
+                    ('not_supported_resource', 'get', {}),
+                    ('project', 'get', {'uuid': 'c'}),
+                    ('project', 'get', {'uuid': 'b'})
+                ],
+                max_workers=4
+            )
+
+        # then
+        self.assertEqual(len(results), 4)
+
+        self.assertTrue(results[0].is_successful)
+        self.assertEqual(results[0].get(), {'data': 'a'})
+        self.assertEqual(results[3].get(), {'data': 'b'})
+
+        self.assertFalse(results[1].is_successful)
+        self.assertFalse(results[1].is_recoverable)
+        self.assertIsInstance(results[1].error, TemplateNotFoundError)
+
+        self.assertFalse(results[2].is_successful)
+        self.assertTrue(results[2].is_recoverable)
+
+        with self.assertRaises(requests_exceptions.HTTPError):
+            results[2].get()
+
+
+class TestRestSDKClientResponseCache(unittest.TestCase):
+
+    UUID = 'some-uuid'
+
+    def setUp(self):
+        self.version = ['"v1"']
+
+        def get_project(handler, body):
+            if handler.headers.get('If-None-Match') == self.version[0]:
+                return 304, None, {'ETag': self.version[0]}
+
+            return (
+                200,
+                {'project': {'version': self.version[0]}},
+                {'ETag': self.version[0]}
+            )
+
+        self.server = LocalServer().__enter__()
+        self.server.route('GET', '/project/' + self.UUID, get_project)
+        self.server.route('PUT', '/project/' + self.UUID, {})
+
+        self.cache = ResponseCache(ttl=60)
+        self.client = RestSDKClient(
+            logger=Mock(),
+            module_name='cloudify_sdk_tools.tests',
+            ip='127.0.0.1',
+            port=self.server.port,
+            response_cache=self.cache
+        )
+
+    def tearDown(self):
+        self.server.__exit__()
+        super(TestRestSDKClientResponseCache, self).tearDown()
+
+    def _get(self):
+        return self.client.call('project', 'get', {'uuid': self.UUID})
+
+    def test_call_cached(self):
+        # when
+        first = self._get()
+        first['data']['version'] = 'modified by caller'
+        second = self._get()
+
+        # then
+        self.assertEqual(second, {'data': {'version': '"v1"'}})
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_call_cache_different_params(self):
+        # given
+        self.server.route(
+            'GET',
+            '/project/other-uuid',
+            {'project': {'version': 'other'}}
+        )
+
+        # when
+        self._get()
+        result = self.client.call('project', 'get', {'uuid': 'other-uuid'})
+
+        # then
+        self.assertEqual(result, {'data': {'version': 'other'}})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_call_revalidate_not_modified(self):
+        # given
+        self.cache.ttl = 0
+        self._get()
+        self.cache.ttl = 60
+
+        # when
+        result = self._get()
+
+        # then
+        self.assertEqual(result, {'data': {'version': '"v1"'}})
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.cache.stats['revalidations'], 1)
+
+    def test_call_revalidate_modified(self):
+        # given
+        self.cache.ttl = 0
+        self._get()
+        self.version[0] = '"v2"'
+
+        # when
+        result = self._get()
+
+        # then
+        self.assertEqual(result, {'data': {'version': '"v2"'}})
+        self.assertEqual(self.cache.stats['revalidations'], 0)
+
+    def test_call_non_get_invalidates(self):
+        # given
+        self._get()
+        self.version[0] = '"v2"'
+
+        # when
+        self.client.call(
+            'project',
+            'update',
+            {'uuid': self.UUID, 'display_name': 'new'}
+        )
+        result = self._get()
+
+        # then
+        self.assertEqual(result, {'data': {'version': '"v2"'}})
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.cache.stats['invalidations'], 1)
+
+
+class TestRestSDKClientStream(unittest.TestCase):
+
+    PROJECTS = [
+        {'uuid': 'uuid-{0}'.format(i), 'name': 'project-{0}'.format(i)}
+        for i in range(100)
+    ]
+
+    def test_stream(self):
+        # given
+        with LocalServer() as server:
+            server.route('GET', '/projects', {'projects': self.PROJECTS})
+
+            client = RestSDKClient(
+                logger=Mock(),
+                module_name='cloudify_sdk_tools.tests',
+                ip='127.0.0.1',
+                port=server.port
+            )
+
+            # when
+            result = list(client.stream(
+                'project',
+                'list',
+                {'parent_id': 'domain'},
+                items_path=['projects'],
+                fields=['uuid'],
+                chunk_size=64
+            ))
+
+        # then
+        self.assertEqual(
+            result,
+            [{'uuid': project['uuid']} for project in self.PROJECTS]
+        )
+        self.assertEqual(
+            server.requests[0][1],
+            '/projects?parent_id=domain'
+        )
+
+
+class TestRestSDKClientSingleFlight(unittest.TestCase):
+
+    def test_single_flight_disabled_by_default(self):
+        # then
+        self.assertIsNone(RestSDKClient.SINGLE_FLIGHT)
+
+    def test_call_coalesced(self):
+        # given
+        with LocalServer(delay=0.2) as server:
+            server.route('GET', '/project/a', {'project': 'a'})
+            server.route('PUT', '/project/a', {})
+
+            client = AsyncRestSDKClient(
+                logger=Mock(),
+                module_name='cloudify_sdk_tools.tests',
+                ip='127.0.0.1',
+                port=server.port
+            )
+            client.SINGLE_FLIGHT = SingleFlight()
+
+            # when
+            results = client.gather(
+                [('project', 'get', {'uuid': 'a'})] * 5 +
+                [('project', 'update', {'uuid': 'a', 'display_name': 'x'})] *
+                2
+            )
+
+        # then
+        self.assertEqual(results[:5], [{'data': 'a'}] * 5)
+        self.assertEqual(
+            [request[0] for request in server.requests].count('GET'),
+            1
+        )
+        self.assertEqual(
+            [request[0] for request in server.requests].count('PUT'),
+            2
+        )
+        self.assertEqual(client.SINGLE_FLIGHT.coalesced, 4)
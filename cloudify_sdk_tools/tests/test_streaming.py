@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from cloudify_sdk_tools.exceptions import ResourceProcessingError
+from cloudify_sdk_tools.streaming import iter_json_items
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIterJsonItems(unittest.TestCase):
+
+    ITEMS = [
+        {'uuid': 'a', 'name': u'zażółć', 'fq_name': ['d', 'a']},
+        {'uuid': 'b', 'name': 'b', 'fq_name': ['d', 'b'], 'extra': {'x': 1}}
+    ]
+
+    RESPONSE = json.dumps({
+        'count': 2,
+        'meta': {'items': [1, 2, {'nested': '}]'}]},
+        'projects': ITEMS,
+        'tail': 'ignored'
+    }, ensure_ascii=False).encode('utf-8')
+
+    def test_iter_items_path(self):
+        for size in (1, 3, 7, 1024):
+            # when
+            result = list(iter_json_items(
+                _chunks(self.RESPONSE, size),
+                ['projects']
+            ))
+
+            # then
+            self.assertEquals(result, self.ITEMS)
+
+    def test_iter_nested_items_path(self):
+        # given
+        response = json.dumps({'data': {'list': [1, 2, 3]}})
+
+        # when
+        result = list(iter_json_items(
+            _chunks(response, 2),
+            ['data', 'list']
+        ))
+
+        # then
+        self.assertEquals(result, [1, 2, 3])
+
+    def test_iter_top_level_numbers(self):
+        # when
+        result = list(iter_json_items(_chunks('[12345, 6, 78.5]', 2)))
+
+        # then
+        self.assertEquals(result, [12345, 6, 78.5])
+
+    def test_iter_empty(self):
+        # when
+        result = list(iter_json_items(
+            [' { "projects" : [ ] } '],
+            ['projects']
+        ))
+
+        # then
+        self.assertEquals(result, [])
+
+    def test_iter_lazy(self):
+        # given
+        consumed = []
+
+        def chunks():
+            for chunk in _chunks(self.RESPONSE, 16):
+                consumed.append(chunk)
+                yield chunk
+
+        # when
+        items = iter_json_items(chunks(), ['projects'])
+        first = next(items)
+
+        # then
+        self.assertEquals(first, self.ITEMS[0])
+        self.assertTrue(len(''.join(consumed)) < len(self.RESPONSE))
+
+    def test_iter_fields_projection(self):
+        # when
+        result = list(iter_json_items(
+            _chunks(self.RESPONSE, 5),
+            ['projects'],
+            fields=['uuid', 'extra']
+        ))
+
+        # then
+        self.assertEquals(
+            result,
+            [{'uuid': 'a'}, {'uuid': 'b', 'extra': {'x': 1}}]
+        )
+
+    def test_iter_max_size(self):
+        # given
+        items = iter_json_items(
+            _chunks(self.RESPONSE, 10),
+            ['projects'],
+            max_size=50
+        )
+
+        # then
+        with self.assertRaises(ResourceProcessingError):
+            # when
+            list(items)
+
+    def test_iter_key_not_found(self):
+        # then
+        with self.assertRaises(ResourceProcessingError):
+            # when
+            list(iter_json_items([self.RESPONSE], ['networks']))
+
+    def test_iter_not_a_list(self):
+        # then
+        with self.assertRaises(ResourceProcessingError):
+            # when
+            list(iter_json_items([self.RESPONSE], ['count']))
+
+    def test_iter_truncated(self):
+        # then
+        with self.assertRaises(ResourceProcessingError):
+            # when
+            list(iter_json_items([self.RESPONSE[:-40]], ['projects']))
@@ -0,0 +1,391 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cloudify_common_sdk.exceptions import (
+    NonRecoverableResponseException,
+    RecoverableResponseException
+)
+from mock import Mock, patch
+
+from cloudify_sdk_tools.templates import (
+    _process_response,
+    CompiledTemplate,
+    process,
+    send_call,
+    TemplateCache
+)
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    TEMPLATE = """
+rest_calls:
+  - path: '/project/{{ uuid }}'
+    method: 'GET'
+    response_translation:
+      project: [data]
+  - path: '/virtual-network'
+    method: 'POST'
+    payload:
+      virtual-network:
+        fq_name: ['default-domain', '{{ data.name }}', '{{ name }}']
+        tags: '{% if tags %}{{ tags }}{% else %}[]{% endif %}'
+"""
+
+    def test_init(self):
+        # when
+        template = CompiledTemplate(self.TEMPLATE)
+
+        # then
+        self.assertEquals(template.source, self.TEMPLATE)
+        self.assertEquals(len(template.calls), 2)
+
+    def test_init_no_rest_calls(self):
+        # when
+        template = CompiledTemplate('# only comment')
+
+        # then
+        self.assertEquals(template.calls, [])
+
+    def test_render(self):
+        # given
+        template = CompiledTemplate(self.TEMPLATE)
+        params = {
+            'uuid': 'some-uuid',
+            'name': 'vn',
+            'tags': ['a', 'b'],
+            'data': {'name': 'project'}
+        }
+
+        # when
+        first_call = template.calls[0].render(params)
+        second_call = template.calls[1].render(params)
+
+        # then
+        self.assertEquals(
+            first_call,
+            {
+                'path': '/project/some-uuid',
+                'method': 'GET',
+                'response_translation': {'project': ['data']}
+            }
+        )
+        self.assertEquals(
+            second_call,
+            {
+                'path': '/virtual-network',
+                'method': 'POST',
+                'payload': {
+                    'virtual-network': {
+                        'fq_name': ['default-domain', 'project', 'vn'],
+                        'tags': ['a', 'b']
+                    }
+                }
+            }
+        )
+
+    def test_render_static_call(self):
+        # given
+        template = CompiledTemplate("rest_calls:\n  - path: '/domain'\n")
+
+        # when
+        first = template.calls[0].render({})
+        second = template.calls[0].render({})
+
+        # then
+        self.assertIsNone(template.calls[0].renderer)
+        self.assertEquals(first, {'path': '/domain'})
+        self.assertIsNot(first, second)
+
+
+class TestProcess(unittest.TestCase):
+
+    def test_process(self):
+        # given
+        template = CompiledTemplate(TestCompiledTemplate.TEMPLATE)
+        params = {'uuid': 'some-uuid', 'name': 'vn', 'tags': []}
+        request_props = {'hosts': ['host'], 'port': 80, 'ssl': False}
+        responses = [Mock(), Mock()]
+
+        def process_response(response, call, store_props):
+            if response is responses[0]:
+                store_props['data'] = {'name': 'project'}
+
+        transport = Mock()
+        transport.send = Mock(side_effect=responses)
+
+        # when
+        with patch('cloudify_sdk_tools.templates._process_response',
+                   Mock(side_effect=process_response)):
+            result = process(params, template, request_props, transport)
+
+        # then
+        self.assertEquals(
+            result['result_properties'],
+            {'data': {'name': 'project'}}
+        )
+        self.assertEquals(len(result['calls']), 2)
+        self.assertEquals(
+            result['calls'][1]['payload']['virtual-network']['fq_name'],
+            ['default-domain', 'project', 'vn']
+        )
+
+        request = transport.send.call_args[0][0]
+        self.assertEquals(request['hosts'], ['host'])
+        self.assertEquals(request['method'], 'POST')
+        self.assertEquals(request_props, {
+            'hosts': ['host'],
+            'port': 80,
+            'ssl': False
+        })
+
+    def test_process_no_calls(self):
+        # when
+        result = process({}, CompiledTemplate(''), {})
+
+        # then
+        self.assertEquals(result['result_properties'], {})
+        self.assertEquals(result['calls'], [])
+        self.assertFalse(result['not_modified'])
+
+
+class TestSendCall(unittest.TestCase):
+
+    def test_send_call_stream_stores_certificates(self):
+        # given
+        sent = {}
+
+        def send(request, stream=False):
+            sent['stream'] = stream
+            sent['verify'] = request['verify']
+
+            with open(request['verify']) as f:
+                sent['content'] = f.read()
+
+        transport = Mock()
+        transport.send = Mock(side_effect=send)
+
+        # when
+        send_call(
+            {'method': 'GET', 'path': '/projects'},
+            {'hosts': ['host'], 'verify': '-----BEGIN CERTIFICATE-----'},
+            transport,
+            stream=True
+        )
+
+        # then
+        self.assertTrue(sent['stream'])
+        self.assertEquals(sent['content'], '-----BEGIN CERTIFICATE-----')
+        self.assertFalse(os.path.exists(sent['verify']))
+
+
+class TestProcessResponse(unittest.TestCase):
+
+    @staticmethod
+    def _response(json, content_type='application/json'):
+        response = Mock()
+        response.headers = {'Content-Type': content_type}
+        response.cookies = None
+        response.json = Mock(return_value=json)
+        response.text = '<a><b>value</b></a>'
+
+        return response
+
+    def test_json(self):
+        # given
+        store_props = {}
+        call = {'response_translation': {'name': ['name']}}
+
+        # when
+        _process_response(self._response({'name': 'vn'}), call, store_props)
+
+        # then
+        self.assertEquals(store_props, {'name': 'vn'})
+
+    def test_xml(self):
+        # given
+        store_props = {}
+        call = {'response_translation': {'a': {'b': ['value']}}}
+
+        # when
+        _process_response(self._response(None, 'text/xml'), call, store_props)
+
+        # then
+        self.assertEquals(store_props, {'value': 'value'})
+
+    def test_response_expectation(self):
+        # given
+        call = {'response_expectation': [['status', 'ok']]}
+
+        # then
+        with self.assertRaises(RecoverableResponseException):
+            # when
+            _process_response(
+                self._response({'status': 'pending'}),
+                call,
+                {}
+            )
+
+    def test_nonrecoverable_response(self):
+        # given
+        call = {'nonrecoverable_response': [['status', 'error']]}
+
+        # then
+        with self.assertRaises(NonRecoverableResponseException):
+            # when
+            _process_response(
+                self._response({'status': 'error'}),
+                call,
+                {}
+            )
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    TEMPLATE = "rest_calls:\n  - path: '/project/{{ uuid }}'\n"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'get.yaml')
+
+        with open(self.path, 'w') as f:
+            f.write(self.TEMPLATE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestTemplateCache, self).tearDown()
+
+    def test_get_hit_does_not_touch_filesystem(self):
+        # given
+        cache = TemplateCache()
+        cache.get(self.path)
+
+        # when
+        with patch('os.stat', Mock(side_effect=OSError)) as stat_mock:
+            result = cache.get(self.path)
+
+        # then
+        self.assertEquals(result.source, self.TEMPLATE)
+        stat_mock.assert_not_called()
+        self.assertEquals(cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_get_relative_and_absolute_path_share_entry(self):
+        # given
+        cache = TemplateCache()
+        relative_path = os.path.relpath(self.path)
+
+        # when
+        cache.get(self.path)
+        cache.get(relative_path)
+
+        # then
+        self.assertEquals(cache.stats, {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_get_revalidate_unchanged_mtime(self):
+        # given
+        cache = TemplateCache(check_interval=0)
+        cache.get(self.path)
+
+        # when
+        result = cache.get(self.path)
+
+        # then
+        self.assertEquals(result.source, self.TEMPLATE)
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(cache.misses, 1)
+
+    def test_get_mtime_changed(self):
+        # given
+        cache = TemplateCache(check_interval=0)
+        cache.get(self.path)
+        new_template = 'rest_calls: []\n'
+
+        with open(self.path, 'w') as f:
+            f.write(new_template)
+
+        mtime = os.stat(self.path).st_mtime + 10
+        os.utime(self.path, (mtime, mtime))
+
+        # when
+        result = cache.get(self.path)
+
+        # then
+        self.assertEquals(result.source, new_template)
+        self.assertEquals(cache.misses, 2)
+
+    def test_get_not_found_cached(self):
+        # given
+        cache = TemplateCache(negative_ttl=60)
+        path = os.path.join(self.directory, 'list.yaml')
+        self.assertIsNone(cache.get(path))
+
+        with open(path, 'w') as f:
+            f.write(self.TEMPLATE)
+
+        # when
+        result = cache.get(path)
+
+        # then
+        self.assertIsNone(result)
+        self.assertEquals(cache.hits, 1)
+
+    def test_get_not_found_expired(self):
+        # given
+        cache = TemplateCache(negative_ttl=0)
+        path = os.path.join(self.directory, 'list.yaml')
+        self.assertIsNone(cache.get(path))
+
+        with open(path, 'w') as f:
+            f.write(self.TEMPLATE)
+
+        # when
+        result = cache.get(path)
+
+        # then
+        self.assertEquals(result.source, self.TEMPLATE)
+
+    def test_get_directory(self):
+        # given
+        cache = TemplateCache()
+
+        # when
+        result = cache.get(self.directory)
+
+        # then
+        self.assertIsNone(result)
+
+    def test_get_lru_eviction(self):
+        # given
+        cache = TemplateCache(max_size=2)
+        paths = []
+
+        for name in ('a', 'b', 'c'):
+            path = os.path.join(self.directory, '{0}.yaml'.format(name))
+            paths.append(path)
+
+            with open(path, 'w') as f:
+                f.write(name)
+
+        # when
+        cache.get(paths[0])
+        cache.get(paths[1])
+        cache.get(paths[0])
+        cache.get(paths[2])
+        cache.get(paths[0])
+        cache.get(paths[1])
+
+        # then
+        self.assertEquals(cache.stats, {'hits': 2, 'misses': 4, 'size': 2})
+
+    def test_clear(self):
+        # given
+        cache = TemplateCache()
+        cache.get(self.path)
+
+        # when
+        cache.clear()
+
+        # then
+        self.assertEquals(cache.stats, {'hits': 0, 'misses': 0, 'size': 0})
@@ -0,0 +1,429 @@
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+from cloudify_common_sdk.exceptions import (
+    RecoverableResponseException,
+    RecoverableStatusCodeCodeException
+)
+from requests import exceptions as requests_exceptions
+
+from cloudify_sdk_tools.tests.server import LocalServer
+from cloudify_sdk_tools.transport import (
+    get_retry_after,
+    get_transport,
+    HostSelector,
+    Transport
+)
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().__enter__()
+        self.server.route('GET', '/project', {'name': 'default'})
+        self.server.route('POST', '/project', {'error': 'conflict'}, 409)
+
+        self.host_selector = HostSelector()
+        self.transport = Transport(
+            pool_size=2,
+            host_selector=self.host_selector
+        )
+
+    def tearDown(self):
+        self.server.__exit__()
+        super(TestTransport, self).tearDown()
+
+    def _call(self, method='GET', hosts=None, **kwargs):
+        call = {
+            'hosts': hosts or ['127.0.0.1'],
+            'port': self.server.port,
+            'ssl': False,
+            'verify': False,
+            'path': '/project',
+            'method': method
+        }
+        call.update(kwargs)
+
+        return call
+
+    def test_send_reuses_connection(self):
+        # when
+        for _ in range(5):
+            response = self.transport.send(self._call())
+
+        # then
+        self.assertEquals(response.json(), {'name': 'default'})
+        self.assertEquals(self.server.connections, 1)
+
+        stats = self.transport.stats[
+            'http://127.0.0.1:{0}'.format(self.server.port)
+        ]
+        self.assertEquals(stats['requests'], 5)
+        self.assertEquals(stats['connections'], 1)
+        self.assertEquals(stats['reused_connections'], 4)
+        self.assertEquals(stats['pool_size'], 2)
+
+    def test_send_does_not_persist_cookies(self):
+        # given
+        self.server.route(
+            'GET',
+            '/login',
+            lambda handler, body: (
+                200,
+                {'cookie': handler.headers.get('Cookie')},
+                {'Set-Cookie': 'session=secret; Path=/'}
+            )
+        )
+
+        # when
+        first = self.transport.send(self._call(path='/login'))
+        second = self.transport.send(self._call(path='/login'))
+
+        # then
+        self.assertEquals(first.cookies.get_dict(), {'session': 'secret'})
+        self.assertEquals(second.json(), {'cookie': None})
+
+    def test_send_pool_size_bounds_connections(self):
+        # given
+        self.server._server.delay = 0.05
+
+        def send():
+            self.transport.send(self._call())
+
+        threads = [threading.Thread(target=send) for _ in range(6)]
+
+        # when
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # then
+        stats = self.transport.stats.values()[0]
+        self.assertEquals(stats['requests'], 6)
+        self.assertTrue(stats['connections'] <= 2)
+        self.assertTrue(stats['max_wait_time'] > 0)
+
+    def test_send_payload(self):
+        # when
+        self.transport.send(self._call(
+            method='POST',
+            payload={'name': 'new'},
+            successful_codes=[409]
+        ))
+
+        # then
+        self.assertEquals(
+            self.server.requests[0],
+            ('POST', '/project', '{"name": "new"}')
+        )
+
+    def test_send_http_error(self):
+        # then
+        with self.assertRaises(requests_exceptions.HTTPError):
+            # when
+            self.transport.send(self._call(method='POST'))
+
+    def test_send_stream_http_error_releases_connection(self):
+        # given
+        results = []
+
+        def send():
+            for _ in range(3):
+                try:
+                    self.transport.send(self._call(method='POST'), stream=True)
+                except requests_exceptions.HTTPError:
+                    pass
+
+            results.append(self.transport.send(self._call()).json())
+
+        thread = threading.Thread(target=send)
+        thread.daemon = True
+
+        # when
+        thread.start()
+        thread.join(5)
+
+        # then
+        self.assertFalse(thread.is_alive())
+        self.assertEquals(results, [{'name': 'default'}])
+
+    def test_send_recoverable_code(self):
+        # then
+        with self.assertRaises(RecoverableStatusCodeCodeException):
+            # when
+            self.transport.send(self._call(
+                method='POST',
+                recoverable_codes=[409]
+            ))
+
+    def test_send_http_error_retry_after(self):
+        # given
+        self.server.route(
+            'GET',
+            '/throttled',
+            {'error': 'throttled'},
+            429,
+            {'Retry-After': '7'}
+        )
+
+        # then
+        with self.assertRaises(requests_exceptions.HTTPError) as e:
+            # when
+            self.transport.send(self._call(path='/throttled'))
+
+        self.assertEquals(e.exception.retry_after, 7)
+
+    def test_send_recoverable_code_retry_after(self):
+        # given
+        self.server.route(
+            'GET',
+            '/throttled',
+            {'error': 'unavailable'},
+            503,
+            {'X-RateLimit-Reset': str(int(time.time()) + 30)}
+        )
+
+        # then
+        with self.assertRaises(RecoverableStatusCodeCodeException) as e:
+            # when
+            self.transport.send(self._call(
+                path='/throttled',
+                recoverable_codes=[503]
+            ))
+
+        self.assertTrue(28 <= e.exception.retry_after <= 31)
+
+    def test_send_http_error_no_retry_after(self):
+        # then
+        with self.assertRaises(requests_exceptions.HTTPError) as e:
+            # when
+            self.transport.send(self._call(method='POST'))
+
+        self.assertIsNone(e.exception.retry_after)
+
+    def test_send_failover_to_next_host(self):
+        # when
+        response = self.transport.send(self._call(
+            hosts=['127.0.0.2', '127.0.0.1'],
+            port=self.server.port,
+            timeout=1
+        ))
+
+        # then
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(self.server.requests), 1)
+
+    def test_send_remembers_last_good_host(self):
+        # given
+        call = self._call(hosts=['127.0.0.2', '127.0.0.1'], timeout=1)
+        good_host = 'http://127.0.0.1:{0}'.format(self.server.port)
+        bad_host = 'http://127.0.0.2:{0}'.format(self.server.port)
+
+        # when
+        for _ in range(5):
+            self.transport.send(call)
+
+        # then
+        self.assertEquals(len(self.server.requests), 5)
+        self.assertEquals(
+            self.host_selector.order([bad_host, good_host])[0],
+            good_host
+        )
+        self.assertTrue(self.host_selector.stats[bad_host]['errors'] > 0)
+        self.assertEquals(self.host_selector.stats[good_host]['errors'], 0)
+
+    def test_send_stops_after_first_successful_host(self):
+        # when
+        self.transport.send(self._call(hosts=['127.0.0.1', 'localhost']))
+
+        # then
+        self.assertEquals(len(self.server.requests), 1)
+
+    def test_send_connection_error(self):
+        # then
+        with self.assertRaises(requests_exceptions.ConnectionError):
+            # when
+            self.transport.send(self._call(hosts=['127.0.0.2'], timeout=1))
+
+    def test_send_read_timeout_recorded_as_failure(self):
+        # given
+        self.server._server.delay = 0.5
+        host = 'http://127.0.0.1:{0}'.format(self.server.port)
+
+        # then
+        with self.assertRaises(requests_exceptions.ReadTimeout):
+            # when
+            self.transport.send(self._call(timeout=0.05))
+
+        self.assertTrue(self.host_selector.stats[host]['errors'] > 0)
+
+    def test_send_connection_error_retry_flag(self):
+        # then
+        with self.assertRaises(RecoverableResponseException):
+            # when
+            self.transport.send(self._call(
+                hosts=['127.0.0.2'],
+                timeout=1,
+                retry_on_connection_error=True
+            ))
+
+
+class TestGetRetryAfter(unittest.TestCase):
+
+    def _response(self, **headers):
+        return Mock(headers=headers)
+
+    def test_seconds(self):
+        # then
+        self.assertEquals(
+            get_retry_after(self._response(**{'Retry-After': '120'})),
+            120
+        )
+
+    def test_http_date(self):
+        # given
+        response = self._response(**{
+            'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'
+        })
+
+        # then
+        self.assertEquals(get_retry_after(response, now=1445412460), 20)
+
+    def test_reset_timestamp(self):
+        # given
+        response = self._response(**{'X-RateLimit-Reset': '1445412500'})
+
+        # then
+        self.assertEquals(get_retry_after(response, now=1445412460), 40)
+
+    def test_reset_seconds(self):
+        # then
+        self.assertEquals(
+            get_retry_after(self._response(**{'RateLimit-Reset': '2.5'})),
+            3
+        )
+
+    def test_retry_after_first(self):
+        # given
+        response = self._response(**{
+            'Retry-After': '5',
+            'RateLimit-Reset': '60'
+        })
+
+        # then
+        self.assertEquals(get_retry_after(response), 5)
+
+    def test_past_or_invalid(self):
+        # then
+        self.assertEquals(
+            get_retry_after(
+                self._response(**{'X-RateLimit-Reset': '1445412400'}),
+                now=1445412460
+            ),
+            0
+        )
+        self.assertIsNone(
+            get_retry_after(self._response(**{'Retry-After': 'soon'}))
+        )
+        self.assertIsNone(get_retry_after(self._response()))
+        self.assertIsNone(get_retry_after(None))
+
+
+class TestGetTransport(unittest.TestCase):
+
+    def test_get_transport_shared(self):
+        # then
+        self.assertIs(get_transport(3), get_transport(3))
+        self.assertIsNot(get_transport(3), get_transport(4))
+        self.assertEquals(get_transport(3).pool_size, 3)
+
+
+class TestHostSelector(unittest.TestCase):
+
+    HOSTS = ['http://a:80', 'http://b:80', 'http://c:80']
+
+    def setUp(self):
+        self.selector = HostSelector(smoothing=0.5, error_penalty=10)
+
+    def test_order_single_host(self):
+        # then
+        self.assertEquals(self.selector.order(self.HOSTS[:1]), self.HOSTS[:1])
+
+    def test_order_unknown_hosts(self):
+        # when
+        result = self.selector.order(self.HOSTS)
+
+        # then
+        self.assertEquals(sorted(result), self.HOSTS)
+
+    def test_order_by_latency(self):
+        # given
+        self.selector.record_success(self.HOSTS, self.HOSTS[0], 0.9)
+        self.selector.record_success(self.HOSTS, self.HOSTS[1], 0.1)
+        self.selector.record_success(self.HOSTS, self.HOSTS[2], 0.5)
+
+        # when
+        result = self.selector.order(self.HOSTS)
+
+        # then
+        self.assertEquals(result[1:], sorted(result[1:], key=[
+            self.HOSTS[1], self.HOSTS[2], self.HOSTS[0]
+        ].index))
+        self.assertNotEqual(result[0], self.HOSTS[0])
+
+    def test_order_power_of_two_choices_never_picks_worst(self):
+        # given
+        for host, latency in zip(reversed(self.HOSTS), (5.0, 0.2, 0.1)):
+            self.selector.record_success(self.HOSTS, host, latency)
+
+        # last good host failed - scores: a 5.1, b 0.2, c 5.0
+        self.selector.record_failure(self.HOSTS, self.HOSTS[0])
+
+        # when
+        first_hosts = set(
+            self.selector.order(self.HOSTS)[0] for _ in range(50)
+        )
+
+        # then
+        self.assertEquals(first_hosts, set(self.HOSTS[1:]))
+
+    def test_order_last_good_host_sticky(self):
+        # given
+        self.selector.record_success(self.HOSTS, self.HOSTS[0], 0.2)
+        self.selector.record_success(self.HOSTS, self.HOSTS[1], 0.3)
+        self.selector.record_success(self.HOSTS, self.HOSTS[2], 0.1)
+        self.selector.record_success(self.HOSTS, self.HOSTS[0], 0.2)
+
+        # when
+        first_hosts = set(
+            self.selector.order(self.HOSTS)[0] for _ in range(50)
+        )
+
+        # then
+        self.assertEquals(
+            first_hosts,
+            set([self.HOSTS[0], self.HOSTS[2]])
+        )
+
+    def test_record_failure_demotes_host(self):
+        # given
+        self.selector.record_success(self.HOSTS[:2], self.HOSTS[0], 0.1)
+        self.selector.record_success(self.HOSTS[:2], self.HOSTS[1], 0.5)
+
+        # when
+        self.selector.record_failure(self.HOSTS[:2], self.HOSTS[0])
+
+        # then
+        self.assertEquals(
+            self.selector.order(self.HOSTS[:2]),
+            [self.HOSTS[1], self.HOSTS[0]]
+        )
+        self.assertEquals(
+            self.selector.stats[self.HOSTS[0]],
+            {'latency': 0.1, 'errors': 0.5}
+        )
@@ -0,0 +1,382 @@
+import math
+import random
+import threading
+import time
+from cookielib import DefaultCookiePolicy
+from email.utils import (
+    mktime_tz,
+    parsedate_tz
+)
+from StringIO import StringIO
+
+import requests
+from cloudify_common_sdk.exceptions import (
+    RecoverableResponseException,
+    RecoverableStatusCodeCodeException
+)
+from requests.adapters import HTTPAdapter
+
+
+# Fix for flake 8
+try:
+    basestring
+except NameError:
+    basestring = str
+
+
+DEFAULT_POOL_SIZE = 10
+
+TEMPLATE_PROPERTY_RETRY_ON_CONNECTION_ERROR = 'retry_on_connection_error'
+
+# headers with time after which request can be retried (first present wins)
+RETRY_AFTER_HEADERS = ('Retry-After', 'RateLimit-Reset', 'X-RateLimit-Reset')
+
+# rate limit reset values greater than that are timestamps, not seconds
+RESET_TIMESTAMP_THRESHOLD = 10 ** 9
+
+
+def _parse_retry_after(value, now):
+    value = value.strip()
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        # Retry-After may be HTTP-date
+        date = parsedate_tz(value)
+
+        if date is None:
+            return None
+
+        return mktime_tz(date) - now
+
+    if seconds > RESET_TIMESTAMP_THRESHOLD:
+        return seconds - now
+
+    return seconds
+
+
+def get_retry_after(response, now=None):
+    # number of seconds server asked to wait before retry (None - unknown)
+    headers = getattr(response, 'headers', None) or {}
+    now = time.time() if now is None else now
+
+    for name in RETRY_AFTER_HEADERS:
+        if headers.get(name):
+            seconds = _parse_retry_after(headers[name], now)
+
+            if seconds is not None:
+                return max(int(math.ceil(seconds)), 0)
+
+    return None
+
+
+class HostConnectionPool(object):
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+
+        self.requests = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self._session = requests.Session()
+        # session is shared by all clients of host - cookies set for one of
+        # them must not be sent with requests of others (response.cookies
+        # are still available for cookies_translation)
+        self._session.cookies.set_policy(
+            DefaultCookiePolicy(allowed_domains=[])
+        )
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
+        self._semaphore = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        start = time.time()
+        self._semaphore.acquire()
+        wait_time = time.time() - start
+
+        with self._lock:
+            self.requests += 1
+            self.wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def request(self, method, url, **kwargs):
+        self._acquire()
+
+        try:
+            return self._session.request(method, url, **kwargs)
+        finally:
+            self._semaphore.release()
+
+    @property
+    def connections(self):
+        pools = self._adapter.poolmanager.pools
+
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    @property
+    def stats(self):
+        connections = self.connections
+
+        return {
+            'pool_size': self.pool_size,
+            'requests': self.requests,
+            'connections': connections,
+            'reused_connections': max(self.requests - connections, 0),
+            'wait_time': self.wait_time,
+            'max_wait_time': self.max_wait_time
+        }
+
+
+class HostSelector(object):
+
+    def __init__(self, smoothing=0.3, error_penalty=10.0):
+        # error_penalty - seconds added to score of host always failing
+        self.smoothing = smoothing
+        self.error_penalty = error_penalty
+
+        self._latency = {}
+        self._errors = {}
+        self._last_good = {}
+
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def _average(self, averages, key, value):
+        if key in averages:
+            value = averages[key] + self.smoothing * (value - averages[key])
+
+        averages[key] = value
+
+    def score(self, host):
+        return self._latency.get(host, 0.0) + \
+            self._errors.get(host, 0.0) * self.error_penalty
+
+    def order(self, hosts):
+        if len(hosts) < 2:
+            return list(hosts)
+
+        with self._lock:
+            last_good = self._last_good.get(frozenset(hosts))
+            ordered = sorted(hosts, key=self.score)
+
+            # power of two choices - remembered host (if any) competes
+            # with randomly chosen one
+            if last_good in hosts:
+                candidates = [
+                    last_good,
+                    self._random.choice(
+                        [host for host in hosts if host != last_good]
+                    )
+                ]
+            else:
+                candidates = self._random.sample(hosts, 2)
+
+            first = min(candidates, key=self.score)
+
+        ordered.remove(first)
+
+        return [first] + ordered
+
+    def record_success(self, hosts, host, latency):
+        with self._lock:
+            self._average(self._latency, host, latency)
+            self._average(self._errors, host, 0.0)
+            self._last_good[frozenset(hosts)] = host
+
+    def record_failure(self, hosts, host):
+        with self._lock:
+            self._average(self._errors, host, 1.0)
+
+            if self._last_good.get(frozenset(hosts)) == host:
+                del self._last_good[frozenset(hosts)]
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(
+                (host, {
+                    'latency': self._latency.get(host, 0.0),
+                    'errors': self._errors.get(host, 0.0)
+                })
+                for host in set(self._latency) | set(self._errors)
+            )
+
+
+HOST_SELECTOR = HostSelector()
+
+
+class Transport(object):
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, host_selector=None):
+        self.pool_size = pool_size
+        self.host_selector = host_selector or HOST_SELECTOR
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = HostConnectionPool(self.pool_size)
+
+            return self._pools[key]
+
+    @staticmethod
+    def _get_files(call):
+        files = {}
+
+        for name, value in call.get('files', {}).iteritems():
+            if isinstance(value, list):
+                files[name] = tuple(value)
+            elif isinstance(value, basestring):
+                files[name] = StringIO(value)
+            else:
+                files[name] = value
+
+        return files or None
+
+    @staticmethod
+    def _get_payload(call):
+        payload_format = call.get('payload_format', 'json')
+        payload = call.get('payload')
+        params = call.get('params', {})
+
+        if payload_format == 'json':
+            return params, payload, None
+
+        if payload_format == 'urlencoded' and isinstance(payload, dict):
+            params = dict(params)
+            params.update(payload)
+
+            return params, None, None
+
+        return params, None, payload
+
+    @staticmethod
+    def _check_response(call, response):
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            # server hint (e.g. 429 / 503) is carried up to RecoverableError
+            retry_after = get_retry_after(response)
+
+            if response.status_code in call.get('recoverable_codes', []):
+                error = RecoverableStatusCodeCodeException(
+                    'Response code {0} defined as recoverable'
+                    .format(response.status_code)
+                )
+                error.retry_after = retry_after
+                raise error
+
+            if response.status_code not in call.get('successful_codes', []):
+                e.retry_after = retry_after
+                raise
+
+    def send(self, call, stream=False):
+        ssl = call['ssl']
+        scheme = 'https' if ssl else 'http'
+        port = call['port']
+
+        if port == -1:
+            port = 443 if ssl else 80
+
+        hosts = [
+            '{0}://{1}:{2}'.format(scheme, host, port)
+            for host in call.get('hosts') or [call['host']]
+        ]
+
+        params, json_payload, data = self._get_payload(call)
+        auth = (call['auth'].get('user'), call['auth'].get('password')) \
+            if 'auth' in call else None
+
+        ordered_hosts = self.host_selector.order(hosts)
+
+        for i, host in enumerate(ordered_hosts):
+            start = time.time()
+
+            try:
+                response = self.get_pool(host).request(
+                    call['method'],
+                    host + call['path'],
+                    auth=auth,
+                    headers=call.get('headers', None),
+                    verify=call.get('verify', True),
+                    cert=call.get('cert', None),
+                    proxies=call.get('proxies', None),
+                    timeout=call.get('timeout', None),
+                    json=json_payload,
+                    params=params,
+                    files=self._get_files(call),
+                    data=data,
+                    stream=stream
+                )
+            except requests.exceptions.ReadTimeout:
+                # request may have reached server - it is not sent again to
+                # other host, but slow host is demoted
+                self.host_selector.record_failure(hosts, host)
+                raise
+            except requests.exceptions.ConnectionError as e:
+                self.host_selector.record_failure(hosts, host)
+
+                if call.get(TEMPLATE_PROPERTY_RETRY_ON_CONNECTION_ERROR):
+                    raise RecoverableResponseException(
+                        'ConnectionError {0} has occurred, but flag {1} '
+                        'is set. Retrying...'
+                        .format(
+                            repr(e),
+                            TEMPLATE_PROPERTY_RETRY_ON_CONNECTION_ERROR
+                        )
+                    )
+
+                if i == len(ordered_hosts) - 1:
+                    raise
+
+                continue
+
+            if response.status_code >= 500:
+                self.host_selector.record_failure(hosts, host)
+            else:
+                self.host_selector.record_success(
+                    hosts,
+                    host,
+                    time.time() - start
+                )
+
+            try:
+                self._check_response(call, response)
+            except Exception:
+                # streamed response is not consumed by anyone - connection
+                # has to be given back to pool
+                if stream:
+                    response.close()
+
+                raise
+
+            return response
+
+    @property
+    def stats(self):
+        with self._lock:
+            pools = dict(self._pools)
+
+        return dict((key, pool.stats) for key, pool in pools.iteritems())
+
+
+_TRANSPORTS = {}
+_TRANSPORTS_LOCK = threading.Lock()
+
+
+def get_transport(pool_size=DEFAULT_POOL_SIZE):
+    with _TRANSPORTS_LOCK:
+        if pool_size not in _TRANSPORTS:
+            _TRANSPORTS[pool_size] = Transport(pool_size)
+
+        return _TRANSPORTS[pool_size]
@@ -16,6 +16,7 @@ setup(
     zip_safe=False,
     install_requires=[
         'cloudify-common>=4.6',
-        'cloudify-utilities-plugins-sdk==0.0.27'
+        'cloudify-utilities-plugins-sdk==0.0.27',
+        'cryptography>=2.5'
     ]
 )